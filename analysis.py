@@ -1,243 +1,268 @@
-import pandas as pd  # pannel data or python data analysis
-import numpy as np  # numerical python
 import matplotlib.pyplot as plt  # plotting and visualization
 import seaborn as sns  # plotting and visualization
-from datetime import datetime
 import warnings  # control wornings
+import argparse  # command line options
+from contextlib import nullcontext
+
+from backends import BACKENDS, DEFAULT_BACKEND, open_backend
+from data_store import DATA_PATH, load_sources, quarantine_path, source_files, validate_dates
+from dates import DATE_FORMAT
+import profiling
+from report import build_report, finish_report, print_intervals, print_report, report_from_backend
+from sampling import sample_for_target
+from shipping import ShipTimeHistogram, print_shipping
+from slices import SLICE_FORMATS, build_slice_reports, write_slice_reports
+from streaming import DEFAULT_CHUNKSIZE, aggregate_source, parallel_stream_report
+
 warnings.filterwarnings('ignore')  # disable wornings
 
 # Set up plotting style
 plt.style.use('default')
 sns.set_palette("husl")
 
-# Load the data with error handling
-print("🔄 Loading Superstore Dataset...")
-
-# Try different file reading approaches
-try:
-    # First attempt - standard reading
-    df = pd.read_csv('data/Sample-Superstore.csv', encoding='utf-8')
-    print("✅ File loaded successfully with UTF-8 encoding")
-except:
-    try:
-        # Second attempt - different encoding
-        df = pd.read_csv('data/Sample-Superstore.csv', encoding='latin-1')
-        print("✅ File loaded successfully with Latin-1 encoding")
-    except:
-        try:
-            # Third attempt - handle problematic lines
-            df = pd.read_csv('data/Sample-Superstore.csv', encoding='utf-8', error_bad_lines=False, warn_bad_lines=True)
-            print("✅ File loaded with some problematic lines skipped")
-        except:
-            # Fourth attempt - different separators
-            try:
-                df = pd.read_csv('data/Sample-Superstore.csv', encoding='utf-8', sep=';')
-                print("✅ File loaded with semicolon separator")
-            except:
-                print("❌ Could not read file. Let's check the file structure...")
-                # Check first few lines of the file
-                with open('data/Sample-Superstore.csv', 'r', encoding='utf-8', errors='ignore') as f:
-                    for i, line in enumerate(f):
-                        print(f"Line {i + 1}: {line.strip()}")
-                        if i >= 5:  # Show first 6 lines
-                            break
-                raise Exception("File reading failed")
-
-# Basic dataset information
-print("\n📊 DATASET OVERVIEW")
-print("=" * 50)
-print(f"Dataset Shape: {df.shape[0]} rows × {df.shape[1]} columns")
-print(f"Memory Usage: {df.memory_usage(deep=True).sum() / 1024 ** 2:.2f} MB")
-
-# Display column info
-print("\n📋 COLUMN INFORMATION")
-print("=" * 50)
-for col in df.columns:
-    print(f"{col:<20} | {str(df[col].dtype):<10} | {df[col].nunique():<6} unique values")
-
-# Check for missing values
-print("\n🔍 DATA QUALITY CHECK")
-print("=" * 50)
-missing_data = df.isnull().sum()
-if missing_data.sum() == 0:
-    print("✅ No missing values found!")
-else:
-    print("⚠️  Missing values detected:")
-    print(missing_data[missing_data > 0])
-
-# Data preparation
-print("\n🛠️  DATA PREPARATION")
-print("=" * 50)
-
-# Convert date column
-df['Order Date'] = pd.to_datetime(df['Order Date'])
-df['Ship Date'] = pd.to_datetime(df['Ship Date'])
-
-# Create additional time-based columns
-df['Year'] = df['Order Date'].dt.year
-df['Month'] = df['Order Date'].dt.month
-df['Quarter'] = df['Order Date'].dt.quarter
-df['Month_Name'] = df['Order Date'].dt.strftime('%B')
-df['Weekday'] = df['Order Date'].dt.strftime('%A')
-
-# Calculate additional metrics
-df['Profit_Margin'] = (df['Profit'] / df['Sales'] * 100).round(2)
-df['Days_to_Ship'] = (df['Ship Date'] - df['Order Date']).dt.days
-
-print("✅ Date columns converted and additional metrics calculated")
-
-# BUSINESS ANALYSIS BEGINS HERE
-print("\n" + "=" * 60)
-print("📈 BUSINESS INTELLIGENCE ANALYSIS")
-print("=" * 60)
-
-# 1. OVERALL PERFORMANCE METRICS
-print("\n💰 KEY PERFORMANCE INDICATORS")
-print("-" * 40)
-total_sales = df['Sales'].sum()
-total_profit = df['Profit'].sum()
-total_orders = df['Order ID'].nunique()
-avg_order_value = df.groupby('Order ID')['Sales'].sum().mean()
-overall_margin = (total_profit / total_sales * 100)
-
-print(f"Total Sales:        ${total_sales:,.2f}")
-print(f"Total Profit:       ${total_profit:,.2f}")
-print(f"Total Orders:       {total_orders:,}")
-print(f"Average Order:      ${avg_order_value:.2f}")
-print(f"Profit Margin:      {overall_margin:.2f}%")
-print(
-    f"Date Range:         {df['Order Date'].min().strftime('%Y-%m-%d')} to {df['Order Date'].max().strftime('%Y-%m-%d')}")
-
-# 2. SALES TRENDS ANALYSIS
-print("\n📅 SALES TRENDS ANALYSIS")
-print("-" * 40)
-
-# Monthly sales trend
-monthly_sales = df.groupby(['Year', 'Month']).agg({
-    'Sales': 'sum',
-    'Profit': 'sum',
-    'Order ID': 'nunique'
-}).round(2)
-
-# Find best and worst months
-monthly_totals = df.groupby('Month_Name')['Sales'].sum().sort_values(ascending=False)
-print(f"Best Month:         {monthly_totals.index[0]} (${monthly_totals.iloc[0]:,.2f})")
-print(f"Worst Month:        {monthly_totals.index[-1]} (${monthly_totals.iloc[-1]:,.2f})")
-
-# Year over year growth
-yearly_sales = df.groupby('Year')['Sales'].sum()
-if len(yearly_sales) > 1:
-    growth_rates = yearly_sales.pct_change() * 100
-    print(f"YoY Growth 2017:    {growth_rates[2017]:.1f}%" if 2017 in growth_rates.index else "N/A")
-    print(f"YoY Growth 2018:    {growth_rates[2018]:.1f}%" if 2018 in growth_rates.index else "N/A")
-
-# 3. CUSTOMER SEGMENTATION ANALYSIS
-print("\n👥 CUSTOMER SEGMENTATION")
-print("-" * 40)
-
-customer_segment_analysis = df.groupby('Segment').agg({
-    'Sales': 'sum',
-    'Profit': 'sum',
-    'Customer ID': 'nunique',
-    'Order ID': 'nunique'
-}).round(2)
-
-customer_segment_analysis['Avg_Order_Value'] = (customer_segment_analysis['Sales'] /
-                                                customer_segment_analysis['Order ID']).round(2)
-customer_segment_analysis['Profit_Margin'] = (customer_segment_analysis['Profit'] /
-                                              customer_segment_analysis['Sales'] * 100).round(2)
-
-print("Segment Performance:")
-for segment in customer_segment_analysis.index:
-    row = customer_segment_analysis.loc[segment]
-    print(
-        f"{segment:<12} | Sales: ${row['Sales']:>8,.0f} | Profit: ${row['Profit']:>7,.0f} | Margin: {row['Profit_Margin']:>5.1f}%")
-
-# 4. PRODUCT CATEGORY ANALYSIS
-print("\n🛍️  PRODUCT CATEGORY PERFORMANCE")
-print("-" * 40)
-
-category_analysis = df.groupby('Category').agg({
-    'Sales': 'sum',
-    'Profit': 'sum',
-    'Quantity': 'sum',
-    'Order ID': 'nunique'
-}).round(2)
-
-category_analysis['Profit_Margin'] = (category_analysis['Profit'] / category_analysis['Sales'] * 100).round(2)
-category_analysis['Avg_Order_Value'] = (category_analysis['Sales'] / category_analysis['Order ID']).round(2)
-
-print("Category Performance:")
-for category in category_analysis.index:
-    row = category_analysis.loc[category]
-    print(
-        f"{category:<12} | Sales: ${row['Sales']:>8,.0f} | Margin: {row['Profit_Margin']:>5.1f}% | AOV: ${row['Avg_Order_Value']:>6.0f}")
-
-# 5. REGIONAL ANALYSIS
-print("\n🗺️  REGIONAL PERFORMANCE")
-print("-" * 40)
-
-regional_analysis = df.groupby('Region').agg({
-    'Sales': 'sum',
-    'Profit': 'sum',
-    'Customer ID': 'nunique',
-    'Order ID': 'nunique'
-}).round(2)
-
-regional_analysis['Profit_Margin'] = (regional_analysis['Profit'] / regional_analysis['Sales'] * 100).round(2)
-regional_analysis['Sales_per_Customer'] = (regional_analysis['Sales'] / regional_analysis['Customer ID']).round(2)
-
-print("Regional Performance:")
-for region in regional_analysis.index:
-    row = regional_analysis.loc[region]
-    print(
-        f"{region:<8} | Sales: ${row['Sales']:>8,.0f} | Customers: {row['Customer ID']:>4} | Sales/Customer: ${row['Sales_per_Customer']:>6.0f}")
-
-# 6. TOP PERFORMERS ANALYSIS
-print("\n🏆 TOP PERFORMERS")
-print("-" * 40)
-
-# Top products by sales
-top_products_sales = df.groupby('Product Name')['Sales'].sum().sort_values(ascending=False).head(5)
-print("Top 5 Products by Sales:")
-for i, (product, sales) in enumerate(top_products_sales.items(), 1):
-    print(f"{i}. {product[:50]:<50} ${sales:>8,.0f}")
-
-# Top customers by sales
-top_customers = df.groupby('Customer Name')['Sales'].sum().sort_values(ascending=False).head(5)
-print(f"\nTop 5 Customers by Sales:")
-for i, (customer, sales) in enumerate(top_customers.items(), 1):
-    print(f"{i}. {customer:<30} ${sales:>8,.0f}")
-
-# 7. KEY BUSINESS INSIGHTS
-print("\n" + "=" * 60)
-print("💡 KEY BUSINESS INSIGHTS")
-print("=" * 60)
-
-# Calculate insights
-best_region = regional_analysis['Sales'].idxmax()
-best_category = category_analysis['Profit_Margin'].idxmax()
-best_segment = customer_segment_analysis['Profit_Margin'].idxmax()
-worst_performers = category_analysis['Profit_Margin'].idxmin()
-
-print(f"🎯 OPPORTUNITIES IDENTIFIED:")
-print(f"   • {best_region} region generates highest sales (${regional_analysis.loc[best_region, 'Sales']:,.0f})")
-print(
-    f"   • {best_category} category has highest profit margin ({category_analysis.loc[best_category, 'Profit_Margin']:.1f}%)")
-print(
-    f"   • {best_segment} segment most profitable ({customer_segment_analysis.loc[best_segment, 'Profit_Margin']:.1f}% margin)")
-print(
-    f"   • Improvement needed in {worst_performers} category ({category_analysis.loc[worst_performers, 'Profit_Margin']:.1f}% margin)")
-
-# Calculate potential impact
-profit_opportunity = category_analysis.loc[best_category, 'Sales'] * 0.05  # 5% margin improvement
-print(f"   • Potential profit increase: ${profit_opportunity:,.0f} (5% margin improvement on best category)")
-
-print(f"\n📊 DASHBOARD READY METRICS:")
-print(f"   • Total KPIs: Sales, Profit, Orders, AOV calculated ✅")
-print(f"   • Time trends: Monthly, quarterly, yearly data prepared ✅")
-print(f"   • Segmentation: Customer, product, regional analysis complete ✅")
-print(f"   • Top performers: Products and customers identified ✅")
-
-print(f"\n🎉 Day 1 Analysis Complete!")
-print(f"Next: Create visualizations and dashboard (Day 2-3)")
+
+def print_overview(rows, columns, memory_label, column_info, missing_data):
+    # Basic dataset information
+    print("\n📊 DATASET OVERVIEW")
+    print("=" * 50)
+    print(f"Dataset Shape: {rows} rows × {columns} columns")
+    print(memory_label)
+
+    # Display column info
+    print("\n📋 COLUMN INFORMATION")
+    print("=" * 50)
+    for col, dtype, n_unique in column_info:
+        print(f"{col:<20} | {str(dtype):<10} | {n_unique:<6} unique values")
+
+    # Check for missing values
+    print("\n🔍 DATA QUALITY CHECK")
+    print("=" * 50)
+    if missing_data.sum() == 0:
+        print("✅ No missing values found!")
+    else:
+        print("⚠️  Missing values detected:")
+        print(missing_data[missing_data > 0])
+
+
+def print_date_validation(path, fmt=DATE_FORMAT):
+    print(f"\n🔍 DATE VALIDATION ({fmt})")
+    print("=" * 50)
+    bad = validate_dates(path, fmt)
+    if bad.empty:
+        print("✅ Every date parses with the expected format")
+        return True
+    print(f"⚠️  {len(bad):,} unparseable date values:")
+    print(bad.head(20).to_string(index=False))
+    return False
+
+
+def run_in_memory(path, workers=None):
+    # Load the data (served from the preprocessed cache when fresh); sources are
+    # parsed once in their sniffed format, with malformed rows quarantined
+    print("🔄 Loading Superstore Dataset...")
+    with profiling.span('load'):
+        df = load_sources(path, log=print, max_workers=workers)
+
+    with profiling.span('overview'):
+        print_overview(
+            df.shape[0], df.shape[1],
+            f"Memory Usage: {df.memory_usage(deep=True).sum() / 1024 ** 2:.2f} MB",
+            [(col, df[col].dtype, df[col].nunique()) for col in df.columns],
+            df.isnull().sum(),
+        )
+
+    # Data preparation
+    print("\n🛠️  DATA PREPARATION")
+    print("=" * 50)
+
+    # Date conversion and derived metrics are applied by data_store.prepare_frame()
+    print("✅ Date columns converted and additional metrics calculated")
+    with profiling.span('build_report'):
+        report = build_report(df)
+    with profiling.span('shipping'):
+        report['shipping'] = ShipTimeHistogram.from_frame(df)
+    return report
+
+
+def run_on_backend(path, backend_name):
+    # Polars / DuckDB query the source files directly; no pandas frame is loaded
+    files = source_files(path)
+    print(f"🔄 Querying {len(files)} Superstore file(s) in place with the {backend_name} backend...")
+    with profiling.span('open_backend'):
+        backend = open_backend(backend_name, path)
+    quarantined = backend.quarantined()
+    if quarantined:
+        problems = ', '.join(f"{problem}: {count:,}" for problem, count in quarantined.items())
+        print(f"⚠️  {sum(quarantined.values()):,} malformed rows left out by {backend_name} ({problems})")
+    print("\n🛠️  DATA PREPARATION")
+    print("=" * 50)
+    print(f"✅ Date columns parsed and calendar columns derived by {backend_name}")
+    with profiling.span('build_report'):
+        report = report_from_backend(backend)
+    with profiling.span('shipping'):
+        report['shipping'] = backend.ship_histogram()
+    return report
+
+
+def run_streaming(path, chunksize, topk_capacity=None, workers=None):
+    print(f"🔄 Streaming Superstore Dataset in chunks of {chunksize:,} rows...")
+    files = source_files(path)
+    with profiling.span('stream'):
+        if len(files) > 1:
+            aggregator = parallel_stream_report(files, chunksize, topk_capacity, max_workers=workers)
+        else:
+            aggregator = aggregate_source(files[0], chunksize, topk_capacity)
+    if len(files) > 1:
+        print(f"✅ Processed {aggregator.rows:,} rows from {len(files)} files in parallel")
+    else:
+        print(f"✅ Processed {aggregator.rows:,} rows in a single pass")
+    if aggregator.quarantined:
+        where = quarantine_path(files[0]) if len(files) == 1 else "each file's cache directory"
+        print(f"⚠️  {aggregator.quarantined:,} malformed rows quarantined in {where}")
+
+    print_overview(
+        aggregator.rows, len(aggregator.columns),
+        f"Memory Usage: {aggregator.peak_chunk_memory / 1024 ** 2:.2f} MB peak per chunk",
+        [(col, aggregator.dtypes[col], aggregator.unique_count(col)) for col in aggregator.columns],
+        aggregator.missing,
+    )
+
+    print("\n🛠️  DATA PREPARATION")
+    print("=" * 50)
+    print("✅ Date columns converted and additional metrics calculated per chunk")
+    with profiling.span('build_report'):
+        report = aggregator.report()
+    report['shipping'] = aggregator.shipping
+    return report
+
+
+def run_approximate(path, target, workers=None):
+    # Estimates from a stratified sample sized for `target` relative error on total
+    # sales, with 95% intervals, instead of aggregating every row
+    print("🔄 Loading Superstore Dataset...")
+    with profiling.span('load'):
+        df = load_sources(path, log=print, max_workers=workers)
+
+    print("\n🎲 APPROXIMATE MODE")
+    print("=" * 50)
+    with profiling.span('sample'):
+        sample = sample_for_target(df, target, log=print)
+    print(f"✅ Stratified sample: {len(sample):,} of {len(df):,} rows ({len(sample) / len(df):.2%}) "
+          f"across {int((sample.population > 0).sum()):,} Region × Category × Segment × month strata")
+    with profiling.span('build_report'):
+        dates = df['Order Date']
+        pieces, intervals = sample.estimate_report((dates.min(), dates.max()))
+        report = finish_report(**pieces)
+    report['intervals'] = intervals
+    return report
+
+
+def run_slices(path, columns, directory, formats, workers=None):
+    # Batch mode: the full report for every observed combination of `columns`,
+    # from one load and one shared aggregation pass
+    print("🔄 Loading Superstore Dataset...")
+    with profiling.span('load'):
+        df = load_sources(path, log=print, max_workers=workers)
+    missing = [col for col in columns if col not in df.columns]
+    if missing:
+        raise SystemExit(f"❌ Unknown slice column(s): {', '.join(missing)}")
+
+    print(f"\n🧩 SLICE REPORTS ({' × '.join(columns)})")
+    print("=" * 50)
+    with profiling.span('build_slice_reports'):
+        reports = build_slice_reports(df, columns)
+    with profiling.span('write_slice_reports'):
+        written = write_slice_reports(reports, directory, formats)
+    print(f"✅ {len(reports):,} slice reports written as {', '.join(formats)} ({len(written):,} files) to {directory}")
+
+
+def print_profile(profiler, json_path=None, prom_path=None):
+    print("\n⏱️  PERFORMANCE PROFILE")
+    print("=" * 50)
+    print(profiler.format_table())
+    for path, text in ((json_path, profiler.to_json), (prom_path, profiler.to_prometheus)):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text())
+            print(f"💾 Profile written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Superstore business performance report")
+    parser.add_argument('path', nargs='?', default=DATA_PATH,
+                        help="Superstore CSV extract, or a directory / glob of partition CSVs")
+    parser.add_argument('--stream', action='store_true',
+                        help="read the file in chunks with bounded memory instead of loading it whole")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="rows per chunk in --stream mode")
+    parser.add_argument('--topk-capacity', type=int, default=None,
+                        help="in --stream mode, rank top performers with bounded Space-Saving sketches "
+                             "of this many counters instead of exact per-ID totals")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes for partitioned input (default: one per CPU)")
+    parser.add_argument('--backend', choices=list(BACKENDS), default=DEFAULT_BACKEND,
+                        help="compute backend for the in-memory report: pandas (default), or polars / duckdb "
+                             "to query the files in place, multi-threaded (env: SUPERSTORE_BACKEND; "
+                             "install them with requirements-backends.txt)")
+    parser.add_argument('--slice-by', metavar='COLUMNS',
+                        help="batch mode: write the report for every slice of these comma-separated columns, "
+                             "e.g. Region,Category,Year")
+    parser.add_argument('--output-dir', default='slice_reports', help="where --slice-by writes its reports")
+    parser.add_argument('--formats', default=','.join(SLICE_FORMATS),
+                        help="comma-separated --slice-by output formats: json, md, csv")
+    parser.add_argument('--approx', type=float, metavar='TARGET',
+                        help="estimate the report from a stratified sample sized for this relative error "
+                             "on total sales (95%% confidence), e.g. 0.01 for ±1%%")
+    parser.add_argument('--validate-dates', action='store_true',
+                        help="only check that every date parses with the expected format and list the rows that do not")
+    parser.add_argument('--profile', action='store_true',
+                        help="time every stage (with allocation peaks) and print a profile at the end")
+    parser.add_argument('--profile-json', metavar='PATH', help="write the stage profile as JSON")
+    parser.add_argument('--profile-prom', metavar='PATH', help="write the stage profile as Prometheus text")
+    args = parser.parse_args()
+
+    if args.validate_dates:
+        raise SystemExit(0 if print_date_validation(args.path) else 1)
+
+    if args.approx is not None and not 0 < args.approx < 1:
+        parser.error("--approx takes a relative error between 0 and 1, e.g. 0.01")
+
+    profiler = profiling.Profiler() if args.profile or args.profile_json or args.profile_prom else None
+    if args.slice_by:
+        formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+        unknown = [fmt for fmt in formats if fmt not in SLICE_FORMATS]
+        if unknown:
+            parser.error(f"unknown format(s) {', '.join(unknown)}; choose from {', '.join(SLICE_FORMATS)}")
+        with profiler or nullcontext():
+            run_slices(args.path, [col.strip() for col in args.slice_by.split(',')], args.output_dir,
+                       formats, args.workers)
+        if profiler is not None:
+            print_profile(profiler, args.profile_json, args.profile_prom)
+        return
+
+    with profiler or nullcontext():
+        if args.approx is not None:
+            report = run_approximate(args.path, args.approx, args.workers)
+        elif args.stream:
+            report = run_streaming(args.path, args.chunksize, args.topk_capacity, args.workers)
+        elif args.backend != 'pandas':
+            report = run_on_backend(args.path, args.backend)
+        else:
+            report = run_in_memory(args.path, args.workers)
+
+        with profiling.span('print_report'):
+            print_report(report)
+            if report.get('intervals') is not None:
+                print_intervals(report)
+            if report.get('shipping') is not None:
+                print_shipping(report['shipping'])
+
+    print(f"\n🎉 Day 1 Analysis Complete!")
+    print(f"Next: Create visualizations and dashboard (Day 2-3)")
+
+    if profiler is not None:
+        print_profile(profiler, args.profile_json, args.profile_prom)
+
+
+if __name__ == '__main__':
+    main()
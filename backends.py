@@ -0,0 +1,634 @@
+"""Interchangeable compute backends for the report's operations.
+
+Every backend answers the same small API over the Superstore data:
+
+    backend.select(start, end, regions, categories, segments)  # filtered view
+    backend.aggregate(plan)      # MetricsPlan group-bys, sums, counts, distinct counts
+    backend.kpis()               # totals, order count / AOV, date range
+    backend.top_k(key, value, k, label_column)
+    backend.ship_histogram()     # shipping.ShipTimeHistogram of the selected lines
+
+'pandas' runs the existing numpy kernels (metrics.compute_metrics, topk,
+OrderTable) on the frame from data_store.load_sources. 'polars' builds lazy
+scans over the source files and runs the queries multi-threaded. 'duckdb'
+queries the CSV or Parquet files in place through an embedded, serverless
+connection. Calendar columns (Year, Month, Quarter, Month_Name, Weekday) are
+derived from Order Date by each engine, so they can be used as plan
+dimensions everywhere.
+
+Polars and DuckDB read each CSV file in the encoding, delimiter and date
+format ingest.sniff_format() finds, and leave out the rows SourceReader
+would quarantine (too many fields, a required field missing, a date or
+measure that does not parse). They write no quarantine file; quarantined()
+counts the rows left out by problem. Both decode UTF-8 only, so a file in
+another encoding is read from a UTF-8 copy in its cache directory.
+
+Results are shaped like the pandas ones (same columns, index names, group
+order and labels) so report.report_from_backend() renders any of them. Sums
+can differ in the last bits because the engines add in a different order.
+`python backends.py` compares every operation across the installed backends
+on the full data and on a few filtered selections (tests/test_backends.py
+does the same on edge-case extracts).
+
+The backend is chosen with SUPERSTORE_BACKEND or analysis.py --backend.
+"""
+import argparse
+import csv
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_PATH, cache_dir, load_sources, source_files
+from dates import DATE_COLUMNS, DATE_FORMAT
+from ingest import NUMERIC_COLUMNS, REQUIRED_COLUMNS, sniff_format
+from metrics import compute_metrics
+from orders import OrderTable
+from schema import CALENDAR_CATEGORIES
+from shipping import SHIP_DIMENSIONS, ShipTimeHistogram
+from topk import disambiguate, top_k_by_key
+
+DEFAULT_BACKEND = os.environ.get('SUPERSTORE_BACKEND', 'pandas')
+
+FILTER_COLUMNS = ['Region', 'Category', 'Segment']
+# Typed on read by the engines that scan raw CSV text
+INTEGER_COLUMNS = ['Row ID', 'Quantity']
+FLOAT_COLUMNS = ['Sales', 'Discount', 'Profit']
+
+# CSV sources are read with one column more than their header: a value in it
+# means the line has too many fields
+EXTRA_FIELDS = '_extra'
+
+# Lines per (order day, ship dimensions, days to ship) make a ShipTimeHistogram
+SHIP_KEYS = ['Order Date'] + SHIP_DIMENSIONS + ['Days_to_Ship']
+
+# Relative tolerance of the cross-backend check: engines add floats in different orders
+CHECK_RTOL = 1e-9
+
+
+def _filters(start=None, end=None, regions=None, categories=None, segments=None):
+    # Same vocabulary as SalesCube.select / OrderTable.select; None means "no filter"
+    return {
+        'start': None if start is None else pd.Timestamp(start).normalize(),
+        'end': None if end is None else pd.Timestamp(end).normalize(),
+        'values': {col: list(labels) for col, labels in zip(FILTER_COLUMNS, (regions, categories, segments))
+                   if labels is not None},
+    }
+
+
+def _header(file, fmt):
+    # Column names of a CSV source in its sniffed format
+    with open(file, encoding=fmt.encoding, newline='') as f:
+        return next(csv.reader(f, delimiter=fmt.delimiter), [])
+
+
+def _utf8_source(file, fmt):
+    # Polars and DuckDB decode UTF-8 only (DuckDB's Latin-1 rejects the bytes
+    # 0x80-0x9F that Excel exports use), so any other encoding is read from a
+    # UTF-8 copy in the source's cache directory, rewritten when it is older
+    if fmt.encoding.startswith('utf-8'):
+        return file
+    target = os.path.join(cache_dir(file), 'utf8.csv')
+    if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(file):
+        os.makedirs(cache_dir(file), exist_ok=True)
+        tmp = f"{target}.tmp"
+        with open(file, encoding=fmt.encoding, newline='') as source, \
+                open(tmp, 'w', encoding='utf-8', newline='') as copy:
+            shutil.copyfileobj(source, copy)
+        os.replace(tmp, target)
+    return target
+
+
+def _quarantine_checks(columns):
+    # SourceReader's quarantine rules in its order, so a row is left out under
+    # the same (first) problem: (problem, column, 'extra' | 'missing' | 'unparsed')
+    checks = [('fields', EXTRA_FIELDS, 'extra')]
+    checks += [(col, col, 'missing') for col in REQUIRED_COLUMNS if col in columns]
+    checks += [(col, col, 'unparsed') for col in DATE_COLUMNS + NUMERIC_COLUMNS if col in columns]
+    return checks
+
+
+def _calendar_rank(index):
+    # sort_index key: month / weekday names in calendar order, everything else as is
+    categories = CALENDAR_CATEGORIES.get(index.name)
+    if categories is None:
+        return index
+    return index.map({name: rank for rank, name in enumerate(categories)})
+
+
+def _shape_groups(frame, dim, metrics):
+    # Engine result (key columns + measures) -> pandas-shaped metrics table
+    keys = list(dim) if isinstance(dim, tuple) else [dim]
+    frame = frame.dropna(subset=keys).set_index(keys)[[column for column, _ in metrics]]
+    return frame.sort_index(key=_calendar_rank)
+
+
+def _ranking(keys, totals, labels, value_column):
+    index = list(keys) if labels is None else disambiguate(labels, keys)
+    return pd.Series(np.asarray(totals, dtype=np.float64), index=index, name=value_column)
+
+
+def _kpis(total_sales, total_profit, total_orders, date_min, date_max):
+    total_orders = int(total_orders)
+    return {
+        'total_sales': float(total_sales or 0),
+        'total_profit': float(total_profit or 0),
+        'total_orders': total_orders,
+        'avg_order_value': float(total_sales) / total_orders if total_orders else 0,
+        'date_min': pd.Timestamp(date_min),
+        'date_max': pd.Timestamp(date_max),
+    }
+
+
+class PandasBackend:
+    name = 'pandas'
+
+    def __init__(self, frame, filters=None, order_table=None):
+        self.frame = frame
+        self.filters = filters or _filters()
+        self._order_table = order_table
+        self._rows = self._select_rows()
+
+    @classmethod
+    def open(cls, path=DATA_PATH, **load_options):
+        return cls(load_sources(path, **load_options))
+
+    def select(self, start=None, end=None, regions=None, categories=None, segments=None):
+        return PandasBackend(self.frame, _filters(start, end, regions, categories, segments), self.order_table)
+
+    @property
+    def order_table(self):
+        if self._order_table is None:
+            self._order_table = OrderTable.from_frame(self.frame)
+        return self._order_table
+
+    def _select_rows(self):
+        # None (every row) or the positions matching the filters
+        start, end, values = self.filters['start'], self.filters['end'], self.filters['values']
+        if start is None and end is None and not values:
+            return None
+        mask = np.ones(len(self.frame), dtype=bool)
+        dates = self.frame['Order Date']
+        if start is not None:
+            mask &= (dates >= start).to_numpy()
+        if end is not None:
+            mask &= (dates < end + pd.Timedelta(days=1)).to_numpy()
+        for col, labels in values.items():
+            mask &= self.frame[col].isin(labels).to_numpy()
+        return np.flatnonzero(mask)
+
+    def aggregate(self, plan):
+        return compute_metrics(self.frame, plan, rows=self._rows)
+
+    def kpis(self):
+        df = self.frame if self._rows is None else self.frame.take(self._rows)
+        if self._rows is None:
+            orders = self.order_table.everything()
+        else:
+            filters = self.filters
+            orders = self.order_table.select(filters['start'], filters['end'],
+                                             *(filters['values'].get(col) for col in FILTER_COLUMNS))
+        return {
+            'total_sales': df['Sales'].sum(),
+            'total_profit': df['Profit'].sum(),
+            'total_orders': orders.count,
+            'avg_order_value': orders.avg_order_value,
+            'date_min': df['Order Date'].min(),
+            'date_max': df['Order Date'].max(),
+        }
+
+    def top_k(self, key_column, value_column, k, label_column=None):
+        return top_k_by_key(self.frame, key_column, value_column, k, rows=self._rows, label_column=label_column)
+
+    def ship_histogram(self):
+        return ShipTimeHistogram.from_frame(self.frame if self._rows is None else self.frame.take(self._rows))
+
+
+class PolarsBackend:
+    name = 'polars'
+
+    def __init__(self, scan, filters=None, rejected=None):
+        self.scan = scan
+        self.filters = filters or _filters()
+        self.rejected = rejected          # lazy (_problem, len) counts of the rows left out, if any
+
+    @staticmethod
+    def _scan_csv(file):
+        # One CSV source in its sniffed format, typed, with the problem that
+        # would quarantine each row (null for good rows) in _problem
+        import polars as pl
+
+        fmt = sniff_format(file)
+        columns = _header(file, fmt)
+        options = {'has_header': False, 'skip_rows': 1, 'separator': fmt.delimiter,
+                   'schema': {col: pl.String for col in columns + [EXTRA_FIELDS]},
+                   'missing_columns': 'insert', 'truncate_ragged_lines': True}
+        scan = pl.scan_csv(_utf8_source(file, fmt), **options)
+
+        parsed = {col: pl.col(col).str.strptime(pl.Date, fmt.date_format, strict=False)
+                  for col in DATE_COLUMNS if col in columns}
+        parsed.update({col: pl.col(col).str.strip_chars().cast(pl.Float64, strict=False)
+                       for col in NUMERIC_COLUMNS if col in columns})
+        problem = pl.lit(None, dtype=pl.String)
+        for name, col, kind in reversed(_quarantine_checks(columns)):
+            failed = {'extra': pl.col(col).is_not_null(), 'missing': pl.col(col).is_null(),
+                      'unparsed': pl.col(col).is_not_null() & parsed.get(col, pl.col(col)).is_null()}[kind]
+            problem = pl.when(failed).then(pl.lit(name)).otherwise(problem)
+        return (scan.with_columns(problem.alias('_problem'), *(expr.alias(col) for col, expr in parsed.items()))
+                .drop(EXTRA_FIELDS))
+
+    @classmethod
+    def open(cls, path=DATA_PATH):
+        import polars as pl
+
+        files = source_files(path)
+        rejected = None
+        if all(file.endswith('.parquet') for file in files):
+            scan = pl.scan_parquet(files)
+            schema = scan.collect_schema()
+            typed = [pl.col(col).str.strptime(pl.Date, DATE_FORMAT) if schema[col] == pl.String
+                     else pl.col(col).cast(pl.Date) for col in DATE_COLUMNS]
+        else:
+            # Every file in its own sniffed format; malformed rows are left out
+            # by the rules SourceReader quarantines them by
+            checked = pl.concat([cls._scan_csv(file) for file in files], how='diagonal')
+            scan = checked.filter(pl.col('_problem').is_null()).drop('_problem')
+            rejected = checked.filter(pl.col('_problem').is_not_null()).group_by('_problem').len()
+            typed = []
+        schema = scan.collect_schema()
+        typed += [pl.col(col).cast(pl.Int64) for col in INTEGER_COLUMNS if col in schema]
+        typed += [pl.col(col).cast(pl.Float64) for col in FLOAT_COLUMNS if col in schema]
+
+        order_date = pl.col('Order Date')
+        scan = scan.with_columns(typed).with_columns(
+            order_date.dt.year().alias('Year'),
+            order_date.dt.month().alias('Month'),
+            order_date.dt.quarter().alias('Quarter'),
+            order_date.dt.strftime('%B').alias('Month_Name'),
+            order_date.dt.strftime('%A').alias('Weekday'),
+        )
+        return cls(scan, rejected=rejected)
+
+    def select(self, start=None, end=None, regions=None, categories=None, segments=None):
+        return PolarsBackend(self.scan, _filters(start, end, regions, categories, segments), self.rejected)
+
+    def quarantined(self):
+        # {problem: rows} of the malformed source rows left out
+        if self.rejected is None:
+            return {}
+        return dict(self.rejected.sort('_problem').collect().iter_rows())
+
+    def _rows(self):
+        import polars as pl
+
+        scan = self.scan
+        start, end, values = self.filters['start'], self.filters['end'], self.filters['values']
+        if start is not None:
+            scan = scan.filter(pl.col('Order Date') >= start.date())
+        if end is not None:
+            scan = scan.filter(pl.col('Order Date') <= end.date())
+        for col, labels in values.items():
+            scan = scan.filter(pl.col(col).is_in([str(label) for label in labels]))
+        return scan
+
+    def _measure(self, column, agg):
+        import polars as pl
+
+        if agg == 'sum':
+            return pl.col(column).sum().alias(column)
+        if agg == 'count':
+            return pl.len().alias(column)
+        return pl.col(column).drop_nulls().n_unique().cast(pl.Int64).alias(column)
+
+    def aggregate(self, plan):
+        import polars as pl
+
+        rows = self._rows()
+        queries = []
+        for dim, metrics in plan.dimensions.items():
+            keys = list(dim) if isinstance(dim, tuple) else [dim]
+            queries.append(rows.drop_nulls(keys).group_by(keys)
+                           .agg([self._measure(column, agg) for column, agg in metrics]))
+        # One collect_all: the shared filtered scan is read once for every dimension
+        frames = pl.collect_all(queries)
+        return {dim: _shape_groups(frame.to_pandas(), dim, metrics)
+                for (dim, metrics), frame in zip(plan.dimensions.items(), frames)}
+
+    def kpis(self):
+        import polars as pl
+
+        totals = self._rows().select(
+            pl.col('Sales').sum(), pl.col('Profit').sum(),
+            pl.col('Order ID').drop_nulls().n_unique().alias('orders'),
+            pl.col('Order Date').min().alias('date_min'), pl.col('Order Date').max().alias('date_max'),
+        ).collect().row(0)
+        return _kpis(*totals)
+
+    def top_k(self, key_column, value_column, k, label_column=None):
+        import polars as pl
+
+        measures = [pl.col(value_column).sum()]
+        if label_column is not None:
+            # Group aggregations keep row order, so first() is the key's first row
+            measures.append(pl.col(label_column).first())
+        ranked = (self._rows().drop_nulls(key_column).group_by(key_column).agg(measures)
+                  .sort([value_column, key_column], descending=[True, False]).head(k).collect())
+        labels = None if label_column is None else ranked[label_column].to_numpy()
+        return _ranking(ranked[key_column].to_list(), ranked[value_column].to_numpy(), labels, value_column)
+
+    def ship_histogram(self):
+        import polars as pl
+
+        ship_days = (pl.col('Ship Date') - pl.col('Order Date')).dt.total_days().alias('Days_to_Ship')
+        grouped = (self._rows().drop_nulls(['Order Date', 'Ship Date'] + SHIP_DIMENSIONS)
+                   .with_columns(ship_days).group_by(SHIP_KEYS).agg(pl.len().alias('Lines'))
+                   .sort(SHIP_KEYS).collect().to_pandas())
+        return ShipTimeHistogram.from_frame(grouped, counts=grouped['Lines'])
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(text):
+    return "'" + text.replace("'", "''") + "'"
+
+
+class DuckDBBackend:
+    name = 'duckdb'
+
+    def __init__(self, connection, filters=None):
+        self.connection = connection
+        self.filters = filters or _filters()
+
+    @staticmethod
+    def _read_csv(file):
+        # SELECT over one CSV source in its sniffed format, typed, with the
+        # problem that would quarantine each row (NULL for good rows) in _problem
+        fmt = sniff_format(file)
+        columns = _header(file, fmt)
+        types = ', '.join(f"{_literal(col)}: 'VARCHAR'" for col in columns + [EXTRA_FIELDS])
+        source = (f"read_csv({_literal(os.path.abspath(_utf8_source(file, fmt)))}, header = false, skip = 1, "
+                  f"auto_detect = false, delim = {_literal(fmt.delimiter)}, quote = '\"', escape = '\"', "
+                  f"null_padding = true, strict_mode = false, filename = true, columns = {{{types}}})")
+
+        parsed = {col: f"try_strptime({_quote(col)}, {_literal(fmt.date_format)})::DATE"
+                  for col in DATE_COLUMNS if col in columns}
+        parsed.update({col: f"TRY_CAST(trim({_quote(col)}) AS DOUBLE)" for col in NUMERIC_COLUMNS if col in columns})
+        failed = {'extra': '{0} IS NOT NULL', 'missing': '{0} IS NULL', 'unparsed': '{0} IS NOT NULL AND {1} IS NULL'}
+        problem = ' '.join(f"WHEN {failed[kind].format(_quote(col), parsed.get(col))} THEN {_literal(name)}"
+                           for name, col, kind in _quarantine_checks(columns))
+        replaced = ', '.join(f"{sql} AS {_quote(col)}" for col, sql in parsed.items())
+        return (f"SELECT * EXCLUDE ({_quote(EXTRA_FIELDS)}) REPLACE ({replaced}), "
+                f"CASE {problem} END AS _problem FROM {source}")
+
+    @classmethod
+    def open(cls, path=DATA_PATH, threads=None):
+        import duckdb
+
+        files = source_files(path)
+        connection = duckdb.connect(config={} if threads is None else {'threads': threads})
+        if all(file.endswith('.parquet') for file in files):
+            file_list = '[' + ', '.join(_literal(os.path.abspath(file)) for file in files) + ']'
+            dates = ', '.join(f"CAST({_quote(col)} AS DATE) AS {_quote(col)}" for col in DATE_COLUMNS)
+            checked = (f"SELECT * REPLACE ({dates}), NULL::VARCHAR AS _problem "
+                       f"FROM read_parquet({file_list}, filename = true)")
+        else:
+            # Every file in its own sniffed format; malformed rows are left out
+            # by the rules SourceReader quarantines them by
+            checked = ' UNION ALL BY NAME '.join(cls._read_csv(file) for file in files)
+        casts = ([f"CAST({_quote(col)} AS BIGINT) AS {_quote(col)}" for col in INTEGER_COLUMNS]
+                 + [f"CAST({_quote(col)} AS DOUBLE) AS {_quote(col)}" for col in FLOAT_COLUMNS])
+
+        # Views only: every query scans the files in place
+        connection.execute(f"CREATE VIEW checked AS {checked}")
+        connection.execute(f"CREATE VIEW typed AS SELECT * EXCLUDE (_problem) REPLACE ({', '.join(casts)}) "
+                           "FROM checked WHERE _problem IS NULL")
+        connection.execute("""
+            CREATE VIEW superstore AS SELECT *,
+                year("Order Date") AS "Year",
+                month("Order Date") AS "Month",
+                quarter("Order Date") AS "Quarter",
+                monthname("Order Date") AS "Month_Name",
+                dayname("Order Date") AS "Weekday"
+            FROM typed
+        """)
+        return cls(connection)
+
+    def select(self, start=None, end=None, regions=None, categories=None, segments=None):
+        return DuckDBBackend(self.connection, _filters(start, end, regions, categories, segments))
+
+    def quarantined(self):
+        # {problem: rows} of the malformed source rows left out
+        return dict(self.connection.execute(
+            'SELECT _problem, count(*) FROM checked WHERE _problem IS NOT NULL GROUP BY _problem ORDER BY _problem'
+        ).fetchall())
+
+    def _where(self, *not_null):
+        clauses, params = [], []
+        if self.filters['start'] is not None:
+            clauses.append('"Order Date" >= ?')
+            params.append(self.filters['start'].date())
+        if self.filters['end'] is not None:
+            clauses.append('"Order Date" <= ?')
+            params.append(self.filters['end'].date())
+        for col, labels in self.filters['values'].items():
+            if labels:
+                clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(labels))})")
+                params.extend(str(label) for label in labels)
+            else:
+                clauses.append('FALSE')
+        clauses += [f"{_quote(col)} IS NOT NULL" for col in not_null]
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def _query(self, sql, params):
+        return self.connection.execute(sql, params).df()
+
+    def _integer_columns(self):
+        types = self.connection.execute('DESCRIBE superstore').fetchall()
+        return {name for name, kind, *_ in types if kind in ('BIGINT', 'INTEGER', 'SMALLINT', 'TINYINT')}
+
+    def aggregate(self, plan):
+        # Every dimension in one scan with GROUPING SETS; rows are told apart by GROUPING()
+        keys = plan.key_columns()
+        integers = self._integer_columns()
+        measures = {}
+        for metrics in plan.dimensions.values():
+            for column, agg in metrics:
+                name = f"{agg}:{column}"
+                if agg == 'sum':
+                    total = f"sum({_quote(column)})"
+                    measures[name] = f"CAST({total} AS BIGINT)" if column in integers else total
+                elif agg == 'count':
+                    measures[name] = "count(*)"
+                else:
+                    measures[name] = f"count(DISTINCT {_quote(column)})"
+
+        dims = list(plan.dimensions)
+        sets = ', '.join('(' + ', '.join(_quote(col) for col in (dim if isinstance(dim, tuple) else (dim,))) + ')'
+                         for dim in dims)
+        where, params = self._where()
+        grouped = self._query(
+            f"SELECT {', '.join(_quote(col) for col in keys)}, "
+            f"GROUPING({', '.join(_quote(col) for col in keys)}) AS _grouping, "
+            + ', '.join(f"{sql} AS {_quote(name)}" for name, sql in measures.items())
+            + f" FROM superstore{where} GROUP BY GROUPING SETS ({sets})", params)
+
+        results = {}
+        for dim in dims:
+            columns = dim if isinstance(dim, tuple) else (dim,)
+            # GROUPING() sets a bit for every key column *not* in the set, first key highest
+            grouping = sum(1 << (len(keys) - 1 - i) for i, col in enumerate(keys) if col not in columns)
+            metrics = plan.dimensions[dim]
+            frame = grouped[grouped['_grouping'] == grouping]
+            frame = pd.DataFrame({**{col: frame[col] for col in columns},
+                                  **{column: frame[f"{agg}:{column}"] for column, agg in metrics}})
+            for col in columns:
+                if col in integers or col in ('Year', 'Month', 'Quarter'):
+                    frame[col] = frame[col].astype(np.int64)
+            results[dim] = _shape_groups(frame, dim, metrics)
+        return results
+
+    def kpis(self):
+        where, params = self._where()
+        totals = self.connection.execute(
+            'SELECT sum("Sales"), sum("Profit"), count(DISTINCT "Order ID"), '
+            f'min("Order Date"), max("Order Date") FROM superstore{where}', params).fetchone()
+        return _kpis(*totals)
+
+    def top_k(self, key_column, value_column, k, label_column=None):
+        key, value = _quote(key_column), _quote(value_column)
+        # The label on the key's first row: files in source order, rows by Row ID
+        # (which increases down every Superstore extract)
+        label = ('' if label_column is None
+                 else f', first({_quote(label_column)} ORDER BY filename, "Row ID") AS label')
+        where, params = self._where(key_column)
+        ranked = self._query(
+            f"SELECT {key} AS key, sum({value}) AS total{label} FROM superstore{where} "
+            f"GROUP BY {key} ORDER BY total DESC, key LIMIT {int(k)}", params)
+        labels = None if label_column is None else ranked['label'].to_numpy(dtype=object)
+        return _ranking(ranked['key'].tolist(), ranked['total'].to_numpy(), labels, value_column)
+
+    def ship_histogram(self):
+        where, params = self._where('Order Date', 'Ship Date', *SHIP_DIMENSIONS)
+        keys = ', '.join(_quote(col) for col in SHIP_KEYS)
+        grouped = self._query(
+            f"SELECT {', '.join(_quote(col) for col in ['Order Date'] + SHIP_DIMENSIONS)}, "
+            f"date_diff('day', {_quote('Order Date')}, {_quote('Ship Date')}) AS {_quote('Days_to_Ship')}, "
+            f"count(*) AS {_quote('Lines')} "
+            f"FROM superstore{where} GROUP BY ALL ORDER BY {keys}", params)
+        grouped['Order Date'] = pd.to_datetime(grouped['Order Date'])
+        return ShipTimeHistogram.from_frame(grouped, counts=grouped['Lines'])
+
+
+BACKENDS = {
+    'pandas': PandasBackend,
+    'polars': PolarsBackend,
+    'duckdb': DuckDBBackend,
+}
+
+
+def open_backend(name=DEFAULT_BACKEND, path=DATA_PATH, **options):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}; choose one of {', '.join(BACKENDS)}")
+    return BACKENDS[name].open(path, **options)
+
+
+def available_backends():
+    # Polars and DuckDB are optional installs
+    names = ['pandas']
+    for name, module in (('polars', 'polars'), ('duckdb', 'duckdb')):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+# Cross-backend check: the selections the dashboard's sidebar typically produces
+CHECK_SELECTIONS = [
+    ('everything', {}),
+    ('one region', {'regions': ['West']}),
+    ('date range', {'start': '2016-03-01', 'end': '2016-09-30'}),
+    ('category + segment', {'categories': ['Technology', 'Furniture'], 'segments': ['Corporate']}),
+]
+
+
+def _compare(expected, actual, where):
+    # -> list of mismatch descriptions between two report values
+    try:
+        if isinstance(expected, pd.DataFrame):
+            pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_index_type=False,
+                                          check_names=False, rtol=CHECK_RTOL)
+        elif isinstance(expected, pd.Series):
+            pd.testing.assert_series_equal(expected, actual, check_dtype=False, check_index_type=False,
+                                           check_names=False, rtol=CHECK_RTOL)
+        elif isinstance(expected, dict):
+            problems = []
+            for key in expected:
+                problems += _compare(expected[key], actual.get(key), f"{where}.{key}")
+            return problems
+        elif isinstance(expected, (int, float, np.number)):
+            if not np.isclose(expected, actual, rtol=CHECK_RTOL, atol=0):
+                return [f"{where}: {expected!r} != {actual!r}"]
+        elif expected != actual:
+            return [f"{where}: {expected!r} != {actual!r}"]
+    except AssertionError as e:
+        return [f"{where}: {str(e).strip().splitlines()[0]}"]
+    return []
+
+
+def backend_results(backend, plan, top_n=5):
+    # Raw outputs of every operation the report uses, before any rounding
+    return {
+        'aggregate': {str(dim): table for dim, table in backend.aggregate(plan).items()},
+        'kpis': backend.kpis(),
+        'top_products': backend.top_k('Product ID', 'Sales', top_n, label_column='Product Name'),
+        'top_customers': backend.top_k('Customer ID', 'Sales', top_n, label_column='Customer Name'),
+        'shipping': backend.ship_histogram().everything().summary('Ship Mode').sort_index(),
+    }
+
+
+def check_backends(path=DATA_PATH, names=None, log=print):
+    # Runs the report's operations on every backend and selection; -> number of mismatches.
+    # Compared unrounded: a last-bit difference can flip a value rounded to cents.
+    from report import REPORT_PLAN
+
+    names = names or available_backends()
+    backends = {name: open_backend(name, path) for name in names}
+    reference = names[0]
+    mismatches = 0
+    for label, filters in CHECK_SELECTIONS:
+        results = {name: backend_results(backend.select(**filters), REPORT_PLAN)
+                   for name, backend in backends.items()}
+        for name in names[1:]:
+            problems = _compare(results[reference], results[name], name)
+            mismatches += len(problems)
+            status = '✅' if not problems else '❌'
+            log(f"{status} {label:<20} {reference} vs {name}")
+            for problem in problems:
+                log(f"   {problem}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that every compute backend produces the same report")
+    parser.add_argument('path', nargs='?', default=DATA_PATH,
+                        help="Superstore CSV extract, or a directory / glob of partition files")
+    parser.add_argument('--backend', action='append', dest='backends', choices=list(BACKENDS),
+                        help="backends to compare, first one is the reference; repeatable "
+                             "(default: every installed backend)")
+    args = parser.parse_args()
+
+    print(f"🔬 Comparing backends on {args.path}")
+    mismatches = check_backends(args.path, args.backends)
+    if mismatches:
+        print(f"❌ {mismatches} mismatch(es) between backends")
+        raise SystemExit(1)
+    print("✅ Every backend produced the same results")
+
+
+if __name__ == '__main__':
+    main()
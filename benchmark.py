@@ -0,0 +1,329 @@
+"""Scaling benchmark for the load, dashboard and report pipeline stages.
+
+Generates (or reuses) a seeded synthetic extract of the requested size, then
+times every stage the dashboard and analysis.py go through: CSV parsing, date
+derivation, schema compaction, cached load, column-store open, index builds,
+filtering, KPIs, each breakdown chart, rolling windows, top-K, drill-down
+rollups, ship-time percentiles, sampled estimates, insights, export and the
+full report. Each stage is timed over a few repeats (best run wins) and then
+run once more under tracemalloc for its peak allocation. Results are written
+as JSON and can be compared against a stored baseline with slowdown /
+memory-growth thresholds.
+
+    python benchmark.py --rows 1M --output bench-1M.json
+    python benchmark.py --rows 1M --baseline bench-1M.json --max-slowdown 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from column_store import open_column_store
+from cube import SalesCube
+from daily_index import DailyIndex
+from data_store import load_superstore, prepare_frame, read_source
+from export import write_export
+from filter_index import FilterIndex
+from orders import OrderTable
+from report import build_report
+from rollups import HIERARCHIES, Hierarchy
+from sampling import StratifiedSample
+from schema import apply_schema
+from shipping import ShipTimeHistogram
+from synthetic import generate_csv, parse_size
+from topk import key_labels, top_k_by_key
+
+DEFAULT_DATA_DIR = 'data/synthetic'
+DEFAULT_REPEAT = 3
+
+# Differences below these floors are noise, never regressions
+MIN_SECONDS = 0.005
+MIN_MEGABYTES = 1.0
+
+
+def _stage_parse_csv(state):
+    state['raw'] = read_source(state['path'])
+
+
+def _stage_derive_dates(state):
+    state['prepared'] = prepare_frame(state['raw'].copy())
+
+
+def _stage_apply_schema(state):
+    state['frame'] = apply_schema(state['prepared'].copy())
+
+
+def _stage_load_cached(state):
+    load_superstore(state['path'])
+
+
+def _stage_open_column_store(state):
+    open_column_store(state['path'])
+
+
+def _stage_build_indexes(state):
+    df = state['frame']
+    state['filter_index'] = FilterIndex.from_frame(df)
+    state['cube'] = SalesCube.from_frame(df)
+    state['daily_index'] = DailyIndex.from_cube(state['cube'])
+    state['orders'] = OrderTable.from_frame(df)
+    state['labels'] = {key: key_labels(state['filter_index'].frame, key, label)
+                       for key, label in (('Product ID', 'Product Name'), ('Customer ID', 'Customer Name'))}
+    state['hierarchies'] = {name: Hierarchy.from_frame(state['filter_index'].frame, name) for name in HIERARCHIES}
+    state['sample'] = StratifiedSample.from_frame(state['filter_index'].frame)
+    state['shipping'] = ShipTimeHistogram.from_frame(df)
+
+
+def _filters(state):
+    # A representative sidebar state: the middle half of the date range, half the regions
+    first, last = state['filter_index'].date_bounds()
+    span = last - first
+    regions = state['filter_index'].values('Region')
+    return first + span / 4, last - span / 4, regions[:max(1, len(regions) // 2)]
+
+
+def _stage_filter(state):
+    start, end, regions = _filters(state)
+    state['selection'] = state['filter_index'].select(start, end, region=regions)
+    state['cube_selection'] = state['cube'].select(start, end, regions)
+    state['order_selection'] = state['orders'].select(start, end, regions)
+
+
+def _stage_kpis(state):
+    totals = state['cube_selection'].totals()
+    overall = state['cube'].everything().totals()
+    orders = state['order_selection']
+    return totals['Sales'] / overall['Sales'], orders.count, orders.avg_order_value
+
+
+def _stage_chart_monthly_trend(state):
+    state['cube_selection'].by_month()[['Sales', 'Profit']]
+
+
+def _stage_chart_rolling(state):
+    # Range totals, rolling windows and period comparisons from the daily running sums
+    start, end, regions = _filters(state)
+    daily_index = state['daily_index']
+    daily_index.totals(start, end, regions)
+    daily_index.rolling('Sales', start, end, regions)
+    daily_index.compare('Sales', start, end, regions)
+
+
+def _stage_chart_region(state):
+    state['regional_data'] = state['cube_selection'].by('Region')[['Sales', 'Profit']]
+
+
+def _stage_chart_category(state):
+    category = state['cube_selection'].by('Category')[['Sales', 'Profit']]
+    category['Profit_Margin'] = category['Profit'] / category['Sales'] * 100
+    state['category_data'] = category
+
+
+def _stage_chart_segment(state):
+    state['cube_selection'].by('Segment', distinct=['Customer ID'])
+
+
+def _stage_top_k(state):
+    df, rows = state['filter_index'].frame, state['selection'].positions
+    top_k_by_key(df, 'Product ID', 'Sales', 10, rows=rows, label_column='Product Name',
+                 labels=state['labels']['Product ID'])
+    top_k_by_key(df, 'Customer ID', 'Sales', 10, rows=rows, label_column='Customer Name',
+                 labels=state['labels']['Customer ID'])
+
+
+def _stage_drilldown(state):
+    # Both hierarchies rolled up for the filter state, then the biggest leaf level paged
+    df, rows = state['filter_index'].frame, state['selection'].positions
+    for hierarchy in state['hierarchies'].values():
+        rollup = hierarchy.rollup(df, rows)
+        parent = rollup.children(1, rollup.children(0)[0])[0]
+        rollup.page(2, parent, 'Profit_Margin')
+
+
+def _stage_shipping(state):
+    # Percentiles and late rates per breakdown, distributions and the monthly late rate
+    start, end, regions = _filters(state)
+    selection = state['shipping'].select(start, end, regions)
+    for dimension in (None, 'Ship Mode', 'Region', 'State'):
+        selection.summary(dimension)
+    selection.distribution('Ship Mode')
+    selection.late_by_month()
+
+
+def _stage_estimate_view(state):
+    # The approximate-first answer for the filter state: order KPIs and top 10s from the sample
+    start, end, regions = _filters(state)
+    state['sample'].estimate_view(start, end, regions)
+
+
+def _stage_insights(state):
+    state['regional_data']['Sales'].idxmax()
+    state['category_data']['Profit_Margin'].idxmax()
+    state['cube_selection'].by_month_name()['Sales'].idxmax()
+
+
+def _stage_export(state):
+    # What a download click does on a cache miss: chunked gzip CSV to a file
+    target = os.path.join(tempfile.gettempdir(), f"benchmark-export-{os.getpid()}.csv.gz")
+    try:
+        write_export(state['selection'], 'csv.gz', target)
+    finally:
+        if os.path.exists(target):
+            os.remove(target)
+
+
+def _stage_analysis_report(state):
+    build_report(state['frame'])
+
+
+# In pipeline order; later stages read what earlier ones left in `state`
+STAGES = [
+    ('parse_csv', _stage_parse_csv),
+    ('derive_dates', _stage_derive_dates),
+    ('apply_schema', _stage_apply_schema),
+    ('load_cached', _stage_load_cached),
+    ('open_column_store', _stage_open_column_store),
+    ('build_indexes', _stage_build_indexes),
+    ('filter', _stage_filter),
+    ('kpis', _stage_kpis),
+    ('chart_monthly_trend', _stage_chart_monthly_trend),
+    ('chart_rolling', _stage_chart_rolling),
+    ('chart_region', _stage_chart_region),
+    ('chart_category', _stage_chart_category),
+    ('chart_segment', _stage_chart_segment),
+    ('top_k', _stage_top_k),
+    ('drilldown', _stage_drilldown),
+    ('shipping', _stage_shipping),
+    ('estimate_view', _stage_estimate_view),
+    ('insights', _stage_insights),
+    ('export', _stage_export),
+    ('analysis_report', _stage_analysis_report),
+]
+
+
+def measure(stage, state, repeat=DEFAULT_REPEAT):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage(state)
+        timings.append(time.perf_counter() - start)
+
+    # Separate traced run: tracemalloc slows Python-heavy code down
+    tracemalloc.start()
+    try:
+        stage(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(timings), 'median_seconds': float(np.median(timings)), 'peak_mb': peak / 1024 ** 2}
+
+
+def run_benchmark(path, repeat=DEFAULT_REPEAT, stages=None, log=None):
+    log = log or (lambda message: None)
+    # Warm the Parquet cache and column store so the load stages measure cache hits
+    load_superstore(path)
+    open_column_store(path)
+    state = {'path': path}
+    results = {}
+    for name, stage in STAGES:
+        if stages and name not in stages and name not in _dependencies(stages):
+            continue
+        results[name] = measure(stage, state, repeat)
+        log(f"   {name:<22} {results[name]['seconds'] * 1000:>10.1f} ms  {results[name]['peak_mb']:>9.1f} MB peak")
+    return results
+
+
+def _dependencies(stages):
+    # Stages only run in pipeline order, so anything before a requested stage is needed
+    names = [name for name, _ in STAGES]
+    last = max(names.index(name) for name in stages)
+    return set(names[:last])
+
+
+def dataset_path(rows, seed, data_dir=DEFAULT_DATA_DIR, log=None):
+    path = os.path.join(data_dir, f"superstore-{rows}-seed{seed}.csv")
+    if not os.path.exists(path):
+        (log or print)(f"🏭 Generating {rows:,} synthetic rows → {path}")
+        generate_csv(path, rows, seed, log=log)
+    return path
+
+
+def compare(results, baseline, max_slowdown, max_memory_growth):
+    # -> list of (stage, metric, baseline value, current value) that regressed
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if (current['seconds'] > previous['seconds'] * (1 + max_slowdown)
+                and current['seconds'] - previous['seconds'] > MIN_SECONDS):
+            regressions.append((name, 'seconds', previous['seconds'], current['seconds']))
+        if (current['peak_mb'] > previous['peak_mb'] * (1 + max_memory_growth)
+                and current['peak_mb'] - previous['peak_mb'] > MIN_MEGABYTES):
+            regressions.append((name, 'peak_mb', previous['peak_mb'], current['peak_mb']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic data")
+    parser.add_argument('--rows', default='100K', help="dataset size, e.g. 100K, 1M, 10M, 100M")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data', help="benchmark this CSV instead of a generated one")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="where generated datasets are kept")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--stage', action='append', dest='stages',
+                        help="only run this stage (and the stages it depends on); repeatable")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--baseline', help="compare against a JSON file written by --output")
+    parser.add_argument('--max-slowdown', type=float, default=0.25,
+                        help="fail when a stage is this much slower than the baseline (0.25 = 25%%)")
+    parser.add_argument('--max-memory-growth', type=float, default=0.25,
+                        help="fail when a stage's peak memory grows this much over the baseline")
+    args = parser.parse_args()
+
+    rows = parse_size(args.rows)
+    path = args.data or dataset_path(rows, args.seed, args.data_dir)
+    print(f"⏱️  Benchmarking {path}")
+    results = run_benchmark(path, args.repeat, args.stages, log=print)
+
+    payload = {
+        'meta': {
+            'path': path,
+            'rows': None if args.data else rows,
+            'seed': None if args.data else args.seed,
+            'repeat': args.repeat,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'stages': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['stages']
+        regressions = compare(results, baseline, args.max_slowdown, args.max_memory_growth)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for name, metric, before, after in regressions:
+                print(f"   {name:<22} {metric:<8} {before:>10.4f} → {after:>10.4f}")
+            raise SystemExit(1)
+        print(f"✅ No regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""Memory-mapped column store shared by every dashboard process on a host.
+
+The preprocessed frame is written column by column as contiguous .npy files
+(numeric arrays, categorical codes, datetime64 ordinals and the values/mask
+pairs of nullable integers), and string category labels as uncompressed Arrow
+IPC files. Every Streamlit worker opens them with np.load(mmap_mode='r') and
+pyarrow.memory_map and wraps them in a DataFrame without copying, so all
+processes read the same page-cache pages and none keeps a private copy of
+the dataset (Order ID alone has one label per order). Rows are stored sorted
+by Order Date so FilterIndex can use the frame as is; each row's position in
+the source order is stored with them, so appended rows can still be found.
+
+Each build is written to a new generation directory and published by
+atomically replacing the CURRENT pointer file. Workers that already mapped
+an older generation keep reading it undisturbed (its files stay valid while
+mapped); the newest KEEP_GENERATIONS generations are kept on disk and older
+ones are removed. Concurrent builders serialize on a lock file.
+
+    python column_store.py build [path]
+    python column_store.py status [path]
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_PATH, cache_dir, dataset_version, load_sources, source_files
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialized across processes
+    fcntl = None
+
+STORE_FORMAT = 3
+KEEP_GENERATIONS = 2
+POINTER = 'CURRENT'
+
+
+def store_dir(path=DATA_PATH):
+    # Next to the Parquet cache for a single extract; beside the directory /
+    # glob (keyed on its spelling) for partitioned input
+    if source_files(path) == [path]:
+        return os.path.join(cache_dir(path), 'columns')
+    digest = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=6).hexdigest()
+    parent = os.path.dirname(os.path.abspath(path.rstrip(os.sep)))
+    return os.path.join(parent, f".superstore-columns-{digest}")
+
+
+@contextmanager
+def _build_lock(directory):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def current_generation(directory):
+    try:
+        with open(os.path.join(directory, POINTER), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _generations(directory):
+    names = [name for name in os.listdir(directory) if name.startswith('gen-') and not name.endswith('.tmp')]
+    return sorted(names, key=lambda name: int(name.split('-')[1]))
+
+
+def _save(directory, name, values):
+    np.save(os.path.join(directory, name), np.ascontiguousarray(values), allow_pickle=False)
+    return name
+
+
+def _save_labels(directory, name, labels):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = pa.table({'labels': pa.array(np.asarray(labels, dtype=object), type=pa.large_string())})
+    feather.write_feather(table, os.path.join(directory, name), compression='uncompressed')
+    return name
+
+
+def _is_text(labels):
+    return labels.dtype == object and pd.api.types.infer_dtype(labels, skipna=False) == 'string'
+
+
+def write_store(df, directory, source_version, source_rows=None):
+    # Writes a new generation and publishes it; -> generation name. Call under _build_lock
+    os.makedirs(directory, exist_ok=True)
+    existing = _generations(directory)
+    generation = f"gen-{int(existing[-1].split('-')[1]) + 1 if existing else 1}"
+    target = os.path.join(directory, generation)
+    tmp = f"{target}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns, categories = [], {}
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        stem = f"col{i:03d}"
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            column = {'name': col, 'kind': 'categorical', 'ordered': bool(series.cat.ordered),
+                      'codes': _save(tmp, f"{stem}.npy", series.cat.codes.to_numpy())}
+            if _is_text(series.cat.categories):
+                column['labels'] = _save_labels(tmp, f"{stem}.labels.arrow", series.cat.categories)
+            else:
+                categories[col] = series.cat.categories
+            columns.append(column)
+        elif isinstance(series.array, (pd.arrays.IntegerArray, pd.arrays.FloatingArray)):
+            columns.append({'name': col, 'kind': 'masked',
+                            'values': _save(tmp, f"{stem}.npy", series.array._data),
+                            'mask': _save(tmp, f"{stem}.mask.npy", series.array._mask)})
+        elif isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufM':
+            columns.append({'name': col, 'kind': 'array', 'values': _save(tmp, f"{stem}.npy", series.to_numpy())})
+        else:
+            # Anything else (free text) is stored dictionary-encoded
+            encoded = pd.Categorical(series)
+            columns.append({'name': col, 'kind': 'categorical', 'ordered': False,
+                            'codes': _save(tmp, f"{stem}.npy", encoded.codes),
+                            'labels': _save_labels(tmp, f"{stem}.labels.arrow", encoded.categories.astype(str))})
+
+    with open(os.path.join(tmp, 'categories.pkl'), 'wb') as f:
+        pickle.dump(categories, f, protocol=pickle.HIGHEST_PROTOCOL)
+    manifest = {'format': STORE_FORMAT, 'source_version': source_version, 'rows': len(df), 'columns': columns}
+    if source_rows is not None:
+        manifest['source_rows'] = _save(tmp, 'source_rows.npy', np.asarray(source_rows, dtype=np.int64))
+    with open(os.path.join(tmp, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+
+    # Publish: the generation directory appears whole, then the pointer flips
+    os.replace(tmp, target)
+    pointer_tmp = os.path.join(directory, f"{POINTER}.{os.getpid()}.tmp")
+    with open(pointer_tmp, 'w', encoding='utf-8') as f:
+        f.write(generation)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(directory, POINTER))
+
+    for old in _generations(directory)[:-KEEP_GENERATIONS]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return generation
+
+
+def read_manifest(directory, generation=None):
+    generation = generation or current_generation(directory)
+    if generation is None:
+        return None
+    try:
+        with open(os.path.join(directory, generation, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('format') == STORE_FORMAT else None
+
+
+def read_store(directory, generation=None):
+    # -> (memory-mapped, read-only DataFrame, manifest), or None without a usable generation
+    generation = generation or current_generation(directory)
+    manifest = read_manifest(directory, generation)
+    if manifest is None:
+        return None
+    base = os.path.join(directory, generation)
+    with open(os.path.join(base, 'categories.pkl'), 'rb') as f:
+        categories = pickle.load(f)
+
+    def mapped(name):
+        # Plain read-only ndarray view of the mapping (the memmap subclass leaks into results)
+        return np.load(os.path.join(base, name), mmap_mode='r', allow_pickle=False).view(np.ndarray)
+
+    def mapped_labels(name):
+        import pyarrow as pa
+
+        table = pa.ipc.open_file(pa.memory_map(os.path.join(base, name))).read_all()
+        return pd.Index(pd.arrays.ArrowStringArray(table.column('labels')))
+
+    data = {}
+    for column in manifest['columns']:
+        name, kind = column['name'], column['kind']
+        if kind == 'categorical':
+            labels = mapped_labels(column['labels']) if 'labels' in column else categories[name]
+            data[name] = pd.Categorical.from_codes(mapped(column['codes']), categories=labels,
+                                                   ordered=column['ordered'], validate=False)
+            # The uniqueness check leaves a hash engine over every label (a Python
+            # string each) cached on the index; drop it, lookups rebuild it lazily
+            labels._cache.pop('_engine', None)
+        elif kind == 'masked':
+            values, mask = mapped(column['values']), mapped(column['mask'])
+            masked = pd.arrays.IntegerArray if values.dtype.kind in 'iu' else pd.arrays.FloatingArray
+            data[name] = masked(values, mask)
+        else:
+            data[name] = mapped(column['values'])
+    # copy=False keeps one block per column, each a view of its mapped file
+    frame = pd.DataFrame(data, copy=False)
+    manifest['generation'] = generation
+    if 'source_rows' in manifest:
+        manifest['source_rows'] = mapped(manifest['source_rows'])
+    return frame, manifest
+
+
+def _publish(path, directory, version, log):
+    # Loads the sources (through the Parquet caches) and writes a new generation
+    df = load_sources(path, log=log)
+    order = np.argsort(df['Order Date'].to_numpy(), kind='stable')
+    df = df.take(order).reset_index(drop=True)
+    generation = write_store(df, directory, version, source_rows=order)
+    log(f"💾 Column store {generation} written to {directory} ({len(df):,} rows)")
+    return generation
+
+
+def build_store(path=DATA_PATH, log=None):
+    directory = store_dir(path)
+    with _build_lock(directory):
+        return _publish(path, directory, dataset_version(path), log or (lambda message: None))
+
+
+def open_column_store(path=DATA_PATH, log=None, with_manifest=False):
+    # Memory-mapped frame for `path`, rebuilt first when the sources changed;
+    # (frame, manifest) with with_manifest=True
+    directory = store_dir(path)
+    version = dataset_version(path)
+    store = read_store(directory) if os.path.isdir(directory) else None
+    if store is None or store[1]['source_version'] != version:
+        with _build_lock(directory):
+            # Another process may have published while we waited for the lock
+            store = read_store(directory)
+            if store is None or store[1]['source_version'] != version:
+                _publish(path, directory, version, log or (lambda message: None))
+                store = read_store(directory)
+    return store if with_manifest else store[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the memory-mapped column store")
+    parser.add_argument('command', choices=['build', 'status'])
+    parser.add_argument('path', nargs='?', default=DATA_PATH,
+                        help="Superstore CSV extract, or a directory / glob of partition CSVs")
+    args = parser.parse_args()
+
+    directory = store_dir(args.path)
+    if args.command == 'build':
+        build_store(args.path, log=print)
+        return
+
+    manifest = read_manifest(directory) if os.path.isdir(directory) else None
+    if manifest is None:
+        print(f"⚠️  No column store at {directory}")
+        raise SystemExit(1)
+    fresh = manifest['source_version'] == dataset_version(args.path)
+    size = sum(os.path.getsize(os.path.join(directory, current_generation(directory), name))
+               for name in os.listdir(os.path.join(directory, current_generation(directory))))
+    print(f"📦 {directory}")
+    print(f"   Generation: {current_generation(directory)} (kept: {', '.join(_generations(directory))})")
+    print(f"   Rows:       {manifest['rows']:,} in {len(manifest['columns'])} columns, {size / 1024 ** 2:.2f} MB")
+    print(f"   Sources:    {'✅ up to date' if fresh else '⚠️  changed since this build'}")
+
+
+if __name__ == '__main__':
+    main()
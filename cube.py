@@ -0,0 +1,201 @@
+"""Pre-aggregated sales cube at (order day x Region x Category x Segment).
+
+Additive measures are summed per cell once at load time, so a filter change
+only has to scan cube cells instead of raw line items. Distinct order and
+customer counts stay exact: every cell keeps the set of ID codes seen in it
+(as sorted (cell, id) pairs) and a selection unions the sets of its cells.
+"""
+import numpy as np
+import pandas as pd
+
+from schema import (CALENDAR_CATEGORIES, allowed_codes, dimension_codes, id_codes, id_lookup, measure_values,
+                    pack_key, unpack_key)
+
+CUBE_DIMENSIONS = ['Region', 'Category', 'Segment']
+MEASURES = ['Sales', 'Profit', 'Quantity']
+DISTINCT_COLUMNS = ['Order ID', 'Customer ID']
+
+
+def _day_numbers(dates):
+    return dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+class SalesCube:
+    def __init__(self, days, dim_codes, dim_values, measures, lines, id_pairs, id_counts):
+        self.days = days                # cell -> day number (days since epoch)
+        self.dim_codes = dim_codes      # dimension -> cell -> category code
+        self.dim_values = dim_values    # dimension -> category labels
+        self.measures = measures        # measure -> cell -> sum
+        self.lines = lines              # cell -> number of line items
+        self.id_pairs = id_pairs        # distinct column -> (cell array, id code array)
+        self.id_counts = id_counts      # distinct column -> size of the ID dictionary
+
+        # Month keys are derived once per cell for the trend and best-month views
+        cell_dates = days.astype('datetime64[D]')
+        self.month_index = cell_dates.astype('datetime64[M]').astype(np.int64)
+        self.month_of_year = (self.month_index % 12 + 1).astype(np.int8)
+
+    @classmethod
+    def from_frame(cls, df):
+        days = _day_numbers(df['Order Date'])
+        first_day = days.min() if len(days) else 0
+
+        # One combined integer key per row: (day, region, category, segment). A
+        # missing label gets its own code: its rows count in totals but match
+        # no filter or breakdown label
+        dim_values = {dim: id_lookup(df, dim) for dim in CUBE_DIMENSIONS}
+        codes, sizes = zip(*(dimension_codes(df, dim) for dim in CUBE_DIMENSIONS))
+        key = pack_key(days - first_day, codes, sizes)
+
+        cell_keys, cell_of_row = np.unique(key, return_inverse=True)
+        n_cells = len(cell_keys)
+
+        # Unpack cell keys back into their coordinates
+        cell_days, cell_codes = unpack_key(cell_keys, sizes)
+        cell_days = cell_days + first_day
+        dim_codes = dict(zip(CUBE_DIMENSIONS, cell_codes))
+
+        measures = {
+            m: np.bincount(cell_of_row, weights=measure_values(df, m), minlength=n_cells)
+            for m in MEASURES
+        }
+        lines = np.bincount(cell_of_row, minlength=n_cells)
+
+        id_pairs = {}
+        id_counts = {}
+        for col in DISTINCT_COLUMNS:
+            n_ids = len(id_lookup(df, col))
+            ids = id_codes(df, col).astype(np.int64)
+            # A missing ID is not a distinct value
+            pairs = np.unique(cell_of_row[ids >= 0].astype(np.int64) * n_ids + ids[ids >= 0])
+            id_pairs[col] = ((pairs // n_ids).astype(np.int64), (pairs % n_ids).astype(np.int64))
+            id_counts[col] = n_ids
+
+        return cls(cell_days, dim_codes, dim_values, measures, lines, id_pairs, id_counts)
+
+    @classmethod
+    def combine(cls, first, second):
+        # Cube over both row ranges; second's dictionaries must extend first's
+        # (as they do for rows appended to the cache), so codes line up as-is
+        # except the missing code, which moves to the end of the longer dictionary
+        days = np.concatenate([first.days, second.days])
+        codes, sizes = [], []
+        for dim in CUBE_DIMENSIONS:
+            missing = len(second.dim_values[dim])
+            first_codes = np.where(first.dim_codes[dim] == len(first.dim_values[dim]), missing, first.dim_codes[dim])
+            codes.append(np.concatenate([first_codes, second.dim_codes[dim]]))
+            sizes.append(missing + 1)
+        key = pack_key(days - (days.min() if len(days) else 0), codes, sizes)
+        cell_keys, first_cell, cell_of_old = np.unique(key, return_index=True, return_inverse=True)
+        n_cells = len(cell_keys)
+
+        dim_codes = {dim: dim_cell_codes[first_cell].astype(np.int32)
+                     for dim, dim_cell_codes in zip(CUBE_DIMENSIONS, codes)}
+        measures = {
+            m: np.bincount(cell_of_old, weights=np.concatenate([first.measures[m], second.measures[m]]),
+                           minlength=n_cells)
+            for m in MEASURES
+        }
+        lines = np.bincount(cell_of_old, weights=np.concatenate([first.lines, second.lines]),
+                            minlength=n_cells).astype(np.int64)
+
+        id_pairs = {}
+        offset = first.n_cells
+        for col in DISTINCT_COLUMNS:
+            n_ids = second.id_counts[col]
+            cells = np.concatenate([cell_of_old[first.id_pairs[col][0]], cell_of_old[second.id_pairs[col][0] + offset]])
+            ids = np.concatenate([first.id_pairs[col][1], second.id_pairs[col][1]])
+            pairs = np.unique(cells * n_ids + ids)
+            id_pairs[col] = (pairs // n_ids, pairs % n_ids)
+
+        return cls(days[first_cell], dim_codes, second.dim_values, measures, lines, id_pairs, dict(second.id_counts))
+
+    @property
+    def n_cells(self):
+        return len(self.days)
+
+    def select(self, start=None, end=None, regions=None, categories=None, segments=None):
+        mask = np.ones(self.n_cells, dtype=bool)
+        if start is not None:
+            mask &= self.days >= _day_numbers(pd.Series([pd.Timestamp(start)]))[0]
+        if end is not None:
+            mask &= self.days <= _day_numbers(pd.Series([pd.Timestamp(end)]))[0]
+        for dim, labels in zip(CUBE_DIMENSIONS, (regions, categories, segments)):
+            if labels is not None:
+                mask &= allowed_codes(self.dim_values[dim], labels)[self.dim_codes[dim]]
+        return CubeSelection(self, mask)
+
+    def everything(self):
+        return CubeSelection(self, np.ones(self.n_cells, dtype=bool))
+
+
+class CubeSelection:
+    def __init__(self, cube, mask):
+        self.cube = cube
+        self.mask = mask
+
+    @property
+    def is_empty(self):
+        return not self.cube.lines[self.mask].any()
+
+    def totals(self):
+        result = {m: float(self.cube.measures[m][self.mask].sum()) for m in MEASURES}
+        result['Lines'] = int(self.cube.lines[self.mask].sum())
+        return result
+
+    def distinct(self, column):
+        cells, ids = self.cube.id_pairs[column]
+        seen = np.zeros(self.cube.id_counts[column], dtype=bool)
+        seen[ids[self.mask[cells]]] = True
+        return int(seen.sum())
+
+    def _group(self, codes, labels, distinct=()):
+        # Cells whose code is past the labels (a missing label) are left out, like groupby's NaN keys
+        n_groups = len(labels)
+        selected = self.mask & (codes < n_groups)
+        codes = codes[selected]
+        table = pd.DataFrame(
+            {m: np.bincount(codes, weights=self.cube.measures[m][selected], minlength=n_groups)
+             for m in MEASURES},
+            index=labels,
+        )
+        table['Lines'] = np.bincount(codes, weights=self.cube.lines[selected], minlength=n_groups).astype(np.int64)
+
+        # Distinct IDs per group: dedupe (group, id) pairs drawn from the selected cells
+        group_of_cell = np.full(self.cube.n_cells, -1, dtype=np.int64)
+        group_of_cell[selected] = codes
+        for col in distinct:
+            cells, ids = self.cube.id_pairs[col]
+            groups = group_of_cell[cells]
+            keep = groups >= 0
+            pairs = np.unique(groups[keep] * self.cube.id_counts[col] + ids[keep])
+            table[col] = np.bincount(pairs // self.cube.id_counts[col], minlength=n_groups)
+
+        # Like a groupby(observed=True): only groups that have rows in the selection
+        return table[table['Lines'] > 0]
+
+    def by(self, dimension, distinct=()):
+        table = self._group(self.cube.dim_codes[dimension], self.cube.dim_values[dimension], distinct)
+        table.index.name = dimension
+        return table
+
+    def by_month(self, distinct=()):
+        if self.mask.any():
+            first = self.cube.month_index[self.mask].min()
+            last = self.cube.month_index[self.mask].max()
+            months = pd.period_range(
+                pd.Period(np.datetime64(int(first), 'M'), freq='M'),
+                periods=int(last - first) + 1, freq='M',
+            )
+            # Cells outside the selection are masked away inside _group, so the offset is safe
+            codes = np.clip(self.cube.month_index - first, 0, len(months) - 1)
+        else:
+            months = pd.PeriodIndex([], freq='M')
+            codes = np.zeros(self.cube.n_cells, dtype=np.int64)
+        table = self._group(codes, months, distinct)
+        table.index.name = 'Order Date'
+        return table
+
+    def by_month_name(self):
+        names = pd.Index(CALENDAR_CATEGORIES['Month_Name'], name='Month_Name')
+        return self._group(self.cube.month_of_year.astype(np.int64) - 1, names)
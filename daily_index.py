@@ -0,0 +1,181 @@
+"""Prefix-sum daily time index over the Order Date span.
+
+For every (Region, Category, Segment) combination, Sales, Profit, Quantity,
+line and order counts are binned onto a dense daily calendar and stored as
+cumulative sums with a leading zero. The total over any date range is then
+two lookups and a subtraction per selected combination, independent of the
+number of rows or days. Month buckets, trailing 7/30/90-day windows and
+year-over-year or previous-period comparisons are lookups at shifted
+positions of the same arrays.
+
+An order has one Order Date, so orders are counted exactly for the whole
+dataset and for a single combination. An order can span several
+combinations, so summing combinations would count it more than once;
+totals() leaves Orders out in that case (OrderTable has those counts).
+
+Built from the cube's (day x Region x Category x Segment) cells, so it
+costs no extra pass over the rows.
+"""
+import numpy as np
+import pandas as pd
+
+from cube import CUBE_DIMENSIONS
+from metrics import distinct
+from schema import allowed_codes, pack_key
+
+MEASURES = ['Sales', 'Profit', 'Quantity', 'Lines', 'Orders']
+ROLLING_WINDOWS = [7, 30, 90]
+
+
+def _day_number(value):
+    return np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64)
+
+
+class DailyIndex:
+    def __init__(self, first_day, n_days, dim_values, cumulative, order_cumulative):
+        self.first_day = first_day              # day number of calendar position 0
+        self.n_days = n_days
+        self.dim_values = dim_values            # dimension -> category labels
+        self.cumulative = cumulative            # measure -> (combination, n_days + 1) running sums
+        self.order_cumulative = order_cumulative  # n_days + 1 running distinct-order count, all combinations
+
+    @classmethod
+    def from_cube(cls, cube):
+        dim_values = {dim: cube.dim_values[dim] for dim in CUBE_DIMENSIONS}
+        first_day = int(cube.days.min()) if cube.n_cells else 0
+        n_days = int(cube.days.max()) - first_day + 1 if cube.n_cells else 0
+        # The cube's codes include one for a missing label, past the labels
+        sizes = [len(dim_values[dim]) + 1 for dim in CUBE_DIMENSIONS]
+        combination = pack_key(np.zeros(cube.n_cells), [cube.dim_codes[dim] for dim in CUBE_DIMENSIONS], sizes)
+        n_combinations = int(np.prod(sizes))
+        day = cube.days - first_day
+        bucket = combination * n_days + day
+
+        # A cell is one (day, combination), so its distinct orders are its (cell, order) pairs
+        cells, order_ids = cube.id_pairs['Order ID']
+        per_cell = {
+            'Sales': cube.measures['Sales'],
+            'Profit': cube.measures['Profit'],
+            'Quantity': cube.measures['Quantity'],
+            'Lines': cube.lines.astype(np.float64),
+            'Orders': np.bincount(cells, minlength=cube.n_cells).astype(np.float64),
+        }
+        cumulative = {}
+        for measure, values in per_cell.items():
+            daily = np.bincount(bucket, weights=values, minlength=n_combinations * n_days)
+            running = np.zeros((n_combinations, n_days + 1))
+            np.cumsum(daily.reshape(n_combinations, n_days), axis=1, out=running[:, 1:])
+            cumulative[measure] = running
+
+        # Across all combinations an order counts once, on its one order day
+        n_ids = cube.id_counts['Order ID']
+        day_orders = distinct(day[cells] * n_ids + order_ids) // n_ids
+        order_cumulative = np.zeros(n_days + 1)
+        np.cumsum(np.bincount(day_orders, minlength=n_days), out=order_cumulative[1:])
+        return cls(first_day, n_days, dim_values, cumulative, order_cumulative)
+
+    def _position(self, value, end=False):
+        # Calendar boundary for a date: start of its day, or the end of it when end=True
+        if value is None:
+            return self.n_days if end else 0
+        return int(np.clip(_day_number(value) - self.first_day + (1 if end else 0), 0, self.n_days))
+
+    def _combinations(self, regions=None, categories=None, segments=None):
+        # -> boolean mask over combinations, or None when every combination is selected
+        allowed = []
+        for dim, labels in zip(CUBE_DIMENSIONS, (regions, categories, segments)):
+            values = self.dim_values[dim]
+            allowed.append(np.ones(len(values) + 1, dtype=bool) if labels is None
+                           else allowed_codes(values, labels))
+        if all(mask.all() for mask in allowed):
+            return None
+        regions, categories, segments = allowed
+        return (regions[:, None, None] & categories[None, :, None] & segments[None, None, :]).ravel()
+
+    def _running(self, measure, combinations, positions):
+        # Running sums of the selected combinations at the given calendar positions
+        if measure == 'Orders' and combinations is None:
+            return self.order_cumulative[positions]
+        table = self.cumulative[measure]
+        if combinations is not None:
+            table = table[combinations]
+        return table[:, positions].sum(axis=0)
+
+    def _orders_exact(self, combinations):
+        return combinations is None or combinations.sum() <= 1
+
+    def totals(self, start=None, end=None, regions=None, categories=None, segments=None):
+        # Sales, Profit, Quantity, Lines (and Orders when exact) for a date range + filters
+        combinations = self._combinations(regions, categories, segments)
+        positions = [self._position(start), max(self._position(start), self._position(end, end=True))]
+        measures = MEASURES if self._orders_exact(combinations) else MEASURES[:-1]
+        result = {}
+        for measure in measures:
+            lo, hi = self._running(measure, combinations, positions)
+            result[measure] = float(hi - lo)
+        result['Lines'] = int(round(result['Lines']))
+        if 'Orders' in result:
+            result['Orders'] = int(round(result['Orders']))
+        return result
+
+    def dates(self, lo, hi):
+        return pd.to_datetime(np.arange(self.first_day + lo, self.first_day + hi).astype('datetime64[D]'))
+
+    def by_month(self, start=None, end=None, regions=None, categories=None, segments=None,
+                 measures=('Sales', 'Profit')):
+        # Calendar months of the range (clipped to it) that have rows, like SalesCube.by_month
+        combinations = self._combinations(regions, categories, segments)
+        lo = self._position(start)
+        hi = max(lo, self._position(end, end=True))
+        if hi == lo:
+            return pd.DataFrame(columns=list(measures), index=pd.PeriodIndex([], freq='M', name='Order Date'))
+        first = np.datetime64(int(self.first_day + lo), 'D').astype('datetime64[M]')
+        last = np.datetime64(int(self.first_day + hi - 1), 'D').astype('datetime64[M]')
+        months = np.arange(first, last + 1)
+        starts = np.clip(months.astype('datetime64[D]').astype(np.int64) - self.first_day, lo, hi)
+        boundaries = np.append(starts, hi)
+
+        table = pd.DataFrame({measure: np.diff(self._running(measure, combinations, boundaries))
+                              for measure in list(measures) + ['Lines']},
+                             index=pd.PeriodIndex(months, freq='M', name='Order Date'))
+        return table[table['Lines'] > 0.5][list(measures)]
+
+    def rolling(self, measure='Sales', start=None, end=None, regions=None, categories=None, segments=None,
+                windows=ROLLING_WINDOWS):
+        # Trailing window sums for every day of the range; windows reach back before
+        # `start` (but not before the first day of data)
+        combinations = self._combinations(regions, categories, segments)
+        lo = self._position(start)
+        hi = max(lo, self._position(end, end=True))
+        ends = np.arange(lo + 1, hi + 1)
+        table = {'Daily': np.diff(self._running(measure, combinations, np.arange(lo, hi + 1)))}
+        for window in windows:
+            table[f"{window}d"] = (self._running(measure, combinations, ends)
+                                   - self._running(measure, combinations, np.maximum(ends - window, 0)))
+        return pd.DataFrame(table, index=self.dates(lo, hi).rename('Order Date'))
+
+    def compare(self, measure='Sales', start=None, end=None, regions=None, categories=None, segments=None):
+        # Range total against the equally long period just before it and against
+        # the same dates one year earlier -> {'current', 'previous_period', 'previous_year', *_change %}
+        combinations = self._combinations(regions, categories, segments)
+        lo = self._position(start)
+        hi = max(lo, self._position(end, end=True))
+        first = pd.Timestamp(np.datetime64(int(self.first_day + lo), 'D'))
+        last = pd.Timestamp(np.datetime64(int(self.first_day + hi - 1), 'D'))
+        year_lo = self._position(first - pd.DateOffset(years=1))
+        year_hi = max(year_lo, self._position(last - pd.DateOffset(years=1), end=True))
+        if first - pd.DateOffset(years=1) < pd.Timestamp(np.datetime64(int(self.first_day), 'D')):
+            year_lo = year_hi = 0   # the year before isn't fully covered by the data
+
+        span = hi - lo
+        positions = [max(lo - span, 0), lo, hi, year_lo, year_hi]
+        before, range_lo, range_hi, year_start, year_end = self._running(measure, combinations, positions)
+        result = {
+            'current': float(range_hi - range_lo),
+            'previous_period': float(range_lo - before) if lo - span >= 0 else None,
+            'previous_year': float(year_end - year_start) if year_hi > year_lo else None,
+        }
+        for name in ('previous_period', 'previous_year'):
+            base = result[name]
+            result[f"{name}_change"] = (result['current'] / base - 1) * 100 if base else None
+        return result
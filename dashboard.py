@@ -4,8 +4,28 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+from column_store import open_column_store
+from cube import SalesCube
+from daily_index import ROLLING_WINDOWS, DailyIndex
+from data_store import DATA_PATH, load_aggregate
+from export import EXPORT_FORMATS, ExportCache, kpi_summary_csv
+from figures import MAX_POINTS, day_labels, downsample, figure_from_spec, figure_spec
+from filter_index import FilterIndex, filter_key
+from orders import OrderTable
+import profiling
+from result_cache import ResultCache, cache_key
+from rollups import HIERARCHIES, PAGE_SIZE, RANK_METRICS, Hierarchy
+from sampling import StratifiedSample
+from shipping import ShipTimeHistogram, targets_label
+from snapshot import SnapshotRefresher
+from topk import key_labels, top_k_by_key
+
+# Approximate-first answers are switched on by default from this many rows
+APPROX_MIN_ROWS = 5_000_000
+
 # Page configuration
 st.set_page_config(
     page_title="Retail Sales Dashboard",
@@ -41,95 +61,329 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-# Load and cache data
-@st.cache_data
-def load_data():
-    df = pd.read_csv('data/Sample-Superstore.csv', encoding='utf-8')
+# Per-section profiling, switched on from the sidebar's Performance panel. Always
+# (re)activated so a run interrupted mid-page never leaves a profiler behind.
+profiler = profiling.activate(profiling.Profiler() if st.session_state.get('profile_dashboard') else None)
+
+
+# Everything the page reads for one version of the data. Runs on the snapshot
+# refresher's thread, so a reload never happens on a user's request.
+def build_snapshot(path):
+    # A read-only frame over the memory-mapped column store, so every Streamlit
+    # process on the host shares one copy of the dataset in the page cache.
+    # Rebuilt (and atomically republished) when the sources change; path may also
+    # be a directory or glob of partition files, parsed in parallel.
+    data, manifest = open_column_store(path, with_manifest=True)
+    # Date-sorted frame with per-value bitmaps for the sidebar filters
+    filter_index = FilterIndex.from_frame(data)
+    frame = filter_index.frame
+    # Pre-aggregated cube (KPIs, trend and breakdown charts), persisted next to
+    # the data cache and patched with appended rows only
+    cube = load_aggregate(path, 'cube', SalesCube.from_frame, SalesCube.combine, data,
+                          source_rows=manifest.get('source_rows'))
+    # Ship-time histograms per day and filter dimensions x Ship Mode x State,
+    # persisted and patched the same way
+    shipping = load_aggregate(path, 'shipping', ShipTimeHistogram.from_frame, ShipTimeHistogram.combine, data,
+                              source_rows=manifest.get('source_rows'))
+    return {
+        'filter_index': filter_index,
+        'cube': cube,
+        'shipping': shipping,
+        # Running daily sums per Region x Category x Segment, derived from the cube:
+        # date-range totals, month buckets and rolling windows are array lookups
+        'daily_index': DailyIndex.from_cube(cube),
+        # One row per order (totals, dates, customer, filter dimensions) for order KPIs
+        'orders': OrderTable.from_frame(data),
+        # Display names per Product ID / Customer ID code for the top-K rankings
+        'ranking_labels': {
+            'Product ID': key_labels(frame, 'Product ID', 'Product Name'),
+            'Customer ID': key_labels(frame, 'Customer ID', 'Customer Name'),
+        },
+        # Drill-down hierarchies (Category → Sub-Category → Product, Region → State → City):
+        # each row's leaf path and every node's parent
+        'hierarchies': {name: Hierarchy.from_frame(frame, name) for name in HIERARCHIES},
+        # Stratified sample (Region x Category x Segment x month) behind the approximate-first mode
+        'sample': StratifiedSample.from_frame(frame),
+    }
+
+
+# Current data snapshot, shared by every session of this process. A background
+# thread builds the next one when the sources change and swaps it in whole.
+@st.cache_resource
+def load_refresher():
+    return SnapshotRefresher(DATA_PATH, build_snapshot, log=print).start()
+
+
+# Exact views being computed in the background while the page shows estimates,
+# keyed on dataset version + filter state. One worker: a burst of filter changes
+# queues up instead of competing with the page for the CPU.
+@st.cache_resource
+def load_exact_jobs():
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='exact-view'), {}
+
+
+# Finished export files shared by every session, keyed on dataset + filter state
+@st.cache_resource
+def load_export_cache():
+    return ExportCache()
+
+
+# Aggregates per filter state, shared by every session and Streamlit process
+@st.cache_resource
+def load_result_cache():
+    return ResultCache()
+
+
+def aggregate_view(selection, start, end, regions, categories, segments):
+    # The parts of a view answered from the cube, daily index and filter bitmaps
+    cube_selection = cube.select(start, end, regions, categories, segments)
+    filters = (regions, categories, segments)
+    year = pd.DateOffset(years=1)
+    return {
+        'totals': daily_index.totals(start, end, *filters),
+        'overall_totals': daily_index.totals(),
+        'monthly': daily_index.by_month(start, end, *filters),
+        'rolling': daily_index.rolling('Sales', start, end, *filters),
+        # Same window one year earlier, re-dated onto this year for overlaying
+        'rolling_last_year': (daily_index.rolling('Sales', pd.Timestamp(start) - year, pd.Timestamp(end) - year,
+                                                  *filters)
+                              .rename(index=lambda day: day + year) if start is not None else None),
+        'comparison': daily_index.compare('Sales', start, end, *filters),
+        'regional': cube_selection.by('Region')[['Sales', 'Profit']],
+        'category': cube_selection.by('Category')[['Sales', 'Profit']],
+        'segment': cube_selection.by('Segment', distinct=['Customer ID'])[['Sales', 'Profit', 'Customer ID']],
+        'best_month': None if cube_selection.is_empty else cube_selection.by_month_name()['Sales'].idxmax(),
+        'is_empty': cube_selection.is_empty,
+        'records': len(selection),
+        'date_bounds': None if selection.is_empty else selection.date_bounds(),
+    }
+
+
+def compute_view(start, end, regions, categories, segments):
+    # Everything the page shows for one filter state; small enough to pickle.
+    # Also runs on the background worker, so it only touches this run's loaded objects.
+    selection = filter_index.select(start, end, region=regions, category=categories, segment=segments)
+    order_selection = orders.select(start, end, regions, categories, segments)
+    return {
+        **aggregate_view(selection, start, end, regions, categories, segments),
+        'order_count': order_selection.count,
+        'avg_order_value': order_selection.avg_order_value,
+        # Ranked by ID (names collide) with argpartition over the selected rows only
+        'top_products': top_k_by_key(df, 'Product ID', 'Sales', 10, rows=selection.positions,
+                                     label_column='Product Name', labels=ranking_labels['Product ID']),
+        'top_customers': top_k_by_key(df, 'Customer ID', 'Sales', 10, rows=selection.positions,
+                                      label_column='Customer Name', labels=ranking_labels['Customer ID']),
+        'errors': None,
+    }
+
+
+def estimate_view(start, end, regions, categories, segments):
+    # The same view with its row-level parts (order count, average order value,
+    # top 10s) estimated from the stratified sample, plus their 95% half-widths
+    selection = filter_index.select(start, end, region=regions, category=categories, segment=segments)
+    estimates = sample.estimate_view(start, end, regions, categories, segments, top_n=10)
+    return {**aggregate_view(selection, start, end, regions, categories, segments), **estimates}
+
+
+def _forget_finished(jobs, key):
+    # Done callback: drop a finished job (failed ones stay, so the page can report them)
+    def forget(job):
+        if job.exception() is None:
+            jobs.pop(key, None)
+    return forget
+
+
+def submit_exact_view():
+    # Exact view for the current state on the background worker, stored in the
+    # result cache when done; a state already queued or running is not resubmitted
+    executor, jobs = load_exact_jobs()
+    key = (dataset_version_id, cache_key('view', view_state))
+    if key not in jobs:
+        jobs[key] = executor.submit(
+            result_cache.get_or_compute, 'view', view_state, dataset_version_id,
+            lambda: compute_view(view_start, view_end, regions, categories, segments))
+        jobs[key].add_done_callback(_forget_finished(jobs, key))
+    return jobs[key]
+
+
+def compute_rollup(name, start, end, regions, categories, segments):
+    # Every level of one hierarchy for one filter state: a bincount of the selected
+    # rows into leaves, parents summed from their children
+    selection = filter_index.select(start, end, region=regions, category=categories, segment=segments)
+    return hierarchies[name].rollup(df, selection.positions)
+
+
+def cached_rollup(name):
+    return result_cache.get_or_compute(
+        'rollup', [view_state, name], dataset_version_id,
+        lambda: compute_rollup(name, view_start, view_end, regions, categories, segments))
+
+
+def compute_shipping(start, end, regions, categories, segments):
+    # Ship-time percentiles, late rates and distributions for one filter state,
+    # all from the selected histogram entries; exact in the approximate mode too
+    selection = shipping.select(start, end, regions, categories, segments)
+    return {
+        'is_empty': selection.is_empty,
+        'overall': selection.summary().iloc[0] if not selection.is_empty else None,
+        'breakdowns': {dim: selection.summary(dim) for dim in ('Ship Mode', 'Region', 'State')},
+        'distribution': selection.distribution('Ship Mode'),
+        'late_by_month': selection.late_by_month(),
+    }
+
+
+def cached_shipping():
+    # Late rates depend on the configured Ship Mode targets as well
+    return result_cache.get_or_compute(
+        'shipping', [view_state, targets_label()], dataset_version_id,
+        lambda: compute_shipping(view_start, view_end, regions, categories, segments))
 
-    # Data preprocessing
-    df['Order Date'] = pd.to_datetime(df['Order Date'])
-    df['Ship Date'] = pd.to_datetime(df['Ship Date'])
-    df['Year'] = df['Order Date'].dt.year
-    df['Month'] = df['Order Date'].dt.month
-    df['Quarter'] = df['Order Date'].dt.quarter
-    df['Month_Name'] = df['Order Date'].dt.strftime('%B')
-    df['Weekday'] = df['Order Date'].dt.strftime('%A')
-    df['Profit_Margin'] = (df['Profit'] / df['Sales'] * 100).round(2)
-    df['Days_to_Ship'] = (df['Ship Date'] - df['Order Date']).dt.days
 
-    return df
+def cached_figure(name, build, *params):
+    # One chart for this filter state and dataset version, built once across
+    # sessions and stored as a compact spec (see figures.py); estimated views
+    # get their own entry, so the exact chart replaces them once it is ready
+    spec = result_cache.get_or_compute(
+        'figure', [view_state, name, errors is not None, *params], dataset_version_id,
+        lambda: figure_spec(build()))
+    figure_bytes[name] = spec['bytes']
+    return figure_from_spec(spec)
 
 
 # Load data
-df = load_data()
+profiling.section('load')
+# One snapshot for the whole rerun: a refresh published mid-run shows up on the next one
+refresher = load_refresher()
+snapshot = refresher.current()
+filter_index = snapshot.data['filter_index']
+df = filter_index.frame
+cube = snapshot.data['cube']
+shipping = snapshot.data['shipping']
+daily_index = snapshot.data['daily_index']
+orders = snapshot.data['orders']
+ranking_labels = snapshot.data['ranking_labels']
+hierarchies = snapshot.data['hierarchies']
+sample = snapshot.data['sample']
+first_date, last_date = filter_index.date_bounds()
 
 # Header
 st.markdown('<h1 class="main-header">📊 Retail Sales Performance Dashboard</h1>', unsafe_allow_html=True)
 st.markdown("**Comprehensive analysis of superstore sales data with actionable business insights**")
 
 # Sidebar filters
+profiling.section('sidebar')
 st.sidebar.header("🔍 Filters & Controls")
 
 # Date range filter
 date_range = st.sidebar.date_input(
     "Select Date Range",
-    value=(df['Order Date'].min(), df['Order Date'].max()),
-    min_value=df['Order Date'].min(),
-    max_value=df['Order Date'].max()
+    value=(first_date, last_date),
+    min_value=first_date,
+    max_value=last_date
 )
 
 # Region filter
 regions = st.sidebar.multiselect(
     "Select Regions",
-    options=df['Region'].unique(),
-    default=df['Region'].unique()
+    options=filter_index.values('Region'),
+    default=filter_index.values('Region')
 )
 
 # Category filter
 categories = st.sidebar.multiselect(
     "Select Categories",
-    options=df['Category'].unique(),
-    default=df['Category'].unique()
+    options=filter_index.values('Category'),
+    default=filter_index.values('Category')
 )
 
 # Segment filter
 segments = st.sidebar.multiselect(
     "Select Customer Segments",
-    options=df['Segment'].unique(),
-    default=df['Segment'].unique()
+    options=filter_index.values('Segment'),
+    default=filter_index.values('Segment')
 )
 
-# Filter data based on selections
-if len(date_range) == 2:
-    df_filtered = df[
-        (df['Order Date'] >= pd.to_datetime(date_range[0])) &
-        (df['Order Date'] <= pd.to_datetime(date_range[1])) &
-        (df['Region'].isin(regions)) &
-        (df['Category'].isin(categories)) &
-        (df['Segment'].isin(segments))
-        ]
+# Approximate first: answer from the stratified sample at once, exact figures follow
+approximate = st.sidebar.toggle(
+    "⚡ Approximate first", value=len(df) >= APPROX_MIN_ROWS,
+    help="Show order counts, average order value and the top 10s estimated from a stratified sample "
+         "(with 95% intervals) while the exact figures are computed in the background")
+
+# Data snapshot this rerun shows; newer data is loaded in the background and
+# appears on the next rerun once it is ready
+st.sidebar.caption(f"🗂️ Data version `{snapshot.version}` · {len(df):,} rows · loaded "
+                   f"{datetime.fromtimestamp(snapshot.loaded_at):%Y-%m-%d %H:%M:%S} "
+                   f"in {snapshot.load_seconds:.1f}s")
+if refresher.building is not None:
+    st.sidebar.caption(f"🔄 Loading data version `{refresher.building}` in the background")
+elif refresher.current() is not snapshot:
+    st.sidebar.caption("🆕 Newer data is ready and will show on your next interaction")
+if refresher.last_error is not None:
+    st.sidebar.warning(f"⚠️ Data refresh failed, still showing the previous version: {refresher.last_error[1]}")
+if st.sidebar.button("🔄 Check for new data", help="Look for changed source files now instead of "
+                                                  f"at the next check (every {refresher.interval:.0f}s)"):
+    refresher.refresh()
+
+# Performance panel: timing and allocation per page section of this rerun
+performance_panel = st.sidebar.expander("⏱️ Performance", expanded=False)
+performance_panel.checkbox("Profile this page", key='profile_dashboard',
+                           help="Time every section of the page (with allocation peaks) on each rerun")
+
+# Filter state -> page aggregates: answered from the shared result cache when
+# any session has already seen this state on this dataset version, otherwise
+# computed from the cube, order table and filter bitmaps (row positions only)
+profiling.section('filter')
+view_start, view_end = date_range if len(date_range) == 2 else (None, None)
+view_state = filter_key(view_start, view_end, region=regions, category=categories, segment=segments)
+dataset_version_id = snapshot.version
+result_cache = load_result_cache()
+if approximate:
+    view = result_cache.get('view', view_state, dataset_version_id)
+    if view is None:
+        view = estimate_view(view_start, view_end, regions, categories, segments)
+        exact_job = submit_exact_view()
 else:
-    df_filtered = df[
-        (df['Region'].isin(regions)) &
-        (df['Category'].isin(categories)) &
-        (df['Segment'].isin(segments))
-        ]
+    view = result_cache.get_or_compute(
+        'view', view_state, dataset_version_id,
+        lambda: compute_view(view_start, view_end, regions, categories, segments))
+errors = view.get('errors')
+# Spec size of every chart shown on this rerun, for the Performance panel
+figure_bytes = {}
+product_rollup = cached_rollup('Product')
+selection_totals = view['totals']
+overall_totals = view['overall_totals']
 
 # Key Performance Indicators
+profiling.section('kpis')
 st.markdown("## 💰 Key Performance Indicators")
 
+if errors is not None:
+    # Estimates on screen: poll the background job and rerun the page once the exact view is stored
+    @st.fragment(run_every=None if exact_job.done() else 1.0)
+    def exact_view_status():
+        if not exact_job.done():
+            st.info(f"⚡ Orders, average order value and the top 10s are estimated from a "
+                    f"{len(sample) / len(df):.1%} stratified sample (± 95% interval); "
+                    f"exact figures are being computed")
+        elif exact_job.exception() is None:
+            st.rerun()
+        else:
+            st.warning(f"⚠️ Exact figures could not be computed ({exact_job.exception()}); showing estimates")
+
+    exact_view_status()
+
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_sales = df_filtered['Sales'].sum()
+    total_sales = selection_totals['Sales']
     st.metric(
         label="💵 Total Sales",
         value=f"${total_sales:,.0f}",
-        delta=f"{(total_sales / df['Sales'].sum() * 100):.1f}% of total"
+        delta=f"{(total_sales / overall_totals['Sales'] * 100):.1f}% of total"
     )
 
 with col2:
-    total_profit = df_filtered['Profit'].sum()
+    total_profit = selection_totals['Profit']
     profit_margin = (total_profit / total_sales * 100) if total_sales > 0 else 0
     st.metric(
         label="💰 Total Profit",
@@ -138,18 +392,19 @@ with col2:
     )
 
 with col3:
-    total_orders = df_filtered['Order ID'].nunique()
+    total_orders = view['order_count']
     st.metric(
         label="📦 Total Orders",
-        value=f"{total_orders:,}",
-        delta=f"{(total_orders / df['Order ID'].nunique() * 100):.1f}% of total"
+        value=f"{total_orders:,}" if errors is None else f"≈{total_orders:,} ± {errors['order_count']:,.0f}",
+        delta=f"{(total_orders / orders.n_orders * 100):.1f}% of total"
     )
 
 with col4:
-    avg_order_value = df_filtered.groupby('Order ID')['Sales'].sum().mean() if total_orders > 0 else 0
+    avg_order_value = view['avg_order_value']
     st.metric(
         label="🛒 Avg Order Value",
-        value=f"${avg_order_value:.0f}",
+        value=(f"${avg_order_value:.0f}" if errors is None
+               else f"≈${avg_order_value:.0f} ± {errors['avg_order_value']:.0f}"),
         delta="Per order"
     )
 
@@ -161,109 +416,161 @@ col1, col2 = st.columns(2)
 
 with col1:
     # Monthly Sales Trend
+    profiling.section('chart_monthly_trend')
     st.markdown("### 📅 Monthly Sales Trend")
-    monthly_data = df_filtered.groupby(df_filtered['Order Date'].dt.to_period('M')).agg({
-        'Sales': 'sum',
-        'Profit': 'sum'
-    }).reset_index()
-    monthly_data['Order Date'] = monthly_data['Order Date'].astype(str)
-
-    fig_trend = make_subplots(specs=[[{"secondary_y": True}]])
-
-    fig_trend.add_trace(
-        go.Scatter(x=monthly_data['Order Date'], y=monthly_data['Sales'],
-                   mode='lines+markers', name='Sales', line=dict(color='#1f77b4', width=3)),
-        secondary_y=False,
-    )
 
-    fig_trend.add_trace(
-        go.Scatter(x=monthly_data['Order Date'], y=monthly_data['Profit'],
-                   mode='lines+markers', name='Profit', line=dict(color='#ff7f0e', width=3)),
-        secondary_y=True,
-    )
+    def trend_figure():
+        monthly_data = view['monthly'].reset_index()
+        monthly_data['Order Date'] = monthly_data['Order Date'].astype(str)
+
+        fig_trend = make_subplots(specs=[[{"secondary_y": True}]])
+
+        fig_trend.add_trace(
+            go.Scatter(x=monthly_data['Order Date'], y=monthly_data['Sales'],
+                       mode='lines+markers', name='Sales', line=dict(color='#1f77b4', width=3)),
+            secondary_y=False,
+        )
 
-    fig_trend.update_xaxes(title_text="Month")
-    fig_trend.update_yaxes(title_text="Sales ($)", secondary_y=False)
-    fig_trend.update_yaxes(title_text="Profit ($)", secondary_y=True)
-    fig_trend.update_layout(height=400, showlegend=True)
+        fig_trend.add_trace(
+            go.Scatter(x=monthly_data['Order Date'], y=monthly_data['Profit'],
+                       mode='lines+markers', name='Profit', line=dict(color='#ff7f0e', width=3)),
+            secondary_y=True,
+        )
 
-    st.plotly_chart(fig_trend, use_container_width=True)
+        fig_trend.update_xaxes(title_text="Month")
+        fig_trend.update_yaxes(title_text="Sales ($)", secondary_y=False)
+        fig_trend.update_yaxes(title_text="Profit ($)", secondary_y=True)
+        fig_trend.update_layout(height=400, showlegend=True)
+        return fig_trend
+
+    st.plotly_chart(cached_figure('trend', trend_figure), width='stretch')
 
 with col2:
     # Regional Performance
+    profiling.section('chart_region')
     st.markdown("### 🗺️ Regional Performance")
-    regional_data = df_filtered.groupby('Region').agg({
-        'Sales': 'sum',
-        'Profit': 'sum'
-    }).reset_index().sort_values('Sales', ascending=True)
-
-    fig_region = go.Figure()
-    fig_region.add_trace(go.Bar(
-        y=regional_data['Region'],
-        x=regional_data['Sales'],
-        name='Sales',
-        orientation='h',
-        marker_color='#1f77b4',
-        text=regional_data['Sales'].apply(lambda x: f'${x:,.0f}'),
-        textposition='inside'
-    ))
-
-    fig_region.update_layout(
-        title="Sales by Region",
-        xaxis_title="Sales ($)",
-        yaxis_title="Region",
-        height=400,
-        showlegend=False
-    )
-
-    st.plotly_chart(fig_region, use_container_width=True)
+    regional_data = view['regional'].reset_index().sort_values('Sales', ascending=True)
+
+    def region_figure():
+        fig_region = go.Figure()
+        fig_region.add_trace(go.Bar(
+            y=regional_data['Region'],
+            x=regional_data['Sales'],
+            name='Sales',
+            orientation='h',
+            marker_color='#1f77b4',
+            text=regional_data['Sales'].apply(lambda x: f'${x:,.0f}'),
+            textposition='inside'
+        ))
+
+        fig_region.update_layout(
+            title="Sales by Region",
+            xaxis_title="Sales ($)",
+            yaxis_title="Region",
+            height=400,
+            showlegend=False
+        )
+        return fig_region
+
+    st.plotly_chart(cached_figure('region', region_figure), width='stretch')
 
 # Second row of charts
 col3, col4 = st.columns(2)
 
 with col3:
     # Category Performance
+    profiling.section('chart_category')
     st.markdown("### 🛍️ Category Performance")
-    category_data = df_filtered.groupby('Category').agg({
-        'Sales': 'sum',
-        'Profit': 'sum'
-    }).reset_index()
+    category_data = view['category'].reset_index()
     category_data['Profit_Margin'] = (category_data['Profit'] / category_data['Sales'] * 100)
 
-    fig_category = px.scatter(
-        category_data,
-        x='Sales',
-        y='Profit_Margin',
-        size='Profit',
-        color='Category',
-        title="Category Performance: Sales vs Profit Margin",
-        labels={'Profit_Margin': 'Profit Margin (%)', 'Sales': 'Sales ($)'},
-        hover_data={'Profit': ':$,.0f'}
-    )
-    fig_category.update_layout(height=400)
-
-    st.plotly_chart(fig_category, use_container_width=True)
+    def category_figure():
+        fig_category = px.scatter(
+            category_data,
+            x='Sales',
+            y='Profit_Margin',
+            size='Profit',
+            color='Category',
+            title="Category Performance: Sales vs Profit Margin",
+            labels={'Profit_Margin': 'Profit Margin (%)', 'Sales': 'Sales ($)'},
+            hover_data={'Profit': ':$,.0f'}
+        )
+        fig_category.update_layout(height=400)
+        return fig_category
+
+    st.plotly_chart(cached_figure('category', category_figure), width='stretch')
 
 with col4:
     # Customer Segment Analysis
+    profiling.section('chart_segment')
     st.markdown("### 👥 Customer Segment Analysis")
-    segment_data = df_filtered.groupby('Segment').agg({
-        'Sales': 'sum',
-        'Profit': 'sum',
-        'Customer ID': 'nunique'
-    }).reset_index()
-
-    fig_segment = px.pie(
-        segment_data,
-        values='Sales',
-        names='Segment',
-        title="Sales Distribution by Customer Segment",
-        color_discrete_sequence=px.colors.qualitative.Set3
-    )
-    fig_segment.update_traces(textposition='inside', textinfo='percent+label')
-    fig_segment.update_layout(height=400)
 
-    st.plotly_chart(fig_segment, use_container_width=True)
+    def segment_figure():
+        fig_segment = px.pie(
+            view['segment'].reset_index(),
+            values='Sales',
+            names='Segment',
+            title="Sales Distribution by Customer Segment",
+            color_discrete_sequence=px.colors.qualitative.Set3
+        )
+        fig_segment.update_traces(textposition='inside', textinfo='percent+label')
+        fig_segment.update_layout(height=400)
+        return fig_segment
+
+    st.plotly_chart(cached_figure('segment', segment_figure), width='stretch')
+
+# Rolling windows and period-over-period comparison, from the daily running sums
+profiling.section('chart_rolling')
+st.markdown("### 📆 Rolling Sales & Period Comparison")
+comparison = view['comparison']
+
+
+def _change(value):
+    return f"{value:+.1f}%" if value is not None else None
+
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("Sales in Range", f"${comparison['current']:,.0f}")
+with col2:
+    st.metric("Previous Period",
+              f"${comparison['previous_period']:,.0f}" if comparison['previous_period'] is not None else "N/A",
+              delta=_change(comparison['previous_period_change']), help="The equally long period just before")
+with col3:
+    st.metric("Same Period Last Year",
+              f"${comparison['previous_year']:,.0f}" if comparison['previous_year'] is not None else "N/A",
+              delta=_change(comparison['previous_year_change']))
+
+
+def rolling_figure(rolling_window):
+    # Daily series, downsampled to MAX_POINTS per line
+    fig_rolling = go.Figure()
+    current = downsample(view['rolling'][f"{rolling_window}d"])
+    fig_rolling.add_trace(go.Scatter(x=day_labels(current.index), y=current.to_numpy(), mode='lines',
+                                     name=f"Sales, trailing {rolling_window} days",
+                                     line=dict(color='#1f77b4', width=2)))
+    if view['rolling_last_year'] is not None:
+        last_year = downsample(view['rolling_last_year'][f"{rolling_window}d"])
+        fig_rolling.add_trace(go.Scatter(x=day_labels(last_year.index), y=last_year.to_numpy(), mode='lines',
+                                         name="Same window last year",
+                                         line=dict(color='#7f7f7f', width=1, dash='dot')))
+    fig_rolling.update_layout(height=350, xaxis_title="Date", yaxis_title="Sales ($)", hovermode='x unified')
+    return fig_rolling
+
+
+# A fragment: switching the window reruns and re-sends this chart only
+@st.fragment
+def rolling_chart():
+    rolling_window = st.radio("Rolling window", ROLLING_WINDOWS, index=1, horizontal=True,
+                              format_func=lambda days: f"{days} days", key='rolling_window')
+    st.plotly_chart(cached_figure('rolling', lambda: rolling_figure(rolling_window), rolling_window),
+                    width='stretch')
+    if len(view['rolling']) > MAX_POINTS:
+        st.caption(f"{len(view['rolling']):,} days drawn with {MAX_POINTS:,} points per line "
+                   f"(peaks and dips kept)")
+
+
+rolling_chart()
 
 # Top Performers Section
 st.markdown("## 🏆 Top Performers")
@@ -271,61 +578,197 @@ st.markdown("## 🏆 Top Performers")
 col1, col2 = st.columns(2)
 
 with col1:
+    profiling.section('top_products')
     st.markdown("### 🥇 Top 10 Products by Sales")
-    top_products = df_filtered.groupby('Product Name')['Sales'].sum().sort_values(ascending=False).head(10)
-
-    fig_products = go.Figure(go.Bar(
-        x=top_products.values,
-        y=[name[:40] + "..." if len(name) > 40 else name for name in top_products.index],
-        orientation='h',
-        marker_color='#2ca02c',
-        text=[f'${val:,.0f}' for val in top_products.values],
-        textposition='inside'
-    ))
-
-    fig_products.update_layout(
-        title="Top Products by Sales Revenue",
-        xaxis_title="Sales ($)",
-        yaxis_title="Product",
-        height=500,
-        yaxis={'categoryorder': 'total ascending'}
-    )
 
-    st.plotly_chart(fig_products, use_container_width=True)
+    def products_figure():
+        top_products = view['top_products']
+
+        fig_products = go.Figure(go.Bar(
+            x=top_products.values,
+            y=[name[:40] + "..." if len(name) > 40 else name for name in top_products.index],
+            orientation='h',
+            marker_color='#2ca02c',
+            error_x=None if errors is None else dict(type='data', array=errors['top_products'].to_numpy()),
+            text=[f'{"" if errors is None else "≈"}${val:,.0f}' for val in top_products.values],
+            textposition='inside'
+        ))
+
+        fig_products.update_layout(
+            title="Top Products by Sales Revenue",
+            xaxis_title="Sales ($)",
+            yaxis_title="Product",
+            height=500,
+            yaxis={'categoryorder': 'total ascending'}
+        )
+        return fig_products
+
+    st.plotly_chart(cached_figure('top_products', products_figure), width='stretch')
 
 with col2:
+    profiling.section('top_customers')
     st.markdown("### 🥇 Top 10 Customers by Sales")
-    top_customers = df_filtered.groupby('Customer Name')['Sales'].sum().sort_values(ascending=False).head(10)
-
-    fig_customers = go.Figure(go.Bar(
-        x=top_customers.values,
-        y=top_customers.index,
-        orientation='h',
-        marker_color='#d62728',
-        text=[f'${val:,.0f}' for val in top_customers.values],
-        textposition='inside'
-    ))
-
-    fig_customers.update_layout(
-        title="Top Customers by Sales Revenue",
-        xaxis_title="Sales ($)",
-        yaxis_title="Customer",
-        height=500,
-        yaxis={'categoryorder': 'total ascending'}
-    )
 
-    st.plotly_chart(fig_customers, use_container_width=True)
+    def customers_figure():
+        top_customers = view['top_customers']
+
+        fig_customers = go.Figure(go.Bar(
+            x=top_customers.values,
+            y=top_customers.index,
+            orientation='h',
+            marker_color='#d62728',
+            error_x=None if errors is None else dict(type='data', array=errors['top_customers'].to_numpy()),
+            text=[f'{"" if errors is None else "≈"}${val:,.0f}' for val in top_customers.values],
+            textposition='inside'
+        ))
+
+        fig_customers.update_layout(
+            title="Top Customers by Sales Revenue",
+            xaxis_title="Sales ($)",
+            yaxis_title="Customer",
+            height=500,
+            yaxis={'categoryorder': 'total ascending'}
+        )
+        return fig_customers
+
+    st.plotly_chart(cached_figure('top_customers', customers_figure), width='stretch')
+
+# Drill-down: the chosen level's children ranked within their parent, one page rendered
+profiling.section('drilldown')
+st.markdown("## 🔎 Drill-down")
+
+
+# A fragment: moving through the levels and pages reruns this section only,
+# the charts above are not rebuilt or sent again
+@st.fragment
+def drilldown():
+    col1, col2 = st.columns(2)
+    with col1:
+        hierarchy_name = st.radio("Hierarchy", list(HIERARCHIES), horizontal=True, key='drill_hierarchy',
+                                  format_func=lambda name: ' → '.join(label for label, _ in HIERARCHIES[name]))
+    with col2:
+        rank_by = st.selectbox("Rank by", RANK_METRICS, key='drill_rank_by',
+                               format_func=lambda metric: metric.replace('_', ' '))
+    rollup = product_rollup if hierarchy_name == 'Product' else cached_rollup(hierarchy_name)
+
+    # One picker per level above the leaves; keyed on the path so a stale pick never leaks
+    drill_level, drill_parent, drill_path = 0, None, []
+    for depth, column in enumerate(st.columns(len(rollup.levels) - 1)):
+        if depth > drill_level:
+            break
+        options = [rollup.labels[depth][node] for node in rollup.children(depth, drill_parent, rank_by)]
+        with column:
+            choice = st.selectbox(rollup.levels[depth], ["All"] + options,
+                                  key=f"drill_{hierarchy_name}_{'/'.join(drill_path)}")
+        if choice == "All":
+            break
+        drill_parent = rollup.find(depth, choice, drill_parent)
+        drill_path.append(choice)
+        drill_level = depth + 1
+
+    drill_total = len(rollup.children(drill_level, drill_parent, rank_by))
+    drill_pages = max(1, -(-drill_total // PAGE_SIZE))
+    drill_page = st.number_input(f"Page (of {drill_pages})", min_value=1, max_value=drill_pages, value=1, step=1,
+                                 key=f"drill_page_{hierarchy_name}_{'/'.join(drill_path)}_{rank_by}_{drill_total}")
+    drill_table, _ = rollup.page(drill_level, drill_parent, rank_by, drill_page)
+    st.caption(f"{' → '.join(['All'] + drill_path)}: {drill_total:,} {rollup.levels[drill_level]} "
+               f"ranked by {rank_by.replace('_', ' ')}")
+    st.dataframe(drill_table, hide_index=True, width='stretch', column_config={
+        'Sales': st.column_config.NumberColumn(format="$%.0f"),
+        'Profit': st.column_config.NumberColumn(format="$%.0f"),
+        'Profit_Margin': st.column_config.NumberColumn("Profit Margin", format="%.1f%%"),
+        'Share_of_Sales': st.column_config.NumberColumn("Share of Sales", format="%.1f%%"),
+    })
+
+
+drilldown()
+
+# Shipping & fulfillment: ship-time percentiles and late rates for the sidebar
+# selection, from the ship-time histograms (see shipping.py)
+profiling.section('shipping')
+st.markdown("## 🚚 Shipping & Fulfillment")
+ship_view = cached_shipping()
+
+if ship_view['is_empty']:
+    st.info("No shipped lines in the current selection.")
+else:
+    overall = ship_view['overall']
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Lines Shipped", f"{int(overall['Lines']):,}")
+    with col2:
+        st.metric("Median Days to Ship", f"{overall['p50']:.0f}", delta=f"Mean {overall['Mean_Days']:.1f}",
+                  delta_color="off")
+    with col3:
+        st.metric("p90 / p99 Days", f"{overall['p90']:.0f} / {overall['p99']:.0f}")
+    with col4:
+        st.metric("Late vs Targets", f"{overall['Late_Rate']:.1f}%",
+                  help=f"Lines that took longer than their Ship Mode's configured target ({targets_label()}); "
+                       f"set the targets with SUPERSTORE_SHIP_TARGETS")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("### ⏱️ Days to Ship by Ship Mode")
+
+        def ship_distribution_figure():
+            # Share of each Ship Mode's lines per day count, one bar group per day
+            distribution = ship_view['distribution']
+            shares = distribution.div(distribution.sum(axis=1), axis=0) * 100
+            fig_ship = go.Figure()
+            for mode, row in shares.iterrows():
+                fig_ship.add_trace(go.Bar(x=row.index.to_numpy(), y=row.to_numpy(), name=str(mode),
+                                          customdata=distribution.loc[mode].to_numpy(),
+                                          hovertemplate="%{x} days: %{y:.1f}% (%{customdata:,} lines)"))
+            fig_ship.update_layout(barmode='group', height=400, xaxis_title="Days to Ship",
+                                   yaxis_title="Share of Lines (%)", xaxis=dict(dtick=1))
+            return fig_ship
+
+        st.plotly_chart(cached_figure('ship_distribution', ship_distribution_figure), width='stretch')
+
+    with col2:
+        st.markdown("### ⏰ Late Shipment Rate by Month (vs Targets)")
+
+        def late_rate_figure():
+            monthly_late = ship_view['late_by_month']
+            fig_late = go.Figure(go.Scatter(
+                x=monthly_late.index.astype(str), y=monthly_late['Late_Rate'].to_numpy(),
+                mode='lines+markers', name='Late Rate', line=dict(color='#d62728', width=2),
+                customdata=monthly_late[['Late', 'Lines']].to_numpy(),
+                hovertemplate="%{x}: %{y:.1f}% (%{customdata[0]:,} of %{customdata[1]:,} lines)"))
+            fig_late.update_layout(height=400, xaxis_title="Month", yaxis_title="Late vs Targets (%)")
+            return fig_late
+
+        st.plotly_chart(cached_figure('late_rate', late_rate_figure, targets_label()), width='stretch')
+
+
+# A fragment: switching the breakdown reruns and re-sends this table only
+@st.fragment
+def shipping_breakdown():
+    ship_by = st.radio("Percentiles by", list(ship_view['breakdowns']), horizontal=True, key='ship_by')
+    st.dataframe(ship_view['breakdowns'][ship_by].sort_values('Lines', ascending=False),
+                 width='stretch', column_config={
+        'Lines': st.column_config.NumberColumn(format="%d"),
+        'Mean_Days': st.column_config.NumberColumn("Mean Days", format="%.2f"),
+        'p50': st.column_config.NumberColumn("p50 Days", format="%d"),
+        'p90': st.column_config.NumberColumn("p90 Days", format="%d"),
+        'p99': st.column_config.NumberColumn("p99 Days", format="%d"),
+        'Late_Rate': st.column_config.NumberColumn("Late vs Target", format="%.1f%%"),
+    })
+
+
+if not ship_view['is_empty']:
+    shipping_breakdown()
 
 # Business Insights Section
+profiling.section('insights')
 st.markdown("## 💡 Key Business Insights")
 
 # Calculate insights based on filtered data
-best_region = df_filtered.groupby('Region')['Sales'].sum().idxmax() if not df_filtered.empty else "N/A"
-best_category = df_filtered.groupby('Category').apply(
-    lambda x: (x['Profit'].sum() / x['Sales'].sum() * 100)
-).idxmax() if not df_filtered.empty else "N/A"
+best_region = regional_data.set_index('Region')['Sales'].idxmax() if not view['is_empty'] else "N/A"
+best_category = product_rollup.best('Profit_Margin') if not view['is_empty'] else "N/A"
 
-best_month = df_filtered.groupby('Month_Name')['Sales'].sum().idxmax() if not df_filtered.empty else "N/A"
+best_month = view['best_month'] if not view['is_empty'] else "N/A"
 
 col1, col2 = st.columns(2)
 
@@ -344,7 +787,7 @@ with col1:
 
 with col2:
     # Calculate potential improvements
-    furniture_sales = df_filtered[df_filtered['Category'] == 'Furniture']['Sales'].sum()
+    furniture_sales = category_data.set_index('Category')['Sales'].get('Furniture', 0)
     potential_improvement = furniture_sales * 0.05  # 5% margin improvement
 
     st.markdown(f"""
@@ -360,45 +803,46 @@ with col2:
     """, unsafe_allow_html=True)
 
 # Data Export Section
+profiling.section('export')
 st.markdown("## 📤 Data Export")
 
 col1, col2, col3 = st.columns(3)
 
 with col1:
-    # Export filtered data
-    csv = df_filtered.to_csv(index=False)
+    # Export filtered data: written in chunks only when the button is clicked,
+    # and reused for the same filter state
+    export_format = st.selectbox("Export format", list(EXPORT_FORMATS), key='export_format')
+    export_extension, export_mime = EXPORT_FORMATS[export_format]
+    export_cache = load_export_cache()
     st.download_button(
-        label="📥 Download Filtered Data (CSV)",
-        data=csv,
-        file_name=f"superstore_data_{datetime.now().strftime('%Y%m%d')}.csv",
-        mime="text/csv"
+        label=f"📥 Download Filtered Data ({export_format})",
+        data=lambda: export_cache.fetch(
+            filter_index.select(view_start, view_end, region=regions, category=categories, segment=segments),
+            export_extension, dataset_version_id, view_state),
+        file_name=f"superstore_data_{datetime.now().strftime('%Y%m%d')}.{export_extension}",
+        mime=export_mime,
+        on_click='ignore'
     )
 
 with col2:
-    # Export summary report
-    summary_data = pd.DataFrame({
-        'Metric': ['Total Sales', 'Total Profit', 'Total Orders', 'Avg Order Value', 'Profit Margin'],
-        'Value': [
-            f"${total_sales:,.0f}",
-            f"${total_profit:,.0f}",
-            f"{total_orders:,}",
-            f"${avg_order_value:.0f}",
-            f"{profit_margin:.1f}%"
-        ]
-    })
-    summary_csv = summary_data.to_csv(index=False)
+    # Export summary report from the KPI card values, rendered on click
+    kpi_values = {'total_sales': total_sales, 'total_profit': total_profit, 'total_orders': total_orders,
+                  'avg_order_value': avg_order_value, 'profit_margin': profit_margin}
     st.download_button(
         label="📊 Download KPI Summary",
-        data=summary_csv,
+        data=lambda: kpi_summary_csv(kpi_values),
         file_name=f"kpi_summary_{datetime.now().strftime('%Y%m%d')}.csv",
-        mime="text/csv"
+        mime="text/csv",
+        on_click='ignore'
     )
 
 with col3:
+    selected_range = (f"{view['date_bounds'][0].strftime('%Y-%m-%d')} to {view['date_bounds'][1].strftime('%Y-%m-%d')}"
+                      if view['date_bounds'] is not None else "N/A")
     st.markdown("**Dashboard Info:**")
     st.info(f"""
-    📊 **Records Displayed:** {len(df_filtered):,}  
-    📅 **Date Range:** {df_filtered['Order Date'].min().strftime('%Y-%m-%d')} to {df_filtered['Order Date'].max().strftime('%Y-%m-%d')}  
+    📊 **Records Displayed:** {view['records']:,}  
+    📅 **Date Range:** {selected_range}  
     🏪 **Regions:** {len(regions)} selected  
     📦 **Categories:** {len(categories)} selected
     """)
@@ -410,4 +854,27 @@ st.markdown("""
     <p>📊 <strong>Retail Sales Dashboard</strong> | Built with Streamlit & Plotly | Data-driven Business Intelligence</p>
     <p><em>Interactive dashboard providing comprehensive sales analytics and actionable business insights</em></p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Performance panel contents, filled in once the rest of the page has run
+cache_stats = result_cache.stats()
+performance_panel.caption(
+    f"🗃️ Result cache: {cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses "
+    f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']:,} entries, "
+    f"{cache_stats['bytes'] / 1024 ** 2:.1f} MB, {cache_stats['evictions']:,} evicted")
+performance_panel.caption(
+    f"📐 Charts: {len(figure_bytes)} figure specs, {sum(figure_bytes.values()) / 1024:,.0f} KB of JSON this rerun")
+if profiler is not None:
+    profiling.activate(None)
+    timings = pd.DataFrame(profiler.to_records())
+    with performance_panel:
+        st.dataframe(pd.DataFrame({
+            'Section': timings['span'],
+            'ms': (timings['seconds'] * 1000).round(1),
+            'Peak MB': (timings['peak_bytes'] / 1024 ** 2).round(2),
+        }), hide_index=True, width='stretch')
+        st.caption(f"Total: {timings.loc[~timings['span'].str.contains('/'), 'seconds'].sum() * 1000:,.0f} ms")
+        st.download_button("Download profile (JSON)", profiler.to_json(),
+                           file_name="dashboard_profile.json", mime="application/json")
+        st.download_button("Download profile (Prometheus)", profiler.to_prometheus(),
+                           file_name="dashboard_profile.prom", mime="text/plain")
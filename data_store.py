@@ -0,0 +1,435 @@
+"""Load the Superstore extract through a persistent, preprocessed Parquet cache.
+
+The cache is written to a ``<source>.cache`` directory next to the CSV and is
+keyed on the source file's size, mtime and content hash, so a cold start only
+pays for CSV parsing and preprocessing when the file actually changed.
+
+The source grows by appending rows, so the manifest also keeps a watermark
+(rows, last Row ID, last Order Date and the byte offset parsed so far). When
+the file grew and its old bytes are unchanged, only the bytes past the offset
+are parsed and stored as a new Parquet part whose dictionaries extend the
+previous ones, so existing codes stay valid. Aggregates persisted with
+load_aggregate() are patched with the new rows the same way. Anything else
+(rewritten rows, a shrunk file, Row IDs going backwards) falls back to a full
+rebuild.
+
+Partitioned extracts (a directory or glob of CSVs) are loaded one file per
+worker process, each through its own cache, and concatenated with unified
+dictionaries.
+
+Sources are parsed once in their sniffed format, with malformed rows set
+aside in ``<source>.cache/quarantine.csv`` (see ingest.py). The format is kept
+in the manifest so appended rows are parsed the same way.
+"""
+import glob
+import hashlib
+import io
+import json
+import os
+import pickle
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from dates import DATE_COLUMNS, DATE_FORMAT, add_calendar_columns, parse_dates, unparseable_dates
+from ingest import SourceFormat, SourceReader, combine_quarantine, quarantine_message
+from schema import apply_schema, concat_frames, extend_categories, frame_memory, memory_report, union_frames
+
+# A single CSV, a directory of partition CSVs or a glob pattern
+DATA_PATH = os.environ.get('SUPERSTORE_DATA', 'data/Sample-Superstore.csv')
+
+# Bump whenever prepare_frame() changes what ends up in the cached frame, or a
+# persisted aggregate (see load_aggregate()) changes what it holds
+CACHE_VERSION = 7
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Appended parts are merged back into one file once there are this many
+MAX_PARTS = 16
+
+
+def quarantine_path(path):
+    return os.path.join(cache_dir(path), 'quarantine.csv')
+
+
+def _with_ingest_notes(df, reader, quarantined):
+    # The sniffed format and the quarantine summary travel with the frame until
+    # load_superstore() takes them off (before the frame is cached)
+    df.attrs['source_format'] = reader.format.as_dict()
+    df.attrs['quarantine'] = quarantined
+    return df
+
+
+def read_source(path, **options):
+    # One parse in the sniffed encoding, delimiter and date format; malformed
+    # rows go to the quarantine file instead of failing the load
+    reader = SourceReader(path)
+    df = reader.read(**options)
+    return _with_ingest_notes(df, reader, reader.write_quarantine(quarantine_path(path)))
+
+
+def prepare_frame(df):
+    # Date conversion and derived columns shared by the dashboard and the report
+    # Each distinct date string is parsed once; calendar columns come from a
+    # per-date table (see dates.py)
+    df = add_calendar_columns(df, 'Order Date')
+    df['Ship Date'] = parse_dates(df['Ship Date'])
+    df['Profit_Margin'] = (df['Profit'] / df['Sales'] * 100).round(2)
+    df['Days_to_Ship'] = (df['Ship Date'] - df['Order Date']).dt.days
+    return df
+
+
+def cache_dir(path):
+    return f"{path}.cache"
+
+
+def _scan(path, digest=None, limit=None):
+    # -> (content hash, newline count); limit: only the first `limit` bytes
+    # (the part a watermark covers)
+    digest = digest or hashlib.blake2b(digest_size=20)
+    remaining = limit
+    lines = 0
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            size = HASH_BLOCK_SIZE if remaining is None else min(HASH_BLOCK_SIZE, remaining)
+            block = f.read(size)
+            if not block:
+                break
+            digest.update(block)
+            lines += block.count(b'\n')
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest(), lines
+
+
+def content_hash(path, digest=None, limit=None):
+    return _scan(path, digest, limit)[0]
+
+
+def source_signature(path):
+    # Lines: where rows appended later start, for quarantine line numbers
+    stat = os.stat(path)
+    digest, lines = _scan(path)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': digest,
+        'lines': lines,
+    }
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(cache_dir(path), 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_atomic(target, payload):
+    tmp = f"{target}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, target)
+
+
+def _ends_with_newline(path, offset):
+    with open(path, 'rb') as f:
+        f.seek(offset - 1)
+        return f.read(1) == b'\n'
+
+
+def check_source(path, manifest):
+    # -> ('fresh' | 'append' | 'stale', signature of the current file or None)
+    if manifest is None or manifest.get('version') != CACHE_VERSION:
+        return 'stale', None
+    source = manifest['source']
+    stat = os.stat(path)
+
+    if stat.st_size == source['size']:
+        if stat.st_mtime_ns == source['mtime_ns']:
+            return 'fresh', None
+        # Same size but touched: let the content hash decide, and remember the
+        # new mtime so the next check is a plain stat again
+        if content_hash(path) != source['hash']:
+            return 'stale', None
+        source['mtime_ns'] = stat.st_mtime_ns
+        try:
+            _write_json_atomic(os.path.join(cache_dir(path), 'manifest.json'), manifest)
+        except OSError:
+            pass
+        return 'fresh', None
+
+    # Grown: an append only if the old bytes are untouched and ended on a full line
+    if stat.st_size < source['size'] or not _ends_with_newline(path, source['size']):
+        return 'stale', None
+    digest = hashlib.blake2b(digest_size=20)
+    if content_hash(path, digest, limit=source['size']) != source['hash']:
+        return 'stale', None
+    # One pass: keep feeding the same digest to get the new whole-file hash
+    lines = source['lines']
+    with open(path, 'rb') as f:
+        f.seek(source['size'])
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+            lines += block.count(b'\n')
+    return 'append', {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest.hexdigest(),
+                      'lines': lines}
+
+
+def is_cache_fresh(path, manifest):
+    return check_source(path, manifest)[0] == 'fresh'
+
+
+def watermark(df, offset):
+    return {
+        'rows': len(df),
+        'last_row_id': int(df['Row ID'].max()) if 'Row ID' in df.columns and len(df) else None,
+        'last_order_date': df['Order Date'].max().isoformat() if len(df) else None,
+        'offset': offset,
+    }
+
+
+def _write_part(directory, index, df):
+    name = f"part-{index:05d}.parquet"
+    target = os.path.join(directory, name)
+    tmp = f"{target}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, target)
+    return name
+
+
+def write_cache(path, df, signature, memory, source_format=None):
+    # Full rebuild: a single part and a new lineage, which invalidates every
+    # persisted aggregate built on the previous dictionaries
+    directory = cache_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'rb') as f:
+        header = f.readline().decode('latin-1')
+    manifest = {
+        'version': CACHE_VERSION,
+        'lineage': uuid.uuid4().hex,
+        'source': signature,
+        'header': header,
+        'format': source_format or SourceFormat().as_dict(),
+        'parts': [_write_part(directory, 0, df)],
+        'watermark': watermark(df, signature['size']),
+        'rows': len(df),
+        'memory': memory,
+    }
+    _write_json_atomic(os.path.join(directory, 'manifest.json'), manifest)
+    _remove_stale_parts(directory, manifest['parts'])
+    return manifest
+
+
+def _remove_stale_parts(directory, keep):
+    for name in os.listdir(directory):
+        if name.endswith('.parquet') and name not in keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def read_cached_frame(path, manifest):
+    directory = cache_dir(path)
+    return concat_frames([pd.read_parquet(os.path.join(directory, name)) for name in manifest['parts']])
+
+
+def read_delta(path, manifest, signature):
+    # Parse only the rows past the watermark, under the original header line and
+    # in the format sniffed for the full load; quarantined rows are added to the
+    # file's quarantine with their line numbers in the whole file
+    with open(path, 'rb') as f:
+        f.seek(manifest['watermark']['offset'])
+        delta = f.read(signature['size'] - manifest['watermark']['offset'])
+    header = manifest['header'].encode('latin-1')
+    reader = SourceReader(io.BytesIO(header + delta), SourceFormat(**manifest['format']),
+                          line_offset=manifest['source']['lines'] - 1)
+    df = reader.read()
+    return _with_ingest_notes(df, reader, reader.write_quarantine(quarantine_path(path), append=True))
+
+
+def append_cache(path, df, manifest, signature, log, on_quarantine):
+    delta = read_delta(path, manifest, signature)
+    quarantined = delta.attrs.pop('quarantine')
+    delta.attrs.clear()
+    if quarantined:
+        on_quarantine(quarantined)
+    mark = manifest['watermark']
+    if mark['last_row_id'] is not None and len(delta) and delta['Row ID'].min() <= mark['last_row_id']:
+        raise ValueError(f"Row IDs restart at {delta['Row ID'].min()} (watermark {mark['last_row_id']})")
+
+    delta = prepare_frame(delta)
+    raw_memory = frame_memory(delta)
+    delta = extend_categories(apply_schema(delta), df)
+    df = concat_frames([df, delta])
+
+    directory = cache_dir(path)
+    parts = manifest['parts']
+    if len(parts) + 1 > MAX_PARTS:
+        # Compaction keeps rows and codes, so the lineage (and aggregates) stay valid
+        parts = [_write_part(directory, len(parts), df)]
+    else:
+        parts = parts + [_write_part(directory, len(parts), delta)]
+
+    manifest = dict(manifest, source=signature, parts=parts, rows=len(df),
+                    watermark=watermark(df, signature['size']))
+    manifest['memory'] = {'raw': manifest['memory']['raw'] + raw_memory, 'compact': frame_memory(df)}
+    _write_json_atomic(os.path.join(directory, 'manifest.json'), manifest)
+    _remove_stale_parts(directory, parts)
+
+    log(f"➕ Appended {len(delta):,} new rows from {path} "
+        f"(through {pd.Timestamp(manifest['watermark']['last_order_date']):%Y-%m-%d})")
+    return df, manifest
+
+
+def load_superstore(path=DATA_PATH, use_cache=True, reader=read_source, log=None, on_quarantine=None):
+    # on_quarantine(summary) is called for each batch of rows quarantined
+    # (default: log the summary)
+    log = log or (lambda message: None)
+    on_quarantine = on_quarantine or (lambda summary: log(quarantine_message(summary)))
+
+    with profiling.span('check_cache'):
+        manifest = read_manifest(path) if use_cache else None
+        state, signature = check_source(path, manifest) if use_cache else ('stale', None)
+    if state in ('fresh', 'append'):
+        try:
+            with profiling.span('read_cache'):
+                df = read_cached_frame(path, manifest)
+            if state == 'fresh':
+                log(f"✅ Loaded preprocessed data from cache ({cache_dir(path)})")
+            else:
+                with profiling.span('append'):
+                    df, manifest = append_cache(path, df, manifest, signature, log, on_quarantine)
+            log(memory_report(manifest['memory']['raw'], manifest['memory']['compact']))
+            return df
+        except (OSError, ValueError, KeyError) as exc:
+            log(f"⚠️  Cache could not be reused ({exc}), rebuilding from source")
+
+    # Signature is taken before parsing so a concurrent write invalidates the cache
+    signature = source_signature(path) if use_cache else None
+    with profiling.span('parse_csv'):
+        df = reader(path)
+    source_format, quarantined = df.attrs.pop('source_format', None), df.attrs.pop('quarantine', None)
+    if source_format:
+        log(f"✅ Parsed {path} ({SourceFormat(**source_format)})")
+    if quarantined:
+        on_quarantine(quarantined)
+    with profiling.span('prepare'):
+        df = prepare_frame(df)
+    raw_memory = frame_memory(df)
+    with profiling.span('apply_schema'):
+        df = apply_schema(df)
+    memory = {'raw': raw_memory, 'compact': frame_memory(df)}
+    log(memory_report(memory['raw'], memory['compact']))
+
+    if use_cache:
+        try:
+            with profiling.span('write_cache'):
+                write_cache(path, df, signature, memory, source_format)
+            log(f"💾 Preprocessed data cached in {cache_dir(path)}")
+        except (OSError, ImportError) as exc:
+            log(f"⚠️  Could not write cache: {exc}")
+    return df
+
+
+def source_files(path):
+    # A single CSV, every CSV in a directory, or a glob pattern; always sorted
+    # so partitions are concatenated and merged in a deterministic order
+    if os.path.isdir(path):
+        files = glob.glob(os.path.join(path, '*.csv'))
+    elif glob.has_magic(path):
+        files = glob.glob(path)
+    else:
+        return [path]
+    if not files:
+        raise FileNotFoundError(f"No CSV files match {path}")
+    return sorted(files)
+
+
+def dataset_version(path=DATA_PATH):
+    # Cheap identity of the source data (path, size and mtime of every file);
+    # keys caches of results derived from it
+    digest = hashlib.blake2b(digest_size=8)
+    for file in source_files(path):
+        stat = os.stat(file)
+        digest.update(f"{os.path.abspath(file)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _load_partition(path, use_cache, reader):
+    # Worker: one partition file plus the quarantine summaries of its load,
+    # which the parent reports as one
+    quarantined = []
+    df = load_superstore(path, use_cache, reader, on_quarantine=quarantined.append)
+    return df, quarantined
+
+
+def load_sources(path=DATA_PATH, use_cache=True, reader=read_source, log=None, max_workers=None):
+    log = log or (lambda message: None)
+    files = source_files(path)
+    if len(files) == 1:
+        return load_superstore(files[0], use_cache, reader, log)
+
+    max_workers = max(1, min(len(files), max_workers or os.cpu_count() or 1))
+    n = len(files)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        frames, quarantined = zip(*pool.map(_load_partition, files, [use_cache] * n, [reader] * n))
+    df = union_frames(list(frames))
+    log(f"✅ Loaded {n} files from {path} with {max_workers} worker processes")
+    summaries = [summary for summaries in quarantined for summary in summaries]
+    if summaries:
+        log(quarantine_message(combine_quarantine(summaries)))
+    log(f"Memory Usage: {frame_memory(df) / 1024 ** 2:.2f} MB with compact schema")
+    return df
+
+
+def validate_dates(path=DATA_PATH, fmt=DATE_FORMAT):
+    # Validation mode: every date cell that does not parse with `fmt`, with
+    # its file and 1-based line number (line 1 is the header)
+    found = []
+    for file in source_files(path):
+        raw = SourceReader(file).read(clean=False, usecols=lambda col: col in DATE_COLUMNS, dtype=str)
+        bad = unparseable_dates(raw, fmt=fmt)
+        bad.insert(0, 'file', file)
+        bad.insert(1, 'line', bad['row'] + 2)
+        found.append(bad.drop(columns='row'))
+    return pd.concat(found, ignore_index=True)
+
+
+def load_aggregate(path, name, build, combine, frame, source_rows=None):
+    # Persisted aggregate over the cached frame: build(frame) -> aggregate,
+    # combine(old, new) -> aggregate over both row ranges. Appended rows are
+    # folded in with combine() instead of rebuilding from every row. A frame
+    # not in source order (the date-sorted column store) passes the source
+    # position of each of its rows, so the appended ones can be picked out.
+    manifest = read_manifest(path)
+    if manifest is None or manifest.get('rows') != len(frame):
+        return build(frame)
+    target = os.path.join(cache_dir(path), f"{name}.pkl")
+    try:
+        with open(target, 'rb') as f:
+            saved = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError):
+        saved = None
+
+    if saved is not None and saved['lineage'] == manifest['lineage'] and saved['rows'] <= len(frame):
+        if saved['rows'] == len(frame):
+            return saved['aggregate']
+        appended = (slice(saved['rows'], None) if source_rows is None
+                    else np.flatnonzero(np.asarray(source_rows) >= saved['rows']))
+        aggregate = combine(saved['aggregate'], build(frame.iloc[appended]))
+    else:
+        aggregate = build(frame)
+
+    try:
+        tmp = f"{target}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump({'lineage': manifest['lineage'], 'rows': len(frame), 'aggregate': aggregate}, f)
+        os.replace(tmp, target)
+    except OSError:
+        pass
+    return aggregate
@@ -0,0 +1,88 @@
+"""Date parsing and calendar attributes computed once per distinct date.
+
+A few thousand distinct date strings repeat across millions of rows, so each
+distinct string is parsed once with an explicit format and the result is
+mapped back through its factorized code. Year, Month, Quarter, Month_Name and
+Weekday come from a small calendar table over the distinct dates the same
+way, with the name columns built directly as categorical codes instead of one
+strftime string per row.
+"""
+import numpy as np
+import pandas as pd
+
+from schema import CALENDAR_CATEGORIES
+
+# Superstore extracts write dates as M/D/YYYY (e.g. 11/8/2016)
+DATE_FORMAT = '%m/%d/%Y'
+DATE_COLUMNS = ['Order Date', 'Ship Date']
+
+# How many offending rows an unparseable-date error quotes
+ERROR_SAMPLE = 5
+
+
+def parse_distinct(values, fmt=DATE_FORMAT):
+    # -> (code per row, parsed DatetimeIndex per distinct value); missing values
+    # get code -1, unparseable distinct values parse to NaT
+    codes, distinct = pd.factorize(values)
+    if isinstance(distinct.dtype, np.dtype) and distinct.dtype.kind == 'M':
+        return codes, pd.DatetimeIndex(distinct)
+    return codes, pd.DatetimeIndex(pd.to_datetime(distinct, format=fmt, errors='coerce'))
+
+
+def unparseable_dates(df, columns=DATE_COLUMNS, fmt=DATE_FORMAT):
+    # Validation mode: one row per offending cell (row position, column, raw value)
+    found = []
+    for col in columns:
+        if col not in df.columns:
+            continue
+        codes, parsed = parse_distinct(df[col], fmt)
+        bad = np.flatnonzero(np.asarray(parsed.isna())[codes] & (codes >= 0))
+        found.append(pd.DataFrame({'row': bad, 'column': col, 'value': df[col].to_numpy()[bad]}))
+    if not found:
+        return pd.DataFrame(columns=['row', 'column', 'value'])
+    return pd.concat(found, ignore_index=True)
+
+
+def _check_parsed(values, codes, parsed, fmt):
+    bad = np.flatnonzero(np.asarray(parsed.isna())[codes] & (codes >= 0))
+    if len(bad):
+        sample = ', '.join(f"row {row}: {values.iloc[row]!r}" for row in bad[:ERROR_SAMPLE])
+        raise ValueError(f"{len(bad):,} {values.name!r} values do not match {fmt!r} ({sample})")
+
+
+def parse_dates(values, fmt=DATE_FORMAT):
+    codes, parsed = parse_distinct(values, fmt)
+    _check_parsed(values, codes, parsed, fmt)
+    # Code -1 (missing) picks the NaT appended at the end
+    lookup = parsed.append(pd.DatetimeIndex([pd.NaT]))
+    return pd.Series(lookup.take(codes), index=values.index, name=values.name)
+
+
+def calendar_table(dates):
+    # One row per distinct date; month and weekday names as calendar-ordered codes
+    dates = pd.DatetimeIndex(dates)
+    return pd.DataFrame({
+        'Year': dates.year.astype(np.int16),
+        'Month': dates.month.astype(np.int8),
+        'Quarter': dates.quarter.astype(np.int8),
+        'Month_Name': (dates.month - 1).astype(np.int8),
+        'Weekday': dates.dayofweek.astype(np.int8),
+    })
+
+
+def add_calendar_columns(df, column='Order Date', fmt=DATE_FORMAT):
+    # Parses `column` in place and derives the calendar columns from it
+    values = df[column]
+    codes, parsed = parse_distinct(values, fmt)
+    _check_parsed(values, codes, parsed, fmt)
+    table = calendar_table(parsed)
+
+    df[column] = pd.Series(parsed.append(pd.DatetimeIndex([pd.NaT])).take(codes), index=df.index)
+    present = codes >= 0
+    for col in ['Year', 'Month', 'Quarter']:
+        attribute = table[col].to_numpy()[codes]
+        df[col] = attribute if present.all() else np.where(present, attribute, np.nan)
+    for col in ['Month_Name', 'Weekday']:
+        name_codes = np.where(present, table[col].to_numpy()[codes], -1)
+        df[col] = pd.Categorical.from_codes(name_codes, categories=CALENDAR_CATEGORIES[col], ordered=True)
+    return df
@@ -0,0 +1,100 @@
+"""On-demand, chunked export of the dashboard's filtered rows.
+
+Nothing is serialized until a download is requested. The selected rows are
+then written in fixed-size chunks straight to a file (CSV, gzip CSV or
+Parquet), so the full serialized text never has to exist in memory at once.
+Finished files are kept in a small shared directory keyed on the dataset
+version, filter state and format, so repeating a download is a file read;
+the least recently used files are evicted beyond MAX_CACHED_EXPORTS.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+# Label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+EXPORT_CHUNK_ROWS = 100_000
+MAX_CACHED_EXPORTS = 16
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), 'superstore-exports')
+
+
+def write_export(selection, extension, target, chunk_rows=EXPORT_CHUNK_ROWS):
+    tmp = f"{target}.{os.getpid()}.tmp"
+    chunks = selection.iter_frames(chunk_rows)
+    if extension == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = writer or pq.ParquetWriter(tmp, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        opener = gzip.open if extension == 'csv.gz' else open
+        with opener(tmp, 'wt', encoding='utf-8', newline='') as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, header=i == 0)
+    os.replace(tmp, target)
+    return target
+
+
+def export_key(version, state, extension):
+    payload = json.dumps([version, state, extension], default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class ExportCache:
+    def __init__(self, directory=EXPORT_DIR, max_files=MAX_CACHED_EXPORTS):
+        self.directory = directory
+        self.max_files = max_files
+
+    def fetch(self, selection, extension, version, state):
+        # -> file contents for this filter state, generated only on a cache miss
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{export_key(version, state, extension)}.{extension}")
+        if os.path.exists(path):
+            os.utime(path)  # mark as recently used
+        else:
+            write_export(selection, extension, path)
+            self._evict()
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _evict(self):
+        files = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if not name.endswith('.tmp')]
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=lambda file: os.stat(file).st_mtime_ns)
+        for file in files[:len(files) - self.max_files]:
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+
+
+def kpi_summary_csv(kpis):
+    # KPI summary from the values the KPI cards already computed
+    return pd.DataFrame({
+        'Metric': ['Total Sales', 'Total Profit', 'Total Orders', 'Avg Order Value', 'Profit Margin'],
+        'Value': [
+            f"${kpis['total_sales']:,.0f}",
+            f"${kpis['total_profit']:,.0f}",
+            f"{kpis['total_orders']:,}",
+            f"${kpis['avg_order_value']:.0f}",
+            f"{kpis['profit_margin']:.1f}%"
+        ]
+    }).to_csv(index=False)
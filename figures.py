@@ -0,0 +1,69 @@
+"""Compact, reusable Plotly figure specs for the dashboard.
+
+Building a figure costs tens of milliseconds (plotly.express most of all),
+and its JSON grows with every point it plots. The dashboard builds each chart
+once per filter state and dataset version and keeps it in the shared result
+cache as a plain spec (the figure's dict). A rerun that finds the spec turns
+it back into a Figure without validating it again. Long daily series are cut
+down to MAX_POINTS with Largest-Triangle-Three-Buckets, which keeps the peaks
+and dips a line chart shows. Days are sent as YYYY-MM-DD labels instead of
+full timestamps.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Points per plotted series; a chart is a few hundred pixels wide
+MAX_POINTS = int(os.environ.get('SUPERSTORE_MAX_CHART_POINTS', 500))
+
+
+def lttb(x, y, threshold):
+    # -> sorted positions of the `threshold` points kept. The first and last
+    # points are kept; every bucket in between keeps the point that forms the
+    # largest triangle with the point kept before it and the next bucket's mean.
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = (edges[bucket + 1], edges[bucket + 2]) if bucket + 2 < len(edges) else (n - 1, n)
+        mean_x, mean_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[previous] - mean_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (mean_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def downsample(series, max_points=MAX_POINTS):
+    # A date-indexed series cut down to max_points with LTTB; gaps (NaN) are
+    # left out rather than bridged
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series))
+    return series.iloc[lttb(x, series.to_numpy(), max_points)]
+
+
+def day_labels(index):
+    return pd.DatetimeIndex(index).strftime('%Y-%m-%d').to_numpy()
+
+
+def figure_spec(fig):
+    # What the result cache stores: the figure's dict and the size of its JSON
+    spec = fig.to_dict()
+    return {'figure': spec, 'bytes': len(pio.to_json(spec, validate=False))}
+
+
+def figure_from_spec(spec):
+    # The spec came from a validated Figure, so it is not validated again
+    return go.Figure(spec['figure'], _validate=False)
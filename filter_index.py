@@ -0,0 +1,150 @@
+"""Sorted-date + bitmap filter index for the dashboard sidebar.
+
+The frame is kept sorted by Order Date so a date range resolves to a
+contiguous row slice with two binary searches. Each value of the bitmap
+columns has a packed bitmap (one bit per row); a filter ORs the bitmaps of
+the selected values and ANDs across columns, touching only the bytes of the
+date slice. The result is a RowSelection of row positions that aggregations
+can gather columns through without copying the frame.
+"""
+import numpy as np
+import pandas as pd
+
+from schema import id_codes, id_lookup
+
+BITMAP_COLUMNS = ['Region', 'Category', 'Segment', 'State', 'Ship Mode', 'Sub-Category']
+
+
+def _day_number(value):
+    return np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64)
+
+
+def filter_key(start=None, end=None, **filters):
+    # Canonical, hashable form of a sidebar state: ISO dates plus sorted value
+    # tuples, so equivalent selections (in any click order) share one key
+    def day(value):
+        return None if value is None else pd.Timestamp(value).date().isoformat()
+    return (day(start), day(end),
+            tuple((name, None if values is None else tuple(sorted(map(str, values))))
+                  for name, values in sorted(filters.items())))
+
+
+class FilterIndex:
+    def __init__(self, frame, days, bitmaps):
+        self.frame = frame
+        self.days = days        # row -> order day number, ascending
+        self.bitmaps = bitmaps  # column -> (n_values, n_bytes) packed bitmaps
+
+    @classmethod
+    def from_frame(cls, df, columns=BITMAP_COLUMNS):
+        # Only reorder (and copy) when the source isn't already date-sorted
+        if not df['Order Date'].is_monotonic_increasing:
+            df = df.sort_values('Order Date', kind='stable').reset_index(drop=True)
+        days = df['Order Date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+
+        bitmaps = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            codes = id_codes(df, col)
+            bitmaps[col] = np.stack([
+                np.packbits(codes == code) for code in range(len(id_lookup(df, col)))
+            ]) if len(df) else np.zeros((len(id_lookup(df, col)), 0), dtype=np.uint8)
+        return cls(df, days, bitmaps)
+
+    def __len__(self):
+        return len(self.days)
+
+    def values(self, column):
+        return list(id_lookup(self.frame, column))
+
+    def date_bounds(self):
+        if not len(self.days):
+            return None, None
+        return self.frame['Order Date'].iloc[0], self.frame['Order Date'].iloc[-1]
+
+    def select(self, start=None, end=None, **filters):
+        # Keyword names use underscores for spaced columns, e.g. ship_mode=['First Class']
+        lo = 0 if start is None else int(np.searchsorted(self.days, _day_number(start), side='left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.days, _day_number(end), side='right'))
+        hi = max(hi, lo)
+
+        byte_lo, byte_hi = lo // 8, (hi + 7) // 8
+        combined = None
+        for key, labels in filters.items():
+            if labels is None:
+                continue
+            col = self._column_for(key)
+            wanted = np.flatnonzero(np.asarray(id_lookup(self.frame, col).isin(list(labels))))
+            if len(wanted) == self.bitmaps[col].shape[0]:
+                continue  # every value selected: the filter is a no-op
+            bits = np.bitwise_or.reduce(self.bitmaps[col][wanted, byte_lo:byte_hi], axis=0) \
+                if len(wanted) else np.zeros(byte_hi - byte_lo, dtype=np.uint8)
+            combined = bits if combined is None else combined & bits
+
+        if combined is None:
+            return RowSelection(self.frame, slice(lo, hi))
+        mask = np.unpackbits(combined)[lo - byte_lo * 8:hi - byte_lo * 8]
+        return RowSelection(self.frame, np.flatnonzero(mask) + lo)
+
+    def _column_for(self, key):
+        if key in self.bitmaps:
+            return key
+        for col in self.bitmaps:
+            if col.lower().replace(' ', '_').replace('-', '_') == key.lower():
+                return col
+        raise KeyError(f"No bitmap index for {key!r}")
+
+
+class RowSelection:
+    def __init__(self, frame, positions):
+        self.frame = frame
+        self.positions = positions  # slice for a pure date range, else sorted int array
+
+    def __len__(self):
+        if isinstance(self.positions, slice):
+            return self.positions.stop - self.positions.start
+        return len(self.positions)
+
+    @property
+    def is_empty(self):
+        return len(self) == 0
+
+    def as_array(self):
+        if isinstance(self.positions, slice):
+            return np.arange(self.positions.start, self.positions.stop)
+        return self.positions
+
+    def column(self, name):
+        values = self.frame[name]
+        if isinstance(self.positions, slice):
+            return values.iloc[self.positions]
+        return values.take(self.positions)
+
+    def to_frame(self, columns=None):
+        frame = self.frame if columns is None else self.frame[columns]
+        if isinstance(self.positions, slice):
+            return frame.iloc[self.positions]
+        return frame.take(self.positions)
+
+    def iter_frames(self, chunk_rows, columns=None):
+        # Selected rows in order, at most chunk_rows at a time (at least one, possibly empty, frame)
+        frame = self.frame if columns is None else self.frame[columns]
+        if self.is_empty:
+            yield frame.iloc[:0]
+            return
+        for start in range(0, len(self), chunk_rows):
+            if isinstance(self.positions, slice):
+                first = self.positions.start + start
+                yield frame.iloc[first:min(first + chunk_rows, self.positions.stop)]
+            else:
+                yield frame.take(self.positions[start:start + chunk_rows])
+
+    def date_bounds(self):
+        # Rows are date-sorted, so the first and last selected rows bound the range
+        if self.is_empty:
+            return None, None
+        dates = self.frame['Order Date']
+        first, last = (self.positions.start, self.positions.stop - 1) \
+            if isinstance(self.positions, slice) else (self.positions[0], self.positions[-1])
+        return dates.iloc[first], dates.iloc[last]
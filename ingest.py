@@ -0,0 +1,288 @@
+"""Single-pass CSV ingestion with format sniffing and a quarantine for bad rows.
+
+The encoding, delimiter and date format are sniffed from the first few KB of
+the source, so the file is parsed once in the right format instead of being
+re-read after every failed guess. Rows that cannot be used are set aside
+rather than failing the load: lines with too many fields are skipped by the
+parser, and rows that lack a required field or whose dates or measures do
+not parse are dropped after it. Each is recorded with its line number and
+reason, and can be written to a quarantine CSV with the offending line's text.
+
+The sample decides the encoding. A file that is valid UTF-8 for its first
+SNIFF_BYTES but not after that is the one case parsed twice (as Latin-1).
+"""
+import codecs
+import csv
+import io
+import os
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from dates import DATE_COLUMNS, DATE_FORMAT, parse_distinct
+
+SNIFF_BYTES = 64 * 1024
+
+# Candidates in order of preference; ties go to the earlier one
+DELIMITERS = [',', ';', '\t', '|']
+DATE_FORMATS = [DATE_FORMAT, '%d/%m/%Y', '%Y-%m-%d', '%m-%d-%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y/%m/%d']
+
+# A row without any of these is unusable (a line cut short is padded with blanks)
+REQUIRED_COLUMNS = ['Order ID', 'Order Date', 'Sales']
+
+# Measures a row is quarantined for when a value is present but not a number
+NUMERIC_COLUMNS = ['Row ID', 'Sales', 'Quantity', 'Discount', 'Profit']
+
+QUARANTINE_COLUMNS = ['line', 'problem', 'detail', 'text']
+
+# The C parser reports skipped lines as ParserWarnings, one line per message line
+SKIPPED_LINE = re.compile(r'Skipping line (\d+): (.*)')
+
+
+class SourceFormat:
+    def __init__(self, encoding='utf-8', delimiter=',', date_format=DATE_FORMAT):
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.date_format = date_format
+
+    def __str__(self):
+        return f"{self.encoding}, {self.delimiter!r}-separated, dates as {self.date_format}"
+
+    def as_dict(self):
+        return {'encoding': self.encoding, 'delimiter': self.delimiter, 'date_format': self.date_format}
+
+    def with_encoding(self, encoding):
+        return SourceFormat(encoding, self.delimiter, self.date_format)
+
+
+def _head(source, size=SNIFF_BYTES):
+    if hasattr(source, 'read'):
+        head = source.read(size)
+        source.seek(0)
+        return head
+    with open(source, 'rb') as f:
+        return f.read(size)
+
+
+def sniff_encoding(sample):
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # Incremental, so a character cut off at the end of the sample is fine
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        # Extracts saved from Excel
+        return 'latin-1'
+
+
+def sniff_delimiter(rows_by_delimiter):
+    # The delimiter whose header splits into several fields and that most
+    # sample rows agree with on the field count
+    best, best_score = DELIMITERS[0], 0
+    for delimiter, rows in rows_by_delimiter.items():
+        if len(rows) < 1 or len(rows[0]) < 2:
+            continue
+        score = 1 + sum(len(row) == len(rows[0]) for row in rows[1:])
+        if score > best_score:
+            best, best_score = delimiter, score
+    return best
+
+
+def sniff_date_format(values):
+    # The candidate that parses the most sampled dates
+    if not values:
+        return DATE_FORMAT
+    values = pd.Series(values)
+    parsed = [pd.to_datetime(values, format=fmt, errors='coerce').notna().sum() for fmt in DATE_FORMATS]
+    return DATE_FORMATS[int(np.argmax(parsed))]
+
+
+def sniff_format(source):
+    # source: a path or a binary buffer (rewound afterwards)
+    sample = _head(source)
+    encoding = sniff_encoding(sample)
+    text = sample.decode(encoding, errors='replace')
+    if len(sample) == SNIFF_BYTES:
+        text = text[:text.rfind('\n') + 1] or text  # drop the line cut off by the sample
+    rows = {delimiter: list(csv.reader(io.StringIO(text), delimiter=delimiter)) for delimiter in DELIMITERS}
+    delimiter = sniff_delimiter(rows)
+
+    rows = rows[delimiter]
+    header = rows[0] if rows else []
+    dates = [header.index(col) for col in DATE_COLUMNS if col in header]
+    values = [row[i] for row in rows[1:] for i in dates if i < len(row) and row[i]]
+    return SourceFormat(encoding, delimiter, sniff_date_format(values))
+
+
+class SourceReader:
+    # One parse of a CSV source in its sniffed format. Quarantined rows are
+    # collected as (line, problem, detail), line numbers counting the header as
+    # line 1 plus line_offset (for a block of rows parsed under a copied header).
+    # Rows past skipped lines are numbered assuming one line per record.
+
+    def __init__(self, source, fmt=None, line_offset=0):
+        self.source = source
+        self.format = fmt or sniff_format(source)
+        self.line_offset = line_offset
+        self.next_line = 2
+        self.bad = []
+
+    def _rewind(self):
+        if hasattr(self.source, 'seek'):
+            self.source.seek(0)
+        self.next_line = 2
+        self.bad = []
+
+    def _options(self, options):
+        return dict({'encoding': self.format.encoding, 'sep': self.format.delimiter,
+                     'on_bad_lines': 'warn'}, **options)
+
+    def _skipped(self, caught):
+        lines, details = [], []
+        for warning in caught:
+            for line, detail in SKIPPED_LINE.findall(str(warning.message)):
+                lines.append(int(line))
+                details.append(detail)
+        if lines:
+            self.bad.append(pd.DataFrame({'line': np.array(lines) + self.line_offset,
+                                          'problem': 'fields', 'detail': details}))
+        return np.array(lines, dtype=np.int64)
+
+    def read(self, clean=True, **options):
+        # The whole source as one frame; clean=False keeps every parsed value as read
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always', pd.errors.ParserWarning)
+                df = pd.read_csv(self.source, **self._options(options))
+        except UnicodeDecodeError:
+            # Valid UTF-8 in the sample only
+            self.format = self.format.with_encoding('latin-1')
+            self._rewind()
+            return self.read(clean, **options)
+        return self._clean(df, self._skipped(caught)) if clean else df
+
+    def chunks(self, chunksize, **options):
+        # Chunks of the source; a UnicodeDecodeError past the sample surfaces to
+        # the caller, which restarts with .format.with_encoding('latin-1')
+        parser = pd.read_csv(self.source, chunksize=chunksize, **self._options(options))
+        while True:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always', pd.errors.ParserWarning)
+                chunk = next(parser, None)
+            skipped = self._skipped(caught)
+            if chunk is None:
+                return
+            yield self._clean(chunk, skipped)
+
+    def _record_lines(self, n, skipped):
+        span = np.arange(self.next_line, self.next_line + n + len(skipped))
+        return np.setdiff1d(span, skipped, assume_unique=True)[:n]
+
+    def _clean(self, df, skipped):
+        # Drops incomplete rows and rows with unparseable dates or measures, and converts the dates
+        # with the sniffed format (prepare_frame() keeps them as they are)
+        n = len(df)
+        bad = np.zeros(n, dtype=bool)
+        problems = []
+        for col in REQUIRED_COLUMNS:
+            if col in df.columns:
+                missing = df[col].isna().to_numpy()
+                problems.append((col, missing & ~bad, 'missing', None))
+                bad |= missing
+        dates = {}
+        for col in DATE_COLUMNS:
+            if col in df.columns:
+                codes, parsed = parse_distinct(df[col], self.format.date_format)
+                # Code -1 (missing) picks the False appended at the end
+                unparsed = np.append(np.asarray(parsed.isna()), False)[codes]
+                problems.append((col, unparsed & ~bad, f"not a {self.format.date_format} date", df[col]))
+                bad |= unparsed
+                dates[col] = (codes, parsed.append(pd.DatetimeIndex([pd.NaT])))
+        for col in NUMERIC_COLUMNS:
+            if col in df.columns and df[col].dtype == object:
+                numbers = pd.to_numeric(df[col], errors='coerce')
+                unparsed = (numbers.isna() & df[col].notna()).to_numpy()
+                problems.append((col, unparsed & ~bad, 'not a number', df[col]))
+                bad |= unparsed
+                df[col] = numbers
+
+        if bad.any():
+            lines = self._record_lines(n, skipped) + self.line_offset
+            for col, rows, detail, values in problems:
+                if rows.any():
+                    self.bad.append(pd.DataFrame({
+                        'line': lines[rows], 'problem': col,
+                        'detail': detail if values is None else
+                                  [f"{detail}: {value!r}" for value in values.to_numpy()[rows]],
+                    }))
+            df = df[~bad].reset_index(drop=True)
+        for col, (codes, lookup) in dates.items():
+            df[col] = lookup.take(codes[~bad] if bad.any() else codes)
+        self.next_line += n + len(skipped)
+        return df
+
+    @property
+    def quarantined(self):
+        if not self.bad:
+            return pd.DataFrame(columns=QUARANTINE_COLUMNS[:-1])
+        return pd.concat(self.bad, ignore_index=True).sort_values('line', kind='stable', ignore_index=True)
+
+    def _line_texts(self, lines):
+        # Text of the given (offset) line numbers, from one scan up to the last one
+        wanted = set(int(line) - self.line_offset for line in lines)
+        last = max(wanted)
+        texts = {}
+        if hasattr(self.source, 'seek'):
+            self.source.seek(0)
+            f = io.TextIOWrapper(self.source, encoding=self.format.encoding, errors='replace', newline='')
+        else:
+            f = open(self.source, encoding=self.format.encoding, errors='replace', newline='')
+        try:
+            for number, text in enumerate(f, start=1):
+                if number in wanted:
+                    texts[number + self.line_offset] = text.rstrip('\r\n')
+                if number >= last:
+                    break
+        finally:
+            if hasattr(self.source, 'seek'):
+                f.detach()
+            else:
+                f.close()
+        return [texts.get(int(line), '') for line in lines]
+
+    def write_quarantine(self, target, append=False):
+        # -> {'path', 'rows', 'problems': {problem: count}} or None when nothing
+        # was quarantined; a full load without bad rows removes a stale file
+        bad = self.quarantined
+        if bad.empty:
+            if not append and os.path.exists(target):
+                os.remove(target)
+            return None
+        bad['text'] = self._line_texts(bad['line'].to_numpy())
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        if append and os.path.exists(target):
+            bad.to_csv(target, mode='a', header=False, index=False)
+        else:
+            tmp = f"{target}.tmp"
+            bad.to_csv(tmp, index=False)
+            os.replace(tmp, target)
+        return {'path': target, 'rows': len(bad), 'problems': bad['problem'].value_counts(sort=False).to_dict()}
+
+
+def quarantine_message(summary):
+    problems = ', '.join(f"{problem}: {count:,}" for problem, count in summary['problems'].items())
+    return f"⚠️  {summary['rows']:,} malformed rows quarantined in {summary['path']} ({problems})"
+
+
+def combine_quarantine(summaries):
+    # One summary for the quarantines of several files (or appends)
+    problems = {}
+    for summary in summaries:
+        for problem, count in summary['problems'].items():
+            problems[problem] = problems.get(problem, 0) + count
+    paths = list(dict.fromkeys(summary['path'] for summary in summaries))
+    return {'path': paths[0] if len(paths) == 1 else f"the cache directories of {len(paths)} files",
+            'rows': sum(summary['rows'] for summary in summaries), 'problems': problems}
@@ -0,0 +1,105 @@
+"""Order-level fact table built once at load time.
+
+One row per order carries its sales/profit totals, line count, order and ship
+dates, customer code and filter dimensions, with the row -> order mapping
+kept alongside. Orders can span several categories, so each order is also
+split into parts per (Region, Category, Segment); filtering those parts gives
+exact per-order totals for any sidebar state, and total orders / AOV become
+vectorized reductions over orders instead of string groupbys over line items.
+"""
+import numpy as np
+import pandas as pd
+
+from schema import allowed_codes, dimension_codes, id_codes, id_lookup, measure_values, pack_key, unpack_key
+
+PART_DIMENSIONS = ['Region', 'Category', 'Segment']
+
+
+def _day_numbers(values):
+    return np.asarray(values).astype('datetime64[D]').astype(np.int64)
+
+
+class OrderTable:
+    def __init__(self, orders, order_of_row, parts, dim_values):
+        self.orders = orders                # one row per order code
+        self.order_of_row = order_of_row    # line item -> order code
+        self.parts = parts                  # order code x (region, category, segment) splits
+        self.dim_values = dim_values        # dimension -> category labels
+
+        # Whole-dataset denominators, computed once rather than per interaction
+        self.n_orders = int((orders['Lines'] > 0).sum())
+        self.total_sales = float(orders['Sales'].sum())
+
+    @classmethod
+    def from_frame(cls, df):
+        order_of_row = id_codes(df, 'Order ID').astype(np.int64)
+        order_ids = id_lookup(df, 'Order ID')
+        n = len(order_ids)
+
+        # Order-level attributes are read from each order's first line
+        first_row = np.zeros(n, dtype=np.int64)
+        present, first_index = np.unique(order_of_row, return_index=True)
+        first_row[present] = first_index
+
+        sales = df['Sales'].to_numpy(dtype=np.float64)
+        orders = pd.DataFrame({
+            'Order ID': order_ids,
+            'Sales': np.bincount(order_of_row, weights=sales, minlength=n),
+            'Profit': np.bincount(order_of_row, weights=measure_values(df, 'Profit'), minlength=n),
+            'Lines': np.bincount(order_of_row, minlength=n),
+            'Order Date': df['Order Date'].to_numpy()[first_row],
+            'Ship Date': df['Ship Date'].to_numpy()[first_row],
+            'Customer Code': id_codes(df, 'Customer ID')[first_row],
+        })
+        for dim in PART_DIMENSIONS:
+            orders[dim] = df[dim].take(first_row).to_numpy()
+
+        # Same key layout as the cube: a missing label is a part of its own
+        dim_values = {dim: id_lookup(df, dim) for dim in PART_DIMENSIONS}
+        codes, sizes = zip(*(dimension_codes(df, dim) for dim in PART_DIMENSIONS))
+        part_keys, part_of_row = np.unique(pack_key(order_of_row, codes, sizes), return_inverse=True)
+
+        remainder, part_codes = unpack_key(part_keys, sizes)
+        parts = dict(zip(PART_DIMENSIONS, part_codes))
+        parts['order'] = remainder
+        parts['day'] = _day_numbers(orders['Order Date'].to_numpy()[remainder])
+        parts['Sales'] = np.bincount(part_of_row, weights=sales, minlength=len(part_keys))
+        parts['Lines'] = np.bincount(part_of_row, minlength=len(part_keys))
+        return cls(orders, order_of_row, parts, dim_values)
+
+    def everything(self):
+        lines = self.orders['Lines'].to_numpy()
+        return OrderSelection(self.orders['Sales'].to_numpy()[lines > 0])
+
+    def select(self, start=None, end=None, regions=None, categories=None, segments=None):
+        mask = np.ones(len(self.parts['order']), dtype=bool)
+        if start is not None:
+            mask &= self.parts['day'] >= _day_numbers(np.datetime64(pd.Timestamp(start).date()))
+        if end is not None:
+            mask &= self.parts['day'] <= _day_numbers(np.datetime64(pd.Timestamp(end).date()))
+        for dim, labels in zip(PART_DIMENSIONS, (regions, categories, segments)):
+            if labels is not None:
+                mask &= allowed_codes(self.dim_values[dim], labels)[self.parts[dim]]
+
+        n = len(self.orders)
+        order_codes = self.parts['order'][mask]
+        sales = np.bincount(order_codes, weights=self.parts['Sales'][mask], minlength=n)
+        lines = np.bincount(order_codes, weights=self.parts['Lines'][mask], minlength=n)
+        return OrderSelection(sales[lines > 0])
+
+
+class OrderSelection:
+    def __init__(self, order_sales):
+        self.order_sales = order_sales  # filtered sales total of every matching order
+
+    @property
+    def count(self):
+        return len(self.order_sales)
+
+    @property
+    def total_sales(self):
+        return float(self.order_sales.sum())
+
+    @property
+    def avg_order_value(self):
+        return float(self.order_sales.mean()) if self.count else 0
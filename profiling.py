@@ -0,0 +1,179 @@
+"""Lightweight timing and allocation spans for both entry points.
+
+Library code marks its stages with ``with profiling.span('name'):``; the
+dashboard, being a straight-line script, marks consecutive sections with
+``profiling.section('name')``. Both are no-ops returning a shared null
+context unless a Profiler is active in the current context (thread), so the
+instrumentation costs one context-variable lookup per span when disabled.
+
+An active Profiler records wall time and, with track_memory, the tracemalloc
+peak and net allocation of every span. Nested spans are keyed by their path
+('load/parse_csv'). Results render as a table, JSON, or Prometheus text
+exposition. tracemalloc is process-wide, so allocation figures from
+concurrent dashboard sessions can overlap; timings are per session.
+"""
+import json
+import time
+import tracemalloc
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+_ACTIVE = ContextVar('profiler', default=None)
+_NULL_SPAN = nullcontext()
+
+
+def active():
+    return _ACTIVE.get()
+
+
+def activate(profiler):
+    # Makes `profiler` (or None) the active one for this context, closing out
+    # whatever a previous, possibly interrupted, script run left active
+    previous = _ACTIVE.get()
+    if previous is not None and previous is not profiler:
+        previous.finish()
+        previous._stop_tracing()
+    _ACTIVE.set(profiler)
+    if profiler is not None:
+        profiler._start_tracing()
+    return profiler
+
+
+def span(name):
+    profiler = _ACTIVE.get()
+    return _NULL_SPAN if profiler is None else profiler.span(name)
+
+
+def section(name):
+    # Ends the previous dashboard section (if any) and starts `name`
+    profiler = _ACTIVE.get()
+    if profiler is not None:
+        profiler.section(name)
+
+
+class _Span:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        profiler = self.profiler
+        self.path = '/'.join([s.name for s in profiler.stack] + [self.name])
+        profiler.entry(self.path)  # reserve the slot so parents list before children
+        self.child_peak = 0
+        if profiler.track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if profiler.stack:
+                parent = profiler.stack[-1]
+                parent.child_peak = max(parent.child_peak, peak - parent.start_memory)
+            tracemalloc.reset_peak()
+            self.start_memory = current
+        profiler.stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        profiler = self.profiler
+        profiler.stack.pop()
+        peak = net = 0
+        if profiler.track_memory:
+            current, traced_peak = tracemalloc.get_traced_memory()
+            peak = max(self.child_peak, traced_peak - self.start_memory)
+            net = current - self.start_memory
+            if profiler.stack:
+                parent = profiler.stack[-1]
+                parent.child_peak = max(parent.child_peak, peak + self.start_memory - parent.start_memory)
+        profiler.record(self.path, seconds, peak, net)
+        return False
+
+
+class Profiler:
+    def __init__(self, track_memory=True):
+        self.track_memory = track_memory
+        self.stack = []
+        self.records = {}   # span path -> {'calls', 'seconds', 'peak_bytes', 'net_bytes'}
+        self._section = None
+        self._token = None
+        self._started_tracing = False
+
+    # Activation: spans anywhere in this context report to this profiler
+
+    def __enter__(self):
+        self._token = _ACTIVE.set(self)
+        self._start_tracing()
+        return self
+
+    def __exit__(self, *exc):
+        self.finish()
+        _ACTIVE.reset(self._token)
+        self._stop_tracing()
+        return False
+
+    def _start_tracing(self):
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def _stop_tracing(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def section(self, name):
+        self.finish()
+        self._section = self.span(name).__enter__()
+
+    def finish(self):
+        if self._section is not None:
+            section, self._section = self._section, None
+            section.__exit__(None, None, None)
+
+    def entry(self, path):
+        return self.records.setdefault(path, {'calls': 0, 'seconds': 0.0, 'peak_bytes': 0, 'net_bytes': 0})
+
+    def record(self, path, seconds, peak_bytes=0, net_bytes=0):
+        entry = self.entry(path)
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        entry['peak_bytes'] = max(entry['peak_bytes'], peak_bytes)
+        entry['net_bytes'] += net_bytes
+
+    # Output formats
+
+    def to_records(self):
+        return [dict(span=path, **entry) for path, entry in self.records.items()]
+
+    def to_json(self):
+        return json.dumps({'spans': self.to_records()}, indent=2)
+
+    def to_prometheus(self, prefix='superstore'):
+        metrics = [
+            ('span_seconds_total', 'counter', 'Wall time spent in the span', 'seconds'),
+            ('span_calls_total', 'counter', 'Number of times the span ran', 'calls'),
+            ('span_peak_bytes', 'gauge', 'Largest traced allocation peak inside the span', 'peak_bytes'),
+            ('span_net_bytes', 'gauge', 'Traced memory still allocated when the span ended', 'net_bytes'),
+        ]
+        lines = []
+        for name, kind, help_text, field in metrics:
+            if field in ('peak_bytes', 'net_bytes') and not self.track_memory:
+                continue
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for path, entry in self.records.items():
+                label = path.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{prefix}_{name}{{span="{label}"}} {entry[field]}')
+        return '\n'.join(lines) + '\n'
+
+    def format_table(self):
+        lines = [f"{'Span':<34} {'Calls':>6} {'Time (ms)':>11} {'Peak MB':>9} {'Net MB':>8}"]
+        for path, entry in self.records.items():
+            indent = '  ' * path.count('/')
+            name = indent + path.rsplit('/', 1)[-1]
+            memory = (f"{entry['peak_bytes'] / 1024 ** 2:>9.2f} {entry['net_bytes'] / 1024 ** 2:>8.2f}"
+                      if self.track_memory else f"{'-':>9} {'-':>8}")
+            lines.append(f"{name:<34} {entry['calls']:>6} {entry['seconds'] * 1000:>11.1f} {memory}")
+        return '\n'.join(lines)
@@ -0,0 +1,250 @@
+"""Business report shared by the in-memory and streaming modes of analysis.py.
+
+report_from_backend() computes the report through any compute backend (see
+backends.py) and build_report() does so for a full pandas DataFrame; the streaming
+aggregator produces the same dictionary from per-dimension base aggregates via
+finish_report(), and print_report() renders either one identically.
+"""
+import calendar
+
+import profiling
+from backends import PandasBackend
+from metrics import MetricsPlan
+
+# Every breakdown in the report, answered by one fused compute_metrics() pass
+REPORT_PLAN = MetricsPlan({
+    'Segment': [('Sales', 'sum'), ('Profit', 'sum'), ('Customer ID', 'nunique'), ('Order ID', 'nunique')],
+    'Category': [('Sales', 'sum'), ('Profit', 'sum'), ('Quantity', 'sum'), ('Order ID', 'nunique')],
+    'Region': [('Sales', 'sum'), ('Profit', 'sum'), ('Customer ID', 'nunique'), ('Order ID', 'nunique')],
+    'Month_Name': [('Sales', 'sum')],
+    'Year': [('Sales', 'sum')],
+    ('Year', 'Month'): [('Sales', 'sum'), ('Profit', 'sum'), ('Order ID', 'nunique')],
+})
+
+
+def segment_table(base):
+    # base: Segment -> Sales, Profit, Customer ID (distinct), Order ID (distinct)
+    table = base[['Sales', 'Profit', 'Customer ID', 'Order ID']].round(2)
+    table['Avg_Order_Value'] = (table['Sales'] / table['Order ID']).round(2)
+    table['Profit_Margin'] = (table['Profit'] / table['Sales'] * 100).round(2)
+    return table
+
+
+def category_table(base):
+    # base: Category -> Sales, Profit, Quantity, Order ID (distinct)
+    table = base[['Sales', 'Profit', 'Quantity', 'Order ID']].round(2)
+    table['Profit_Margin'] = (table['Profit'] / table['Sales'] * 100).round(2)
+    table['Avg_Order_Value'] = (table['Sales'] / table['Order ID']).round(2)
+    return table
+
+
+def region_table(base):
+    # base: Region -> Sales, Profit, Customer ID (distinct), Order ID (distinct)
+    table = base[['Sales', 'Profit', 'Customer ID', 'Order ID']].round(2)
+    table['Profit_Margin'] = (table['Profit'] / table['Sales'] * 100).round(2)
+    table['Sales_per_Customer'] = (table['Sales'] / table['Customer ID']).round(2)
+    return table
+
+
+def finish_report(kpis, monthly_sales, monthly_totals, yearly_sales,
+                  segment_base, category_base, region_base, top_products, top_customers, top_errors=None):
+    kpis = dict(kpis)
+    kpis['overall_margin'] = kpis['total_profit'] / kpis['total_sales'] * 100
+    return {
+        'kpis': kpis,
+        'monthly_sales': monthly_sales.round(2),
+        'monthly_totals': monthly_totals.sort_values(ascending=False),
+        'yearly_sales': yearly_sales.sort_index(),
+        'segments': segment_table(segment_base),
+        'categories': category_table(category_base),
+        'regions': region_table(region_base),
+        'top_products': top_products,
+        'top_customers': top_customers,
+        # Only set for approximate (sketch) rankings: max overestimate per entry
+        'top_errors': top_errors,
+        # Only set for sampled estimates (analysis.py --approx): 95% half-widths
+        'intervals': None,
+    }
+
+
+def build_report(df, top_n=5):
+    return report_from_backend(PandasBackend(df), top_n)
+
+
+def report_from_backend(backend, top_n=5):
+    with profiling.span('metrics'):
+        results = backend.aggregate(REPORT_PLAN)
+    with profiling.span('kpis'):
+        kpis = backend.kpis()
+    with profiling.span('top_k'):
+        top_products = backend.top_k('Product ID', 'Sales', top_n, label_column='Product Name')
+        top_customers = backend.top_k('Customer ID', 'Sales', top_n, label_column='Customer Name')
+    return finish_report(
+        kpis,
+        monthly_sales=results[('Year', 'Month')],
+        monthly_totals=results['Month_Name']['Sales'],
+        yearly_sales=results['Year']['Sales'],
+        segment_base=results['Segment'],
+        category_base=results['Category'],
+        region_base=results['Region'],
+        top_products=top_products,
+        top_customers=top_customers,
+    )
+
+
+def yoy_growth(yearly_sales, monthly_sales):
+    # -> [(year, growth %, (first month, last month) or None)] for every year after
+    # the first. A year whose months differ from the year before (a partial first
+    # or last year) is compared like-for-like over the months both years have.
+    months = monthly_sales['Sales'].unstack('Month') if len(monthly_sales) else None
+    growth = []
+    for previous, year in zip(yearly_sales.index[:-1], yearly_sales.index[1:]):
+        if year != previous + 1 or not yearly_sales[previous]:
+            continue
+        span = None
+        current_total, previous_total = yearly_sales[year], yearly_sales[previous]
+        if months is not None and year in months.index and previous in months.index:
+            current, before = months.loc[year].dropna(), months.loc[previous].dropna()
+            if set(current.index) != set(before.index):
+                common = current.index.intersection(before.index)
+                if not len(common) or not before[common].sum():
+                    continue
+                current_total, previous_total = current[common].sum(), before[common].sum()
+                span = (int(common.min()), int(common.max()))
+        growth.append((year, (current_total / previous_total - 1) * 100, span))
+    return growth
+
+
+def _error_note(errors, position):
+    if errors is None or not errors[position - 1]:
+        return ""
+    return f"  (≤ ${errors[position - 1]:,.0f} over)"
+
+
+def print_intervals(report):
+    # 95% intervals of an estimated report (analysis.py --approx)
+    intervals = report['intervals']
+    kpis, errors = report['kpis'], intervals['kpis']
+    print("\n📏 ESTIMATE PRECISION (95% confidence)")
+    print("-" * 40)
+    print(f"Total Sales:        ${kpis['total_sales']:,.2f} ± ${errors['total_sales']:,.2f}")
+    print(f"Total Profit:       ${kpis['total_profit']:,.2f} ± ${errors['total_profit']:,.2f}")
+    print(f"Total Orders:       {kpis['total_orders']:,} ± {errors['total_orders']:,.0f}")
+    print(f"Average Order:      ${kpis['avg_order_value']:.2f} ± ${errors['avg_order_value']:.2f}")
+    for section, title in (('segments', 'Segment'), ('categories', 'Category'), ('regions', 'Region')):
+        for name, error in intervals[section]['Sales'].items():
+            print(f"{title} {name:<15} Sales ± ${error:,.0f}")
+    for year, error in intervals['yearly_sales'].items():
+        print(f"Year {year:<20} Sales ± ${error:,.0f}")
+
+
+def print_report(report):
+    kpis = report['kpis']
+    customer_segment_analysis = report['segments']
+    category_analysis = report['categories']
+    regional_analysis = report['regions']
+
+    # BUSINESS ANALYSIS BEGINS HERE
+    print("\n" + "=" * 60)
+    print("📈 BUSINESS INTELLIGENCE ANALYSIS")
+    print("=" * 60)
+
+    # 1. OVERALL PERFORMANCE METRICS
+    print("\n💰 KEY PERFORMANCE INDICATORS")
+    print("-" * 40)
+    print(f"Total Sales:        ${kpis['total_sales']:,.2f}")
+    print(f"Total Profit:       ${kpis['total_profit']:,.2f}")
+    print(f"Total Orders:       {kpis['total_orders']:,}")
+    print(f"Average Order:      ${kpis['avg_order_value']:.2f}")
+    print(f"Profit Margin:      {kpis['overall_margin']:.2f}%")
+    print(
+        f"Date Range:         {kpis['date_min'].strftime('%Y-%m-%d')} to {kpis['date_max'].strftime('%Y-%m-%d')}")
+
+    # 2. SALES TRENDS ANALYSIS
+    print("\n📅 SALES TRENDS ANALYSIS")
+    print("-" * 40)
+
+    # Find best and worst months
+    monthly_totals = report['monthly_totals']
+    print(f"Best Month:         {monthly_totals.index[0]} (${monthly_totals.iloc[0]:,.2f})")
+    print(f"Worst Month:        {monthly_totals.index[-1]} (${monthly_totals.iloc[-1]:,.2f})")
+
+    # Year over year growth
+    for year, growth, span in yoy_growth(report['yearly_sales'], report['monthly_sales']):
+        months = (f"  ({calendar.month_abbr[span[0]]}–{calendar.month_abbr[span[1]]} vs same months)"
+                  if span else "")
+        print(f"{f'YoY Growth {year}:':<20}{growth:.1f}%{months}")
+
+    # 3. CUSTOMER SEGMENTATION ANALYSIS
+    print("\n👥 CUSTOMER SEGMENTATION")
+    print("-" * 40)
+    print("Segment Performance:")
+    for segment in customer_segment_analysis.index:
+        row = customer_segment_analysis.loc[segment]
+        print(
+            f"{segment:<12} | Sales: ${row['Sales']:>8,.0f} | Profit: ${row['Profit']:>7,.0f} | Margin: {row['Profit_Margin']:>5.1f}%")
+
+    # 4. PRODUCT CATEGORY ANALYSIS
+    print("\n🛍️  PRODUCT CATEGORY PERFORMANCE")
+    print("-" * 40)
+    print("Category Performance:")
+    for category in category_analysis.index:
+        row = category_analysis.loc[category]
+        print(
+            f"{category:<12} | Sales: ${row['Sales']:>8,.0f} | Margin: {row['Profit_Margin']:>5.1f}% | AOV: ${row['Avg_Order_Value']:>6.0f}")
+
+    # 5. REGIONAL ANALYSIS
+    print("\n🗺️  REGIONAL PERFORMANCE")
+    print("-" * 40)
+    print("Regional Performance:")
+    for region in regional_analysis.index:
+        row = regional_analysis.loc[region]
+        print(
+            f"{region:<8} | Sales: ${row['Sales']:>8,.0f} | Customers: {row['Customer ID']:>4} | Sales/Customer: ${row['Sales_per_Customer']:>6.0f}")
+
+    # 6. TOP PERFORMERS ANALYSIS
+    print("\n🏆 TOP PERFORMERS")
+    print("-" * 40)
+
+    # Top products by sales
+    top_errors = report.get('top_errors') or {}
+    top_products_sales = report['top_products']
+    print(f"Top {len(top_products_sales)} Products by Sales:")
+    for i, (product, sales) in enumerate(top_products_sales.items(), 1):
+        print(f"{i}. {product[:50]:<50} ${sales:>8,.0f}{_error_note(top_errors.get('products'), i)}")
+
+    # Top customers by sales
+    top_customers = report['top_customers']
+    print(f"\nTop {len(top_customers)} Customers by Sales:")
+    for i, (customer, sales) in enumerate(top_customers.items(), 1):
+        print(f"{i}. {customer:<30} ${sales:>8,.0f}{_error_note(top_errors.get('customers'), i)}")
+
+    # 7. KEY BUSINESS INSIGHTS
+    print("\n" + "=" * 60)
+    print("💡 KEY BUSINESS INSIGHTS")
+    print("=" * 60)
+
+    # Calculate insights
+    best_region = regional_analysis['Sales'].idxmax()
+    best_category = category_analysis['Profit_Margin'].idxmax()
+    best_segment = customer_segment_analysis['Profit_Margin'].idxmax()
+    worst_performers = category_analysis['Profit_Margin'].idxmin()
+
+    print(f"🎯 OPPORTUNITIES IDENTIFIED:")
+    print(f"   • {best_region} region generates highest sales (${regional_analysis.loc[best_region, 'Sales']:,.0f})")
+    print(
+        f"   • {best_category} category has highest profit margin ({category_analysis.loc[best_category, 'Profit_Margin']:.1f}%)")
+    print(
+        f"   • {best_segment} segment most profitable ({customer_segment_analysis.loc[best_segment, 'Profit_Margin']:.1f}% margin)")
+    print(
+        f"   • Improvement needed in {worst_performers} category ({category_analysis.loc[worst_performers, 'Profit_Margin']:.1f}% margin)")
+
+    # Calculate potential impact
+    profit_opportunity = category_analysis.loc[best_category, 'Sales'] * 0.05  # 5% margin improvement
+    print(f"   • Potential profit increase: ${profit_opportunity:,.0f} (5% margin improvement on best category)")
+
+    print(f"\n📊 DASHBOARD READY METRICS:")
+    print(f"   • Total KPIs: Sales, Profit, Orders, AOV calculated ✅")
+    print(f"   • Time trends: Monthly, quarterly, yearly data prepared ✅")
+    print(f"   • Segmentation: Customer, product, regional analysis complete ✅")
+    print(f"   • Top performers: Products and customers identified ✅")
@@ -0,0 +1,157 @@
+"""Filter-state-keyed result cache shared by every dashboard session and process.
+
+Results (aggregate tables, chart data, rankings) are pickled into a local
+SQLite file keyed on a namespace plus the normalized filter state (see
+filter_index.filter_key) and tagged with the dataset version. Any session or
+Streamlit worker process computing the same view on the same data gets the
+stored copy. Entries are evicted least recently used once the stored bytes
+exceed max_bytes, and entries from an older dataset version are dropped the
+first time a newer version is seen. Hit, miss and eviction counters live in
+the same file, so they cover all processes.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+
+DEFAULT_PATH = os.environ.get('SUPERSTORE_RESULT_CACHE',
+                              os.path.join(tempfile.gettempdir(), 'superstore-results.sqlite3'))
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def cache_key(namespace, state):
+    payload = json.dumps([namespace, state], default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()   # sqlite connections are per thread
+        self._current_version = None
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def _connect(self):
+        return _Transaction(self._connection())
+
+    def _count(self, db, name, amount=1):
+        db.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                   "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, amount))
+
+    def invalidate(self, version):
+        # Drop everything computed from any other dataset version
+        with self._connect() as db:
+            removed = db.execute("DELETE FROM entries WHERE version != ?", (version,)).rowcount
+            if removed:
+                self._count(db, 'invalidated', removed)
+        self._current_version = version
+
+    def get(self, namespace, state, version):
+        # Stored result for this state and dataset version, or None
+        if version != self._current_version:
+            self.invalidate(version)
+        key = cache_key(namespace, state)
+        with self._connect() as db:
+            row = db.execute("SELECT value FROM entries WHERE key = ? AND version = ?", (key, version)).fetchone()
+            if row is not None:
+                db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._count(db, 'hits')
+        if row is not None:
+            try:
+                return pickle.loads(row[0])
+            except (pickle.PickleError, EOFError, AttributeError, ImportError):
+                pass  # written by incompatible code; recompute and overwrite
+        return None
+
+    def put(self, namespace, state, version, value):
+        key = cache_key(namespace, state)
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._connect() as db:
+            self._count(db, 'misses')
+            if len(blob) <= self.max_bytes:
+                db.execute("INSERT OR REPLACE INTO entries (key, version, size, last_used, value) "
+                           "VALUES (?, ?, ?, ?, ?)", (key, version, len(blob), time.time(), blob))
+                self._evict(db)
+
+    def get_or_compute(self, namespace, state, version, compute):
+        value = self.get(namespace, state, version)
+        if value is None:
+            value = compute()
+            self.put(namespace, state, version, value)
+        return value
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._count(db, 'evictions', evicted)
+
+    def stats(self):
+        with self._connect() as db:
+            counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'evictions': counters.get('evictions', 0),
+            'invalidated': counters.get('invalidated', 0),
+            'entries': entries,
+            'bytes': size,
+        }
+
+    def clear(self):
+        with self._connect() as db:
+            db.execute("DELETE FROM entries")
+            db.execute("DELETE FROM counters")
+
+
+class _Transaction:
+    # Explicit BEGIN IMMEDIATE / COMMIT so concurrent writers queue on the lock
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, *exc):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
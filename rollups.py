@@ -0,0 +1,261 @@
+"""Hierarchical drill-down rollups: Category → Sub-Category → Product, Region → State → City.
+
+A hierarchy is indexed once per dataset. Every row gets the code of its leaf,
+a distinct full path such as Furniture / Chairs / FUR-CH-10000454, so a city
+name shared by two states stays two nodes. Every node records its parent.
+Rolling up a filter state costs one bincount of the selected rows into leaves;
+each level above is summed from the level below, never from the rows.
+
+Each level is ranked with one lexsort by (parent, metric), so the children of
+any node form one contiguous, already-ranked run and a page is a slice of it.
+The same sort gives every node's best child (e.g. the highest-margin
+sub-category of each category) without grouping again.
+
+    python rollups.py [path] --hierarchy Product --drill Furniture/Chairs --rank-by Profit_Margin
+    python rollups.py [path] --check
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_PATH, load_superstore
+from metrics import encode_column
+from schema import measure_values
+from topk import disambiguate
+
+# name -> levels as (key column, display label column), top level first
+HIERARCHIES = {
+    'Product': [('Category', 'Category'), ('Sub-Category', 'Sub-Category'), ('Product ID', 'Product Name')],
+    'Geography': [('Region', 'Region'), ('State', 'State'), ('City', 'City')],
+}
+
+MEASURES = ['Sales', 'Profit', 'Quantity']
+RANK_METRICS = ['Sales', 'Profit', 'Profit_Margin', 'Quantity']
+PAGE_SIZE = 20
+
+
+def _title(name, level):
+    # Column heading for a level: its display label column (Product Name, not Product ID)
+    return HIERARCHIES[name][level][1]
+
+
+class Hierarchy:
+    def __init__(self, name, levels, leaf_of_row, parents, keys, labels):
+        self.name = name
+        self.levels = levels              # key column per level, top level first
+        self.leaf_of_row = leaf_of_row    # row -> leaf node (-1 when a level is missing)
+        self.parents = parents            # level -> node -> parent node one level up (zeros at the top)
+        self.keys = keys                  # level -> node -> key value (e.g. the Product ID)
+        self.labels = labels              # level -> node -> display label
+
+    @classmethod
+    def from_frame(cls, df, name):
+        columns = HIERARCHIES[name]
+        encoded = [encode_column(df[key]) for key, _ in columns]
+        sizes = [len(values) for _, values in encoded]
+
+        # One combined key per row over every level; its distinct values are the leaves
+        combined = np.zeros(len(df), dtype=np.int64)
+        valid = np.ones(len(df), dtype=bool)
+        for (codes, _), size in zip(encoded, sizes):
+            valid &= codes >= 0
+            combined = combined * size + codes
+        rows = np.flatnonzero(valid)
+        leaves, first_row, leaf_of_valid = np.unique(combined[rows], return_index=True, return_inverse=True)
+        leaf_of_row = np.full(len(df), -1, dtype=np.int32)
+        leaf_of_row[rows] = leaf_of_valid
+        first_row = rows[first_row]
+
+        # Leaves are sorted, so each level's nodes are contiguous runs of leaves
+        # sharing a key prefix; a node's parent is the run containing its prefix
+        parents, keys, labels = [], [], []
+        above = None
+        for level, ((key, label), (_, values)) in enumerate(zip(columns, encoded)):
+            prefix = leaves // int(np.prod(sizes[level + 1:], dtype=np.int64))
+            nodes, first_leaf = np.unique(prefix, return_index=True)
+            parents.append(np.zeros(len(nodes), dtype=np.int64) if above is None
+                           else np.searchsorted(above, nodes // sizes[level]))
+            node_keys = np.asarray(values.take(nodes % sizes[level]), dtype=object)
+            node_labels = df[label].to_numpy()[first_row[first_leaf]]
+            keys.append(node_keys)
+            labels.append(np.asarray(disambiguate(np.asarray(node_labels, dtype=object), node_keys)
+                                     if label != key else node_keys, dtype=object))
+            above = nodes
+        return cls(name, [key for key, _ in columns], leaf_of_row, parents, keys, labels)
+
+    def rollup(self, df, rows=None):
+        # rows: optional slice / position array (a RowSelection's positions)
+        leaf_of_row = self.leaf_of_row if rows is None else self.leaf_of_row[rows]
+        keep = leaf_of_row >= 0
+        leaf_of_row = leaf_of_row[keep]
+        n_leaves = len(self.parents[-1])
+
+        def leaf_sums(column):
+            values = measure_values(df, column)
+            values = values if rows is None else values[rows]
+            return np.bincount(leaf_of_row, weights=values[keep], minlength=n_leaves)
+
+        totals = [None] * len(self.levels)
+        totals[-1] = {m: leaf_sums(m) for m in MEASURES}
+        totals[-1]['Lines'] = np.bincount(leaf_of_row, minlength=n_leaves).astype(np.float64)
+        for level in range(len(self.levels) - 2, -1, -1):
+            children = self.parents[level + 1]
+            n_nodes = len(self.parents[level])
+            totals[level] = {m: np.bincount(children, weights=sums, minlength=n_nodes)
+                             for m, sums in totals[level + 1].items()}
+        return Rollup(self.name, self.levels, self.parents, self.keys, self.labels, totals)
+
+
+class Rollup:
+    # Measures of every node of one hierarchy for one filter state; small enough to pickle
+    def __init__(self, name, levels, parents, keys, labels, totals):
+        self.name = name
+        self.levels = levels
+        self.parents = parents
+        self.keys = keys
+        self.labels = labels
+        self.totals = totals
+        for sums in totals:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                sums['Profit_Margin'] = np.where(sums['Sales'] != 0, sums['Profit'] / sums['Sales'] * 100, np.nan)
+        self._rankings = {}
+
+    def ranking(self, level, metric):
+        # -> (nodes with rows, ranked within parent, parent of each, start of each parent's run)
+        if (level, metric) not in self._rankings:
+            sums = self.totals[level]
+            present = np.flatnonzero(sums['Lines'] > 0)
+            values = np.nan_to_num(sums[metric][present], nan=-np.inf)
+            parents = self.parents[level][present]
+            order = present[np.lexsort((present, -values, parents))]
+            parent_of = self.parents[level][order]
+            n_parents = len(self.parents[level - 1]) if level else 1
+            starts = np.searchsorted(parent_of, np.arange(n_parents + 1))
+            self._rankings[level, metric] = (order, parent_of, starts)
+        return self._rankings[level, metric]
+
+    def children(self, level, parent=None, metric='Sales'):
+        # Nodes of `level` under `parent` (a node of level - 1), best first
+        order, _, starts = self.ranking(level, metric)
+        if level == 0:
+            return order
+        return order[starts[parent]:starts[parent + 1]]
+
+    def best_children(self, level, metric='Profit_Margin'):
+        # Best node of `level` under every node of level - 1 (-1 where it has none)
+        order, _, starts = self.ranking(level, metric)
+        best = np.full(len(starts) - 1, -1, dtype=np.int64)
+        has_children = np.diff(starts) > 0
+        best[has_children] = order[starts[:-1][has_children]]
+        return best
+
+    def best(self, metric='Profit_Margin'):
+        # Label of the best top-level node, or None when the selection is empty
+        order = self.children(0, metric=metric)
+        return self.labels[0][order[0]] if len(order) else None
+
+    def find(self, level, label, parent=None):
+        matches = np.flatnonzero(self.labels[level] == label)
+        if parent is not None:
+            matches = matches[self.parents[level][matches] == parent]
+        return int(matches[0]) if len(matches) else None
+
+    def page(self, level, parent=None, metric='Sales', page=1, page_size=PAGE_SIZE):
+        # -> (table of one page of children, number of children)
+        nodes = self.children(level, parent, metric)
+        first = (page - 1) * page_size
+        shown = nodes[first:first + page_size]
+        sums = self.totals[level]
+        if level == 0:
+            share = sums['Sales'][shown] / sums['Sales'][nodes].sum() * 100 if len(nodes) else []
+        else:
+            share = sums['Sales'][shown] / self.totals[level - 1]['Sales'][parent] * 100
+        table = pd.DataFrame({
+            'Rank': np.arange(first + 1, first + len(shown) + 1),
+            _title(self.name, level): self.labels[level][shown],
+            'Sales': sums['Sales'][shown],
+            'Profit': sums['Profit'][shown],
+            'Profit_Margin': sums['Profit_Margin'][shown],
+            'Quantity': sums['Quantity'][shown].astype(np.int64),
+            'Share_of_Sales': share,
+        })
+        if level + 1 < len(self.levels):
+            best = self.best_children(level + 1)[shown]
+            table[f"Best Margin {_title(self.name, level + 1)}"] = np.where(
+                best >= 0, self.labels[level + 1][np.maximum(best, 0)], None)
+        return table, len(nodes)
+
+
+def _check(df, hierarchy, rows):
+    # Every level against a pandas groupby on the full key path -> number of mismatches
+    rollup = hierarchy.rollup(df, rows)
+    frame = df if rows is None else df.iloc[rows]
+    mismatches = 0
+    for level in range(len(hierarchy.levels)):
+        path = hierarchy.levels[:level + 1]
+        expected = frame.groupby(path, observed=True)[MEASURES].sum().reset_index()
+        sums = rollup.totals[level]
+        present = np.flatnonzero(sums['Lines'] > 0)
+        actual = pd.DataFrame({m: sums[m][present] for m in MEASURES})
+        chain = present
+        for up in range(level, -1, -1):
+            actual.insert(0, path[up], hierarchy.keys[up][chain])
+            chain = hierarchy.parents[up][chain]
+        expected[path] = expected[path].astype(object)
+        actual, expected = (table.sort_values(path).reset_index(drop=True) for table in (actual, expected))
+        try:
+            pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-9)
+        except AssertionError as error:
+            mismatches += 1
+            print(f"   ❌ {' → '.join(path)}: {str(error).splitlines()[0]}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print one page of a drill-down rollup")
+    parser.add_argument('path', nargs='?', default=DATA_PATH)
+    parser.add_argument('--hierarchy', choices=list(HIERARCHIES), default='Product')
+    parser.add_argument('--drill', default='', help="labels down the hierarchy, e.g. Furniture/Chairs")
+    parser.add_argument('--rank-by', choices=RANK_METRICS, default='Sales')
+    parser.add_argument('--page', type=int, default=1)
+    parser.add_argument('--check', action='store_true',
+                        help="compare every level with a pandas groupby (all rows and one Region)")
+    args = parser.parse_args()
+
+    df = load_superstore(args.path)
+    start = time.perf_counter()
+    hierarchy = Hierarchy.from_frame(df, args.hierarchy)
+    print(f"🌳 {args.hierarchy} hierarchy indexed in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({' → '.join(f'{len(labels):,} {level}' for level, labels in zip(hierarchy.levels, hierarchy.labels))})")
+
+    if args.check:
+        region = df['Region'].cat.categories[0]
+        mismatches = 0
+        for name in HIERARCHIES:
+            tree = hierarchy if name == args.hierarchy else Hierarchy.from_frame(df, name)
+            for rows in (None, np.flatnonzero((df['Region'] == region).to_numpy())):
+                mismatches += _check(df, tree, rows)
+        print(f"{'✅' if not mismatches else '❌'} Rollups checked against groupby: {mismatches} mismatch(es)")
+        raise SystemExit(1 if mismatches else 0)
+
+    start = time.perf_counter()
+    rollup = hierarchy.rollup(df)
+    print(f"📊 Rolled up {len(df):,} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+    parent = None
+    path = [label for label in args.drill.split('/') if label]
+    for level, label in enumerate(path[:len(hierarchy.levels) - 1]):
+        parent = rollup.find(level, label, parent)
+        if parent is None:
+            parser.error(f"no {hierarchy.levels[level]} {label!r} under {'/'.join(path[:level]) or 'the top'}")
+    level = len(path[:len(hierarchy.levels) - 1])
+    table, total = rollup.page(level, parent, args.rank_by, args.page)
+    pages = max(1, -(-total // PAGE_SIZE))
+    print(f"\n🔎 {' → '.join(['All'] + path[:level])}: {total:,} {hierarchy.levels[level]} "
+          f"by {args.rank_by}, page {args.page} of {pages}")
+    print(table.round(2).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
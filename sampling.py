@@ -0,0 +1,344 @@
+"""Stratified row sample for approximate-first answers with error bounds.
+
+Rows are stratified by Region x Category x Segment x order month, and each
+stratum keeps a random fraction of its rows (at least a minimum count, at
+most all of them). A sampled row stands for N_h / n_h rows of its stratum,
+so weighted sums are unbiased (Horvitz-Thompson) estimates of totals over
+any filter state. Their variance is the usual stratified formula,
+sum over h of N_h^2 (1 - n_h/N_h) s_h^2 / n_h, where s_h^2 is computed on the
+filter-masked values. Intervals are 95% (± 1.96 standard errors).
+
+Every breakdown the dashboard and report use (Region, Category, Segment, month,
+year, month name) is a union of whole strata. Each stratum's estimate and
+variance are therefore computed once and then summed per group.
+
+Distinct counts are estimated the same way. Each sampled line contributes
+1 / (lines its order has in the group), so an order's lines sum to one.
+The per-order and per-customer line counts are taken from the full data when
+the sample is built. Region, Segment and Order Date are order-level in
+Superstore, and Segment is customer-level. Only Category (for orders) and
+Region (for customers) split them, and the counts are kept per value of
+those.
+"""
+import numpy as np
+import pandas as pd
+
+from schema import (CALENDAR_CATEGORIES, allowed_codes, dimension_codes, id_codes, id_lookup, measure_values,
+                    pack_key, unpack_key)
+from topk import disambiguate
+
+STRATA = ['Region', 'Category', 'Segment']
+DEFAULT_FRACTION = 0.02
+MIN_PER_STRATUM = 5
+Z = 1.96
+
+# Only these columns are kept for the sampled rows
+SAMPLE_COLUMNS = ['Order Date', 'Sales', 'Profit', 'Quantity',
+                  'Product ID', 'Product Name', 'Customer ID', 'Customer Name']
+
+
+def _month_numbers(dates):
+    return np.asarray(dates).astype('datetime64[M]').astype(np.int64)
+
+
+class StratifiedSample:
+    def __init__(self, frame, stratum, population, sampled, strata_codes, dim_values, first_month,
+                 order_lines, customer_lines, n_rows):
+        self.frame = frame                  # the sampled rows
+        self.stratum = stratum              # sampled row -> stratum
+        self.population = population        # stratum -> rows in the data (N_h)
+        self.sampled = sampled              # stratum -> rows in the sample (n_h)
+        self.strata_codes = strata_codes    # 'Region' / 'Category' / 'Segment' / 'Month' -> stratum -> code
+                                            # (a missing label has the code past its labels)
+        self.dim_values = dim_values        # dimension -> labels
+        self.first_month = first_month      # month number of Month code 0
+        self.order_lines = order_lines      # sampled row -> lines of its order in each Category
+        self.customer_lines = customer_lines  # sampled row -> lines of its customer in each Region
+        self.n_rows = n_rows
+        self.row_codes = {dim: codes[stratum] for dim, codes in strata_codes.items()}
+
+    @classmethod
+    def from_frame(cls, df, fraction=DEFAULT_FRACTION, min_per_stratum=MIN_PER_STRATUM, seed=0):
+        dim_values = {dim: id_lookup(df, dim) for dim in STRATA}
+        months = _month_numbers(df['Order Date'].to_numpy())
+        first_month = int(months.min()) if len(months) else 0
+        n_months = int(months.max()) - first_month + 1 if len(months) else 1
+        # Rows with a missing Region / Category / Segment form strata of their own
+        codes, sizes = zip(*(dimension_codes(df, dim) for dim in STRATA))
+        sizes = list(sizes) + [n_months]
+        stratum = pack_key(np.zeros(len(df)), list(codes) + [months - first_month], sizes)
+        n_strata = int(np.prod(sizes))
+        population = np.bincount(stratum, minlength=n_strata)
+        sampled = np.minimum(population, np.maximum(np.ceil(population * fraction).astype(np.int64),
+                                                    min_per_stratum))
+
+        # The first n_h rows of each stratum in a random order: one sort on stratum + U[0, 1)
+        rng = np.random.default_rng(seed)
+        order = np.argsort(stratum + rng.random(len(df)), kind='stable')
+        starts = np.concatenate(([0], np.cumsum(population)[:-1]))
+        rank = np.arange(len(df)) - starts[stratum[order]]
+        rows = np.sort(order[rank < sampled[stratum[order]]])
+
+        strata_codes = dict(zip(STRATA + ['Month'], unpack_key(np.arange(n_strata), sizes)[1]))
+
+        frame = pd.DataFrame({col: df[col].take(rows).to_numpy() for col in SAMPLE_COLUMNS if col in df.columns})
+        for col in ('Product ID', 'Customer ID'):
+            frame[col] = pd.Categorical.from_codes(id_codes(df, col)[rows], categories=id_lookup(df, col))
+        return cls(frame, stratum[rows], population, sampled, strata_codes, dim_values, first_month,
+                   _pair_lines(df, 'Order ID', 'Category', rows), _pair_lines(df, 'Customer ID', 'Region', rows),
+                   len(df))
+
+    def __len__(self):
+        return len(self.frame)
+
+    def domain(self, start=None, end=None, regions=None, categories=None, segments=None):
+        # Sampled rows inside a sidebar filter state
+        mask = np.ones(len(self), dtype=bool)
+        dates = self.frame['Order Date'].to_numpy()
+        if start is not None:
+            mask &= dates >= np.datetime64(pd.Timestamp(start).normalize())
+        if end is not None:
+            mask &= dates < np.datetime64(pd.Timestamp(end).normalize() + pd.Timedelta(days=1))
+        for dim, labels in zip(STRATA, (regions, categories, segments)):
+            if labels is not None:
+                mask &= allowed_codes(self.dim_values[dim], labels)[self.row_codes[dim]]
+        return mask
+
+    def _strata(self, values, mask=None):
+        # -> (estimate, variance) of the masked total in every stratum
+        values = np.asarray(values, dtype=np.float64)
+        if mask is not None:
+            values = np.where(mask, values, 0.0)
+        n_strata = len(self.population)
+        s1 = np.bincount(self.stratum, weights=values, minlength=n_strata)
+        s2 = np.bincount(self.stratum, weights=values ** 2, minlength=n_strata)
+        n, big_n = self.sampled.astype(np.float64), self.population.astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            estimate = np.where(n > 0, s1 * big_n / n, 0.0)
+            spread = np.where(n > 1, (s2 - s1 ** 2 / n) / (n - 1), 0.0)
+            variance = np.where(n > 0, big_n ** 2 * (1 - n / big_n) * np.maximum(spread, 0) / n, 0.0)
+        return estimate, variance
+
+    def total(self, values, mask=None, by=None):
+        # -> (estimate, 95% half-width); per code of `by` (a stratum dimension) when given
+        estimate, variance = self._strata(values, mask)
+        if by is None:
+            return float(estimate.sum()), float(Z * np.sqrt(variance.sum()))
+        codes = self.strata_codes[by]
+        return (np.bincount(codes, weights=estimate, minlength=codes.max() + 1),
+                Z * np.sqrt(np.bincount(codes, weights=variance, minlength=codes.max() + 1)))
+
+    def ratio(self, numerator, denominator, mask=None):
+        # Ratio of two totals (e.g. sales per order), interval by linearization
+        top, _ = self.total(numerator, mask)
+        bottom, _ = self.total(denominator, mask)
+        if not bottom:
+            return 0.0, 0.0
+        value = top / bottom
+        _, half_width = self.total(np.asarray(numerator) - value * np.asarray(denominator), mask)
+        return value, half_width / abs(bottom)
+
+    def order_shares(self, categories=None, per_category=False):
+        # Each line's share of its order, counting only the order's lines in the selected
+        # categories (or in its own category with per_category=True)
+        lines = self.order_lines
+        if per_category:
+            counts = lines[np.arange(len(self)), self.row_codes['Category']]
+        elif categories is None:
+            counts = lines.sum(axis=1)
+        else:
+            counts = lines[:, allowed_codes(self.dim_values['Category'], categories)].sum(axis=1)
+        with np.errstate(divide='ignore'):
+            return np.where(counts > 0, 1.0 / counts, 0.0)
+
+    def customer_shares(self, per_region=False):
+        lines = self.customer_lines
+        counts = lines[np.arange(len(self)), self.row_codes['Region']] if per_region else lines.sum(axis=1)
+        with np.errstate(divide='ignore'):
+            return np.where(counts > 0, 1.0 / counts, 0.0)
+
+    def weights(self):
+        return self.population[self.stratum] / self.sampled[self.stratum]
+
+    def top_k(self, key_column, value_column, k, mask=None, label_column=None):
+        # -> (estimated totals of the k largest keys, their 95% half-widths)
+        codes = id_codes(self.frame, key_column)
+        values = measure_values(self.frame, value_column)
+        # Rows without a key are not ranked
+        keep = (codes >= 0) if mask is None else mask & (codes >= 0)
+        n_keys = len(id_lookup(self.frame, key_column))
+        totals = np.bincount(codes[keep], weights=(values * self.weights())[keep], minlength=n_keys)
+        present = np.bincount(codes[keep], minlength=n_keys) > 0
+        ranked = np.where(present, totals, -np.inf)
+        best = np.argsort(-ranked, kind='stable')[:k]
+        best = best[np.isfinite(ranked[best])]
+
+        errors = np.array([self.total(values, keep & (codes == code))[1] for code in best])
+        keys = id_lookup(self.frame, key_column)[best]
+        if label_column is None:
+            index = list(keys)
+        else:
+            first = np.full(n_keys, -1, dtype=np.int64)
+            keyed = np.flatnonzero(codes >= 0)[::-1]
+            first[codes[keyed]] = keyed
+            index = disambiguate(np.asarray(self.frame[label_column].to_numpy()[first[best]], dtype=object), keys)
+        return (pd.Series(totals[best], index=index, name=value_column),
+                pd.Series(errors, index=index, name=value_column))
+
+    def estimate_view(self, start=None, end=None, regions=None, categories=None, segments=None, top_n=10):
+        # The row-level parts of a dashboard view (order count, average order value,
+        # rankings), each with its 95% half-width
+        mask = self.domain(start, end, regions, categories, segments)
+        sales = self.frame['Sales'].to_numpy(dtype=np.float64)
+        shares = self.order_shares(categories)
+        orders, orders_error = self.total(shares, mask)
+        average, average_error = self.ratio(sales, shares, mask)
+        top_products, product_errors = self.top_k('Product ID', 'Sales', top_n, mask, 'Product Name')
+        top_customers, customer_errors = self.top_k('Customer ID', 'Sales', top_n, mask, 'Customer Name')
+        return {
+            'order_count': int(round(orders)),
+            'avg_order_value': average,
+            'top_products': top_products,
+            'top_customers': top_customers,
+            'errors': {
+                'order_count': orders_error,
+                'avg_order_value': average_error,
+                'top_products': product_errors,
+                'top_customers': customer_errors,
+            },
+        }
+
+    def _table(self, columns, by, labels):
+        # Estimated totals per code of `by` -> (table, half-widths), groups without rows
+        # (and the missing-label code past the labels) dropped
+        n = len(labels)
+        estimates, errors = {}, {}
+        for name, values in columns.items():
+            estimate, error = self.total(values, by=by)
+            estimates[name], errors[name] = estimate[:n], error[:n]
+        index = labels.take(np.arange(len(estimates[next(iter(columns))])))
+        present = self.total(np.ones(len(self)), by=by)[0][:n] > 0
+        return (pd.DataFrame(estimates, index=index)[present],
+                pd.DataFrame(errors, index=index)[present])
+
+    def estimate_report(self, date_range, top_n=5):
+        # -> (report pieces for report.finish_report, 95% half-widths of each piece)
+        sales = self.frame['Sales'].to_numpy(dtype=np.float64)
+        profit = measure_values(self.frame, 'Profit')
+        quantity = measure_values(self.frame, 'Quantity')
+        orders = self.order_shares()
+        orders_in_category = self.order_shares(per_category=True)
+        customers = self.customer_shares()
+        customers_in_region = self.customer_shares(per_region=True)
+
+        total_sales, sales_error = self.total(sales)
+        total_profit, profit_error = self.total(profit)
+        total_orders, orders_error = self.total(orders)
+        average, average_error = self.ratio(sales, orders)
+        kpis = {'total_sales': total_sales, 'total_profit': total_profit, 'total_orders': int(round(total_orders)),
+                'avg_order_value': average, 'date_min': date_range[0], 'date_max': date_range[1]}
+
+        def named(dim):
+            return self.dim_values[dim].rename(dim)
+
+        segments, segment_errors = self._table(
+            {'Sales': sales, 'Profit': profit, 'Customer ID': customers, 'Order ID': orders},
+            'Segment', named('Segment'))
+        categories, category_errors = self._table(
+            {'Sales': sales, 'Profit': profit, 'Quantity': quantity, 'Order ID': orders_in_category},
+            'Category', named('Category'))
+        regions, region_errors = self._table(
+            {'Sales': sales, 'Profit': profit, 'Customer ID': customers_in_region, 'Order ID': orders},
+            'Region', named('Region'))
+        n_months = int(self.strata_codes['Month'].max()) + 1
+        months = pd.PeriodIndex(np.arange(self.first_month, self.first_month + n_months).astype('datetime64[M]'),
+                                freq='M')
+        monthly, monthly_errors = self._table({'Sales': sales, 'Profit': profit, 'Order ID': orders}, 'Month',
+                                              pd.Index(months))
+        for table in (segments, categories, regions, monthly):
+            for col in ('Customer ID', 'Order ID'):
+                if col in table.columns:
+                    table[col] = table[col].round().astype(np.int64)
+        keys = pd.MultiIndex.from_arrays([monthly.index.year, monthly.index.month], names=['Year', 'Month'])
+        monthly.index, monthly_errors.index = keys, keys
+
+        # Calendar roll-ups of the months; variances add across months
+        month_sales = monthly['Sales']
+        month_variance = (monthly_errors['Sales'] / Z) ** 2
+        yearly = month_sales.groupby(level='Year').sum()
+        yearly_errors = Z * np.sqrt(month_variance.groupby(level='Year').sum())
+        names = pd.CategoricalIndex(np.asarray(CALENDAR_CATEGORIES['Month_Name'])[keys.get_level_values('Month') - 1],
+                                    categories=CALENDAR_CATEGORIES['Month_Name'], ordered=True, name='Month_Name')
+        month_names = pd.Series(month_sales.to_numpy(), index=names).groupby(level=0, observed=True).sum()
+
+        top_products, product_errors = self.top_k('Product ID', 'Sales', top_n, label_column='Product Name')
+        top_customers, customer_errors = self.top_k('Customer ID', 'Sales', top_n, label_column='Customer Name')
+        pieces = {
+            'kpis': kpis,
+            'monthly_sales': monthly,
+            'monthly_totals': month_names,
+            'yearly_sales': yearly,
+            'segment_base': segments,
+            'category_base': categories,
+            'region_base': regions,
+            'top_products': top_products,
+            'top_customers': top_customers,
+        }
+        errors = {
+            'kpis': {'total_sales': sales_error, 'total_profit': profit_error, 'total_orders': orders_error,
+                     'avg_order_value': average_error},
+            'monthly_sales': monthly_errors,
+            'yearly_sales': yearly_errors,
+            'segments': segment_errors,
+            'categories': category_errors,
+            'regions': region_errors,
+            'top_products': product_errors,
+            'top_customers': customer_errors,
+        }
+        return pieces, errors
+
+
+def _pair_lines(df, key_column, dim, rows):
+    # For each sampled row: how many lines its key (order / customer) has in every
+    # value of `dim` (plus a last column for a missing value); rows without a key have none
+    keys = id_codes(df, key_column).astype(np.int64)
+    codes, n_values = dimension_codes(df, dim)
+    keyed = keys >= 0
+    counts = np.bincount(keys[keyed] * n_values + codes[keyed],
+                         minlength=len(id_lookup(df, key_column)) * n_values).reshape(-1, n_values)
+    sampled_keys = keys[rows]
+    lines = np.zeros((len(rows), n_values), dtype=np.int32)
+    lines[sampled_keys >= 0] = counts[sampled_keys[sampled_keys >= 0]]
+    return lines
+
+
+def _relative_error(sample):
+    estimate, half_width = sample.total(sample.frame['Sales'].to_numpy(dtype=np.float64))
+    return half_width / abs(estimate) if estimate else 0.0
+
+
+def sample_for_target(df, target, seed=0, log=None):
+    # Smallest fraction whose 95% interval on total Sales is within `target`
+    # (relative). Per-stratum minimums and the finite-population correction make
+    # a single extrapolation from the pilot unreliable, so every resample is
+    # measured again and grown until it meets the target; at a fraction of 1 the
+    # sample is every row (exact).
+    log = log or (lambda message: None)
+    fraction = DEFAULT_FRACTION
+    sample = StratifiedSample.from_frame(df, fraction, seed=seed)
+    error = _relative_error(sample)
+    while error > target and fraction < 1.0:
+        # Variance goes with (1 - f) / f, f the share of rows actually sampled
+        sampled = len(sample) / max(sample.n_rows, 1)
+        needed = 1 / (1 + (1 - sampled) / sampled * (target / error) ** 2)
+        next_fraction = min(1.0, max(fraction * 1.5, fraction * needed / sampled * 1.1))
+        log(f"📐 Sample at {fraction:.1%}: ±{error:.2%} on total sales; resampling at {next_fraction:.1%} "
+            f"for ±{target:.2%}")
+        fraction = next_fraction
+        sample = StratifiedSample.from_frame(df, fraction, seed=seed)
+        error = _relative_error(sample)
+    if error > target:
+        log(f"⚠️  Sample misses the target: ±{error:.2%} on total sales (target ±{target:.2%})")
+    else:
+        log(f"📐 Sample at {fraction:.1%}: ±{error:.2%} on total sales (target ±{target:.2%})")
+    return sample
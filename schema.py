@@ -0,0 +1,155 @@
+"""Declared compact schema for the preprocessed Superstore frame.
+
+Low-cardinality text columns become categoricals, the ID columns are
+dictionary-encoded (integer codes plus a reverse lookup table of the original
+IDs) and small integer columns are downcast.
+"""
+import calendar
+
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLUMNS = [
+    'Ship Mode', 'Segment', 'Country', 'City', 'State', 'Region',
+    'Category', 'Sub-Category', 'Customer Name', 'Product Name',
+]
+
+# Dictionary-encoded: cat.codes are the integer keys, cat.categories the lookup table
+ID_COLUMNS = ['Order ID', 'Customer ID', 'Product ID']
+
+NUMERIC_DTYPES = {
+    'Row ID': 'int32',
+    'Postal Code': 'int32',
+    'Quantity': 'int16',
+    'Year': 'int16',
+    'Month': 'int8',
+    'Quarter': 'int8',
+    'Days_to_Ship': 'int16',
+    'Discount': 'float32',
+    'Profit_Margin': 'float32',
+}
+
+# Calendar names keep calendar order instead of alphabetical order
+CALENDAR_CATEGORIES = {
+    'Month_Name': list(calendar.month_name)[1:],
+    'Weekday': list(calendar.day_name),
+}
+
+
+def frame_memory(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def apply_schema(df):
+    for col in CATEGORICAL_COLUMNS + ID_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    for col, categories in CALENDAR_CATEGORIES.items():
+        if col in df.columns:
+            df[col] = pd.Categorical(df[col], categories=categories, ordered=True)
+
+    for col, dtype in NUMERIC_DTYPES.items():
+        if col in df.columns:
+            # Nullable integers when the extract has gaps (e.g. missing postal codes)
+            if dtype.startswith('int') and df[col].isna().any():
+                dtype = dtype.capitalize()
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def id_codes(df, column):
+    return df[column].cat.codes.to_numpy()
+
+
+def id_lookup(df, column):
+    return df[column].cat.categories
+
+
+def measure_values(df, column):
+    # A measure as float64 (e.g. bincount weights); a value missing from a row
+    # (a line cut short) adds nothing, as in groupby sums
+    return df[column].to_numpy(dtype=np.float64, na_value=0.0)
+
+
+def dimension_codes(df, column):
+    # -> (codes, size): category codes with missing values (code -1) moved to
+    # their own last code, len(categories), so every code is in [0, size)
+    codes = id_codes(df, column).astype(np.int64)
+    n = len(id_lookup(df, column))
+    return np.where(codes < 0, n, codes), n + 1
+
+
+def pack_key(leading, codes, sizes):
+    # One mixed-radix integer key per row: leading digit, then one digit per
+    # code column. A code outside [0, size) would borrow from the digit before
+    # it, so columns with missing values go through dimension_codes() first.
+    key = np.asarray(leading, dtype=np.int64)
+    for column_codes, size in zip(codes, sizes):
+        key = key * size + column_codes
+    return key
+
+
+def unpack_key(keys, sizes):
+    # -> (leading digit, [codes per column]) of pack_key() keys
+    codes = []
+    for size in reversed(sizes):
+        codes.append((keys % size).astype(np.int32))
+        keys = keys // size
+    return keys, codes[::-1]
+
+
+def allowed_codes(labels, selected):
+    # dimension_codes() code -> in the selection; the missing code never is
+    return np.append(np.asarray(labels.isin(list(selected))), False)
+
+
+def memory_report(before, after):
+    ratio = before / after if after else float('inf')
+    return (f"Memory Usage: {before / 1024 ** 2:.2f} MB raw → {after / 1024 ** 2:.2f} MB "
+            f"with compact schema ({ratio:.1f}x smaller)")
+
+
+def extend_categories(df, reference):
+    # Re-encode df's categoricals against reference's dictionaries, appending
+    # unseen values at the end so every existing code keeps its meaning
+    for col in df.columns:
+        if col in reference.columns and isinstance(reference[col].dtype, pd.CategoricalDtype):
+            known = reference[col].cat.categories
+            values = df[col].astype(object) if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col]
+            new = pd.Index(pd.unique(values.dropna())).difference(known, sort=False)
+            ordered = reference[col].cat.ordered
+            df[col] = pd.Categorical(values, categories=known.append(new), ordered=ordered)
+    return df
+
+
+def concat_frames(frames):
+    # Concatenate frames whose dictionaries are prefixes of the last frame's
+    # (see extend_categories); codes are reused as-is, nothing is re-encoded
+    if len(frames) == 1:
+        return frames[0]
+    last = frames[-1]
+    aligned = []
+    for frame in frames:
+        frame = frame.copy(deep=False)
+        for col in frame.columns:
+            if isinstance(last[col].dtype, pd.CategoricalDtype):
+                frame[col] = pd.Categorical.from_codes(
+                    frame[col].cat.codes, dtype=last[col].dtype)
+        aligned.append(frame)
+    return pd.concat(aligned, ignore_index=True)
+
+
+def union_frames(frames):
+    # Concatenate independently encoded frames (e.g. one per partition file),
+    # re-encoding categoricals against the sorted union of their dictionaries
+    # so the result matches apply_schema() on the combined rows
+    frames = [frame.copy(deep=False) for frame in frames]
+    for col in frames[0].columns:
+        dtypes = [frame[col].dtype for frame in frames]
+        if not isinstance(dtypes[0], pd.CategoricalDtype) or all(dtype == dtypes[0] for dtype in dtypes):
+            continue
+        categories = pd.Index(sorted(set().union(*(dtype.categories for dtype in dtypes))))
+        for frame in frames:
+            frame[col] = frame[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,257 @@
+"""Ship-time distributions from compact, mergeable integer histograms.
+
+Days_to_Ship is a small integer, so its distribution in any slice is a
+histogram of a few dozen bins. The histogram is kept sparse: one entry per
+(order day, Region, Category, Segment, Ship Mode, State, days to ship) with
+its line count, built with one np.unique over a combined integer key (the
+same layout as the sales cube). A sidebar selection masks entries, and a
+breakdown is a bincount of (group, days) into a dense groups x days table.
+Percentiles come from the cumulative counts. They are exact, because the
+values are integers: the p-th percentile is the smallest day count whose
+cumulative share reaches p (numpy's 'inverted_cdf'). No rows are sorted.
+
+Histograms from chunks, partition files or appended rows merge with
+combine(), which re-encodes labels into a shared dictionary and adds counts.
+
+A line ships late when it takes longer than its Ship Mode's target. The
+targets are assumed service levels, not part of the data; set them with
+SUPERSTORE_SHIP_TARGETS (see below).
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cube import CUBE_DIMENSIONS
+
+SHIP_DIMENSIONS = CUBE_DIMENSIONS + ['Ship Mode', 'State']
+
+# Longer ship times are counted in the last bin (reported as MAX_SHIP_DAYS)
+MAX_SHIP_DAYS = 60
+PERCENTILES = [50, 90, 99]
+
+# Days a line may take under each Ship Mode before it counts as late. A JSON
+# object in SUPERSTORE_SHIP_TARGETS overrides modes one by one, e.g.
+# '{"First Class": 3, "Standard Class": 6}'; modes without a target get
+# SUPERSTORE_SHIP_TARGET_DAYS
+SHIP_TARGET_DAYS = {'Same Day': 0, 'First Class': 2, 'Second Class': 3, 'Standard Class': 5}
+SHIP_TARGET_DAYS.update({mode: int(days) for mode, days in
+                         json.loads(os.environ.get('SUPERSTORE_SHIP_TARGETS') or '{}').items()})
+DEFAULT_TARGET_DAYS = int(os.environ.get('SUPERSTORE_SHIP_TARGET_DAYS', 5))
+
+
+def targets_label():
+    # The configured targets, for labelling late rates
+    targets = ', '.join(f"{mode} {days}d" for mode, days in SHIP_TARGET_DAYS.items())
+    return f"{targets}, other modes {DEFAULT_TARGET_DAYS}d"
+
+
+def _day_numbers(dates):
+    return dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+def _encode(series):
+    # Categorical codes as they are (cached frames), factorized otherwise (stream chunks)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy().astype(np.int64), series.cat.categories
+    codes, labels = pd.factorize(series)
+    return codes.astype(np.int64), pd.Index(labels)
+
+
+def _pack(days, dim_codes, dim_sizes, ship_days, counts):
+    # Merge entries with equal coordinates: one combined integer key, np.unique
+    first_day = days.min() if len(days) else 0
+    key = days - first_day
+    for dim in SHIP_DIMENSIONS:
+        key = key * dim_sizes[dim] + dim_codes[dim]
+    key = key * (MAX_SHIP_DAYS + 1) + ship_days
+    keys, entry = np.unique(key, return_inverse=True)
+    counts = np.bincount(entry, weights=counts, minlength=len(keys)).astype(np.int64)
+
+    ship_days = keys % (MAX_SHIP_DAYS + 1)
+    remainder = keys // (MAX_SHIP_DAYS + 1)
+    packed = {}
+    for dim in reversed(SHIP_DIMENSIONS):
+        packed[dim] = (remainder % dim_sizes[dim]).astype(np.int32)
+        remainder = remainder // dim_sizes[dim]
+    return remainder + first_day, packed, ship_days.astype(np.int16), counts
+
+
+class ShipTimeHistogram:
+    def __init__(self, days, dim_codes, dim_values, ship_days, counts):
+        self.days = days                # entry -> order day number (days since epoch)
+        self.dim_codes = dim_codes      # dimension -> entry -> code
+        self.dim_values = dim_values    # dimension -> labels
+        self.ship_days = ship_days      # entry -> days to ship, capped at MAX_SHIP_DAYS
+        self.counts = counts            # entry -> line items
+
+    @property
+    def late(self):
+        # entry -> over its Ship Mode's target; from the targets configured now,
+        # not when the (possibly persisted) histogram was built
+        targets = np.array([SHIP_TARGET_DAYS.get(mode, DEFAULT_TARGET_DAYS)
+                            for mode in self.dim_values['Ship Mode']], dtype=np.int64)
+        if not len(targets):
+            return np.zeros(self.n_entries, dtype=bool)
+        return self.ship_days > targets[self.dim_codes['Ship Mode']]
+
+    @classmethod
+    def from_frame(cls, df, counts=None):
+        # Lines without a ship date (or shipped before they were ordered) are left out.
+        # counts: lines per row when df is already grouped (e.g. by a compute backend)
+        ship_days = df['Days_to_Ship'].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~np.isnan(ship_days) & (ship_days >= 0) & df['Order Date'].notna().to_numpy()
+        dim_codes, dim_values = {}, {}
+        for dim in SHIP_DIMENSIONS:
+            codes, dim_values[dim] = _encode(df[dim])
+            valid &= codes >= 0
+            dim_codes[dim] = codes
+        days = _day_numbers(df['Order Date'][valid])
+        ship_days = np.minimum(ship_days[valid], MAX_SHIP_DAYS).astype(np.int64)
+        dim_codes = {dim: codes[valid] for dim, codes in dim_codes.items()}
+        dim_sizes = {dim: len(values) for dim, values in dim_values.items()}
+        counts = np.ones(len(days)) if counts is None else np.asarray(counts, dtype=np.float64)[valid]
+        days, dim_codes, ship_days, counts = _pack(days, dim_codes, dim_sizes, ship_days, counts)
+        return cls(days, dim_codes, dim_values, ship_days, counts)
+
+    @classmethod
+    def combine(cls, first, second):
+        # Histogram over both; second's labels are re-encoded into first's
+        # dictionary, extended with the labels first has not seen
+        dim_codes, dim_values = {}, {}
+        for dim in SHIP_DIMENSIONS:
+            known = first.dim_values[dim]
+            values = known.append(second.dim_values[dim].difference(known, sort=False))
+            remap = values.get_indexer(second.dim_values[dim])
+            dim_codes[dim] = np.concatenate([first.dim_codes[dim], remap[second.dim_codes[dim]]]).astype(np.int64)
+            dim_values[dim] = values
+        dim_sizes = {dim: len(values) for dim, values in dim_values.items()}
+        days, dim_codes, ship_days, counts = _pack(
+            np.concatenate([first.days, second.days]), dim_codes, dim_sizes,
+            np.concatenate([first.ship_days, second.ship_days]).astype(np.int64),
+            np.concatenate([first.counts, second.counts]))
+        return cls(days, dim_codes, dim_values, ship_days, counts)
+
+    @property
+    def n_entries(self):
+        return len(self.counts)
+
+    def select(self, start=None, end=None, regions=None, categories=None, segments=None):
+        mask = np.ones(self.n_entries, dtype=bool)
+        if start is not None:
+            mask &= self.days >= _day_numbers(pd.Series([pd.Timestamp(start)]))[0]
+        if end is not None:
+            mask &= self.days <= _day_numbers(pd.Series([pd.Timestamp(end)]))[0]
+        for dim, labels in zip(CUBE_DIMENSIONS, (regions, categories, segments)):
+            if labels is not None:
+                allowed = np.asarray(self.dim_values[dim].isin(list(labels)))
+                mask &= allowed[self.dim_codes[dim]]
+        return ShipTimeSelection(self, mask)
+
+    def everything(self):
+        return ShipTimeSelection(self, np.ones(self.n_entries, dtype=bool))
+
+
+def percentiles(histogram, ranks=PERCENTILES):
+    # histogram: groups x days counts -> groups x percentiles; a group's p-th
+    # percentile is the first day at which its cumulative count reaches p%
+    counts = np.asarray(histogram, dtype=np.int64)
+    cumulative = counts.cumsum(axis=1)
+    totals = cumulative[:, -1:] if counts.shape[1] else np.zeros((len(counts), 1), dtype=np.int64)
+    result = np.empty((len(counts), len(ranks)))
+    for i, p in enumerate(ranks):
+        reached = cumulative * 100 >= totals * p
+        result[:, i] = np.where(totals[:, 0] > 0, reached.argmax(axis=1), np.nan)
+    return result
+
+
+class ShipTimeSelection:
+    def __init__(self, histogram, mask):
+        self.histogram = histogram
+        self.mask = mask
+
+    @property
+    def is_empty(self):
+        return not self.histogram.counts[self.mask].any()
+
+    def _codes(self, dimension):
+        if dimension is None:
+            return np.zeros(self.histogram.n_entries, dtype=np.int64), pd.Index(['All'])
+        return self.histogram.dim_codes[dimension].astype(np.int64), self.histogram.dim_values[dimension]
+
+    def distribution(self, dimension=None):
+        # Groups x days (0 .. longest selected) line counts; only groups with lines
+        codes, labels = self._codes(dimension)
+        codes, ship_days = codes[self.mask], self.histogram.ship_days[self.mask].astype(np.int64)
+        width = int(ship_days.max()) + 1 if len(ship_days) else 1
+        counts = np.bincount(codes * width + ship_days, weights=self.histogram.counts[self.mask],
+                             minlength=len(labels) * width).astype(np.int64).reshape(len(labels), width)
+        table = pd.DataFrame(counts, index=labels, columns=pd.RangeIndex(width, name='Days_to_Ship'))
+        table.index.name = dimension
+        return table[counts.sum(axis=1) > 0]
+
+    def summary(self, dimension=None):
+        # Per group: lines, mean days, p50 / p90 / p99 days and late-shipment rate (%)
+        histogram = self.distribution(dimension)
+        counts = histogram.to_numpy()
+        lines = counts.sum(axis=1)
+        codes, labels = self._codes(dimension)
+        late = np.bincount(codes[self.mask], weights=(self.histogram.counts * self.histogram.late)[self.mask],
+                           minlength=len(labels))
+        table = pd.DataFrame({'Lines': lines}, index=histogram.index)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table['Mean_Days'] = (counts @ histogram.columns.to_numpy()) / lines
+            for p, values in zip(PERCENTILES, percentiles(counts).T):
+                table[f"p{p}"] = values.astype(np.int64)
+            table['Late_Rate'] = pd.Series(late, index=labels).reindex(histogram.index).to_numpy() / lines * 100
+        return table
+
+    def late_by_month(self):
+        # Lines, late lines and late rate (%) per order month
+        months = self.histogram.days[self.mask].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        counts = self.histogram.counts[self.mask]
+        late = (self.histogram.counts * self.histogram.late)[self.mask]
+        if not len(months):
+            return pd.DataFrame({'Lines': [], 'Late': [], 'Late_Rate': []},
+                                index=pd.PeriodIndex([], freq='M', name='Order Date'))
+        first = months.min()
+        lines = np.bincount(months - first, weights=counts).astype(np.int64)
+        late = np.bincount(months - first, weights=late, minlength=len(lines)).astype(np.int64)
+        index = pd.period_range(pd.Period(np.datetime64(int(first), 'M'), freq='M'), periods=len(lines),
+                                freq='M', name='Order Date')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame({'Lines': lines, 'Late': late, 'Late_Rate': late / lines * 100}, index=index)
+
+
+def print_shipping(histogram, top_states=10):
+    selection = histogram.everything()
+    print("\n🚚 SHIPPING & FULFILLMENT")
+    print("-" * 40)
+    if selection.is_empty:
+        print("No lines with a ship date")
+        return
+    overall = selection.summary().iloc[0]
+    print(f"Lines Shipped:      {int(overall['Lines']):,}")
+    print(f"Days to Ship:       mean {overall['Mean_Days']:.2f} | p50 {overall['p50']:.0f} | "
+          f"p90 {overall['p90']:.0f} | p99 {overall['p99']:.0f}")
+    print(f"Late Shipments:     {overall['Late_Rate']:.1f}% over the configured Ship Mode targets")
+    print(f"Targets:            {targets_label()} (SUPERSTORE_SHIP_TARGETS)")
+
+    for dimension, limit in (('Ship Mode', None), ('Region', None), ('State', top_states)):
+        table = selection.summary(dimension).sort_index()
+        title = dimension
+        if limit is not None and len(table) > limit:
+            table = table.sort_values(['Late_Rate', 'Lines'], ascending=False).head(limit)
+            title = f"{dimension} (top {limit} by late rate)"
+        print(f"\nBy {title}:")
+        for name, row in table.iterrows():
+            target = f" (target {SHIP_TARGET_DAYS.get(name, DEFAULT_TARGET_DAYS)}d)" if dimension == 'Ship Mode' else ""
+            print(f"{str(name)[:20]:<20} | Lines: {int(row['Lines']):>7,} | p50: {row['p50']:>2.0f}d | "
+                  f"p90: {row['p90']:>2.0f}d | p99: {row['p99']:>2.0f}d | Late: {row['Late_Rate']:>5.1f}%{target}")
+
+    monthly = selection.late_by_month()
+    yearly = monthly.groupby(monthly.index.year)[['Lines', 'Late']].sum()
+    print("\nLate Rate by Year:")
+    for year, row in yearly.iterrows():
+        print(f"{year:<20} {row['Late'] / row['Lines'] * 100:>5.1f}% of {int(row['Lines']):,} lines")
@@ -0,0 +1,299 @@
+"""Batch slice reports: the full business report for every slice of the data.
+
+A slicing spec such as Region × Category × Year names the columns whose
+observed value combinations become slices. Instead of filtering and
+re-aggregating once per slice, every breakdown of the report is computed in
+one fused compute_metrics() pass with the slice columns prepended to its
+dimension (Region, Category, Year, Segment ...), then split per slice. KPIs
+and date ranges come from one grouped pass over the slice codes, and top
+performers from one sort of the (slice, key) pairs. Runtime grows with the
+data, not with data × slices.
+
+Each slice's report has the same shape as report.build_report() on just that
+slice's rows, so it can be printed, or written as JSON, Markdown or CSV.
+"""
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from metrics import MetricsPlan, compute_metrics, distinct, encode_column
+from report import REPORT_PLAN, finish_report
+from schema import id_codes, id_lookup, measure_values
+from topk import disambiguate
+
+SLICE_FORMATS = ('json', 'md', 'csv')
+
+# Report sections written per slice, in print_report() order
+TABLE_SECTIONS = [
+    ('monthly_sales', 'Monthly Sales'),
+    ('segments', 'Customer Segments'),
+    ('categories', 'Product Categories'),
+    ('regions', 'Regions'),
+]
+
+
+def _as_tuple(dim):
+    return dim if isinstance(dim, tuple) else (dim,)
+
+
+def slice_codes(df, columns):
+    # -> (dense slice code per row, slice labels as a DataFrame of the slice columns)
+    combined = np.zeros(len(df), dtype=np.int64)
+    valid = np.ones(len(df), dtype=bool)
+    encoded = []
+    for col in columns:
+        codes, labels = encode_column(df[col])
+        valid &= codes >= 0
+        combined = combined * len(labels) + codes
+        encoded.append(labels)
+    present, dense = np.unique(np.where(valid, combined, -1), return_inverse=True)
+    if len(present) and present[0] == -1:
+        present, dense = present[1:], dense - 1   # rows missing a slice value belong to no slice
+    labels, remainder = {}, present
+    for col, values in zip(reversed(columns), reversed(encoded)):
+        labels[col] = values.take(remainder % len(values))
+        remainder = remainder // len(values)
+    return dense, pd.DataFrame({col: labels[col] for col in columns})
+
+
+def _slice_plan(columns):
+    # Every report dimension with the slice columns in front (a slice column the
+    # dimension already has is not repeated). Dimensions made up only of slice
+    # columns collapse onto the same grouping, so their measures are merged.
+    # -> (plan, report dim -> sliced dim)
+    sliced = {dim: tuple(columns) + tuple(col for col in _as_tuple(dim) if col not in columns)
+              for dim in REPORT_PLAN.dimensions}
+    sliced = {dim: full[0] if len(full) == 1 else full for dim, full in sliced.items()}
+    dimensions = {}
+    for dim, full in sliced.items():
+        metrics = dimensions.setdefault(full, [])
+        metrics += [metric for metric in REPORT_PLAN.dimensions[dim] if metric not in metrics]
+    return MetricsPlan(dimensions), sliced
+
+
+def _split_tables(results, sliced, columns, slice_index):
+    # {report dim: {slice number: table indexed like the unsliced report}}
+    tables = {}
+    for dim, full in sliced.items():
+        flat = results[full].reset_index()
+        numbers = slice_index.get_indexer(pd.MultiIndex.from_frame(flat[list(columns)]))
+        flat = flat.set_index(list(_as_tuple(dim)))[[column for column, _ in REPORT_PLAN.dimensions[dim]]]
+        tables[dim] = {number: flat.iloc[rows.to_numpy()]
+                       for number, rows in pd.Series(np.arange(len(flat))).groupby(numbers)}
+    return tables
+
+
+def _slice_kpis(df, codes, n_slices):
+    keep = codes >= 0
+    codes = codes[keep]
+    sales = np.bincount(codes, weights=df['Sales'].to_numpy(dtype=np.float64)[keep], minlength=n_slices)
+    profit = np.bincount(codes, weights=measure_values(df, 'Profit')[keep], minlength=n_slices)
+    rows = np.bincount(codes, minlength=n_slices)
+
+    # Distinct orders per slice: unique (slice, order) pairs
+    order_codes = id_codes(df, 'Order ID').astype(np.int64)[keep]
+    has_order = order_codes >= 0
+    n_order_ids = len(id_lookup(df, 'Order ID'))
+    pairs = distinct(codes[has_order] * n_order_ids + order_codes[has_order])
+    orders = np.bincount(pairs // n_order_ids, minlength=n_slices)
+
+    days = df['Order Date'].to_numpy()[keep]
+    span = pd.Series(days).groupby(codes).agg(['min', 'max'])
+    return [{
+        'total_sales': sales[i],
+        'total_profit': profit[i],
+        'total_orders': int(orders[i]),
+        'avg_order_value': float(sales[i] / orders[i]) if orders[i] else 0,
+        'date_min': span['min'].iloc[i],
+        'date_max': span['max'].iloc[i],
+        'rows': int(rows[i]),
+    } for i in range(n_slices)]
+
+
+def _slice_top_k(df, codes, n_slices, key_column, value_column, label_column, k):
+    # Top k keys per slice from one sort of the (slice, key) pairs; each key is
+    # labelled from its first row inside the slice, as in an unsliced report
+    key_codes = id_codes(df, key_column).astype(np.int64)
+    keep = (codes >= 0) & (key_codes >= 0)
+    rows = np.flatnonzero(keep)
+    n_keys = len(id_lookup(df, key_column))
+    pairs, first, inverse = np.unique(codes[rows] * n_keys + key_codes[rows],
+                                      return_index=True, return_inverse=True)
+    totals = np.bincount(inverse, weights=measure_values(df, value_column)[rows], minlength=len(pairs))
+    pair_slice, pair_key = pairs // n_keys, pairs % n_keys
+
+    ranked = np.lexsort((pair_key, -totals, pair_slice))
+    starts = np.searchsorted(pair_slice[ranked], np.arange(n_slices))
+    rank = np.arange(len(ranked)) - starts[pair_slice[ranked]]
+    best = ranked[rank < k]
+
+    keys = id_lookup(df, key_column)
+    labels = df[label_column].to_numpy()[rows[first[best]]]
+    tops = {}
+    for number, positions in pd.Series(np.arange(len(best))).groupby(pair_slice[best]):
+        chosen = best[positions.to_numpy()]
+        slice_keys = keys[pair_key[chosen]]
+        index = disambiguate(np.asarray(labels[positions.to_numpy()], dtype=object), slice_keys)
+        tops[number] = pd.Series(totals[chosen], index=index, name=value_column)
+    return tops
+
+
+def build_slice_reports(df, columns, top_n=5):
+    # -> list of ({slice column: value}, report) for every observed slice
+    columns = list(columns)
+    with profiling.span('slice_codes'):
+        codes, labels = slice_codes(df, columns)
+    n_slices = len(labels)
+
+    with profiling.span('metrics'):
+        plan, sliced = _slice_plan(columns)
+        tables = _split_tables(compute_metrics(df, plan), sliced, columns, pd.MultiIndex.from_frame(labels))
+    with profiling.span('kpis'):
+        kpis = _slice_kpis(df, codes, n_slices)
+    with profiling.span('top_k'):
+        products = _slice_top_k(df, codes, n_slices, 'Product ID', 'Sales', 'Product Name', top_n)
+        customers = _slice_top_k(df, codes, n_slices, 'Customer ID', 'Sales', 'Customer Name', top_n)
+
+    reports = []
+    for i in range(n_slices):
+        report = finish_report(
+            kpis[i],
+            monthly_sales=tables[('Year', 'Month')][i],
+            monthly_totals=tables['Month_Name'][i]['Sales'],
+            yearly_sales=tables['Year'][i]['Sales'],
+            segment_base=tables['Segment'][i],
+            category_base=tables['Category'][i],
+            region_base=tables['Region'][i],
+            top_products=products.get(i, pd.Series(dtype=np.float64, name='Sales')),
+            top_customers=customers.get(i, pd.Series(dtype=np.float64, name='Sales')),
+        )
+        reports.append(({col: _plain(labels[col].iloc[i]) for col in columns}, report))
+    return reports
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def slice_name(key):
+    # {'Region': 'West', 'Year': 2016} -> 'Region=West__Year=2016', safe as a file name
+    return '__'.join(f"{col}={re.sub(r'[^A-Za-z0-9.-]+', '-', str(value))}" for col, value in key.items())
+
+
+def slice_title(key):
+    return ' × '.join(f"{col} {value}" for col, value in key.items())
+
+
+# Distinct-count columns are named after the ID they count; the outputs say what they mean
+OUTPUT_NAMES = {'Order ID': 'Orders', 'Customer ID': 'Customers'}
+
+
+def _table_rows(table):
+    # -> (column names, rows of plain Python values) with the index levels first
+    names = list(table.index.names) + [OUTPUT_NAMES.get(col, col) for col in table.columns]
+    index = table.index.tolist()
+    if table.index.nlevels == 1:
+        index = [(value,) for value in index]
+    columns = [table[col].tolist() for col in table.columns]
+    return names, [labels + tuple(values) for labels, *values in zip(index, *columns)]
+
+
+def _records(table):
+    names, rows = _table_rows(table)
+    return [dict(zip(names, row)) for row in rows]
+
+
+def _ranking_records(series):
+    return [{'name': name, series.name: float(value)} for name, value in series.items()]
+
+
+def report_to_dict(key, report):
+    kpis = report['kpis']
+    return {
+        'slice': key,
+        'kpis': {name: (value.strftime('%Y-%m-%d') if isinstance(value, pd.Timestamp) else _plain(value))
+                 for name, value in kpis.items()},
+        'monthly_totals': {str(month): float(value) for month, value in report['monthly_totals'].items()},
+        'yearly_sales': {str(year): float(value) for year, value in report['yearly_sales'].items()},
+        **{section: _records(report[section]) for section, _ in TABLE_SECTIONS},
+        'top_products': _ranking_records(report['top_products']),
+        'top_customers': _ranking_records(report['top_customers']),
+    }
+
+
+def _markdown_table(table):
+    names, rows = _table_rows(table)
+    lines = ['| ' + ' | '.join(map(str, names)) + ' |', '|' + '---|' * len(names)]
+    for row in rows:
+        lines.append('| ' + ' | '.join(f"{value:,.2f}" if isinstance(value, float) else str(value)
+                                       for value in row) + ' |')
+    return '\n'.join(lines)
+
+
+def report_to_markdown(key, report):
+    kpis = report['kpis']
+    lines = [
+        f"# {slice_title(key)}",
+        "",
+        "## Key Performance Indicators",
+        "",
+        f"- Total Sales: ${kpis['total_sales']:,.2f}",
+        f"- Total Profit: ${kpis['total_profit']:,.2f}",
+        f"- Total Orders: {kpis['total_orders']:,}",
+        f"- Average Order: ${kpis['avg_order_value']:.2f}",
+        f"- Profit Margin: {kpis['overall_margin']:.2f}%",
+        f"- Date Range: {kpis['date_min'].strftime('%Y-%m-%d')} to {kpis['date_max'].strftime('%Y-%m-%d')}",
+    ]
+    for section, title in TABLE_SECTIONS:
+        lines += ["", f"## {title}", "", _markdown_table(report[section])]
+    for section, title in (('top_products', 'Top Products'), ('top_customers', 'Top Customers')):
+        lines += ["", f"## {title}", ""]
+        lines += [f"{i}. {name} — ${value:,.0f}" for i, (name, value) in enumerate(report[section].items(), 1)]
+    return '\n'.join(lines) + '\n'
+
+
+def _long_table(reports, section):
+    # One CSV across all slices: the slice columns, then the section's rows
+    rows, names = [], None
+    for key, report in reports:
+        value = report[section]
+        if isinstance(value, pd.Series):
+            value = pd.DataFrame({'Name': value.index, value.name: value.to_numpy()},
+                                 index=pd.RangeIndex(1, len(value) + 1, name='Rank'))
+        table_names, table_rows = _table_rows(value)
+        slice_values = tuple(key.values())
+        rows += [slice_values + row for row in table_rows]
+        names = names or [f"Slice {col}" if col in table_names else col for col in key] + table_names
+    return pd.DataFrame(rows, columns=names)
+
+
+def write_slice_reports(reports, directory, formats=SLICE_FORMATS):
+    # -> list of files written
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for key, report in reports:
+        name = slice_name(key)
+        if 'json' in formats:
+            path = os.path.join(directory, f"{name}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report_to_dict(key, report), f, indent=2)
+            written.append(path)
+        if 'md' in formats:
+            path = os.path.join(directory, f"{name}.md")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(report_to_markdown(key, report))
+            written.append(path)
+    if 'csv' in formats:
+        kpis = pd.DataFrame([{**key, **report['kpis']} for key, report in reports])
+        tables = {'kpis': kpis}
+        for section in [section for section, _ in TABLE_SECTIONS] + ['top_products', 'top_customers']:
+            tables[section] = _long_table(reports, section)
+        for section, table in tables.items():
+            path = os.path.join(directory, f"{section}.csv")
+            table.to_csv(path, index=False)
+            written.append(path)
+    return written
@@ -0,0 +1,92 @@
+"""Double-buffered dataset snapshots, refreshed off the request path.
+
+A snapshot is everything derived from one version of the source data: the
+frame, its indexes and its aggregates. It is never modified once built. A
+SnapshotRefresher keeps the current one and runs a daemon thread. The thread
+polls the sources' cheap version stamp (path, size and mtime of every file),
+or wakes up on refresh(). When the version changes it builds the next
+snapshot in the background and then swaps the reference in one assignment.
+A dashboard rerun reads current() once and uses that snapshot throughout,
+so a rerun already under way finishes on the old data. The next rerun picks
+up the new one. The old snapshot is freed once no rerun holds it.
+
+Only the very first snapshot of a process is built on the calling thread,
+because there is nothing older to serve yet.
+"""
+import os
+import threading
+import time
+import traceback
+
+from data_store import dataset_version
+
+POLL_SECONDS = float(os.environ.get('SUPERSTORE_REFRESH_SECONDS', 30))
+
+
+class Snapshot:
+    def __init__(self, version, data, loaded_at, load_seconds):
+        self.version = version            # dataset_version() of the sources it was built from
+        self.data = data                  # whatever build(path) returned
+        self.loaded_at = loaded_at        # wall-clock time the build finished
+        self.load_seconds = load_seconds  # how long the build took
+
+
+class SnapshotRefresher:
+    def __init__(self, path, build, interval=POLL_SECONDS, log=None):
+        self.path = path
+        self.build = build                # build(path) -> snapshot data
+        self.interval = interval
+        self.log = log or (lambda message: None)
+        self.building = None              # version being built in the background, if any
+        self.last_error = None            # (version, message) of the last failed build
+        self._snapshot = None
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _load(self, version):
+        start = time.perf_counter()
+        data = self.build(self.path)
+        return Snapshot(version, data, time.time(), time.perf_counter() - start)
+
+    def start(self):
+        # First snapshot on the calling thread, then poll in the background
+        if self._snapshot is None:
+            self._snapshot = self._load(dataset_version(self.path))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+            self._thread.start()
+        return self
+
+    def current(self):
+        return self._snapshot
+
+    def refresh(self):
+        # Check the sources now instead of at the next poll
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                version = dataset_version(self.path)
+            except OSError as error:   # sources mid-replace or gone; keep serving what we have
+                self.last_error = (None, str(error))
+                continue
+            # The sources are readable again; a failed build of this version is retried below
+            self.last_error = None
+            if version == self._snapshot.version:
+                continue
+            self.building = version
+            try:
+                snapshot = self._load(version)
+            except Exception as error:
+                # Keep serving the old snapshot; retried at the next poll
+                self.last_error = (version, f"{type(error).__name__}: {error}")
+                self.log(f"❌ Snapshot {version} failed to build:\n{traceback.format_exc()}")
+            else:
+                self._snapshot = snapshot
+                self.last_error = None
+                self.log(f"🔄 Snapshot {version} published ({snapshot.load_seconds:.1f}s)")
+            finally:
+                self.building = None
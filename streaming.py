@@ -0,0 +1,432 @@
+"""Constant-memory, single-pass chunked aggregation for analysis.py.
+
+The CSV is read in chunks and every report section is kept as a mergeable
+partial aggregate: exact sums per group, exact distinct order/customer counts
+through dictionary-encoded ID sets, and an order-level sales accumulator for
+the average order value. Peak memory is one chunk plus the aggregate state.
+
+Partitioned inputs (a directory or glob of CSVs) are aggregated one file per
+worker process, and the per-file aggregators are merged in file order.
+
+Each file is read in its sniffed format and malformed rows are quarantined
+as in the in-memory load (see ingest.py).
+
+Ship times are kept as a ShipTimeHistogram (see shipping.py), combined chunk
+by chunk and across files like the other partial aggregates.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from data_store import prepare_frame, quarantine_path
+from dates import DATE_COLUMNS
+from ingest import SourceReader
+from metrics import MetricsPlan, compute_metrics
+from report import REPORT_PLAN, finish_report
+from schema import CALENDAR_CATEGORIES, CATEGORICAL_COLUMNS, ID_COLUMNS
+from shipping import ShipTimeHistogram
+from topk import SpaceSavingSketch, disambiguate, top_k_indices
+
+DEFAULT_CHUNKSIZE = 250_000
+
+# The overview counts distinct values exactly for IDs, labels, codes and dates.
+# Free-form measures only get a lower bound (the most distinct values in one
+# chunk), so the tracked sets stay small and are not re-sorted at row scale.
+UNIQUE_TRACKED_COLUMNS = set(ID_COLUMNS + CATEGORICAL_COLUMNS + DATE_COLUMNS + list(CALENDAR_CATEGORIES)
+                             + ['Postal Code', 'Year', 'Quarter', 'Month'])
+# Above this many distinct values a tracked column falls back to ">limit"
+UNIQUE_TRACK_LIMIT = 1_000_000
+# Chunk hashes are buffered and folded into a tracked set once the buffer is as
+# large as the set (and at least this many), not sorted into it every chunk
+UNIQUE_FLUSH_MIN = 65_536
+
+# Partial aggregates follow the report's declarative plan: sums are merged
+# per chunk, nunique measures become mergeable (group, id) pair sets
+SUM_PLAN = REPORT_PLAN.only('sum')
+# Top performers are ranked by ID and labelled with the first name seen per ID
+RANKED_KEYS = {'products': ('Product ID', 'Product Name'), 'customers': ('Customer ID', 'Customer Name')}
+RANKING_PLAN = MetricsPlan({key: [('Sales', 'sum')] for key, label in RANKED_KEYS.values()})
+
+DISTINCT_DIMENSIONS = {
+    dim: [col for col, agg in metrics if agg == 'nunique']
+    for dim, metrics in REPORT_PLAN.dimensions.items()
+    if any(agg == 'nunique' for col, agg in metrics)
+}
+
+
+def iter_source_chunks(reader, chunksize=DEFAULT_CHUNKSIZE):
+    chunks = reader.chunks(chunksize)
+    while True:
+        # Span closes before the yield so time spent by the consumer is not counted
+        with profiling.span('parse_chunk'):
+            chunk = next(chunks, None)
+            if chunk is not None:
+                chunk = prepare_frame(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class IdEncoder:
+    # Exact ID -> int code dictionary, stored as a sorted fixed-width byte array
+    # (a few bytes per ID instead of a Python object per ID)
+
+    def __init__(self):
+        self.keys = np.array([], dtype='S1')
+        self.codes = np.array([], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def encode(self, values):
+        return self.encode_keys(np.char.encode(np.asarray(values, dtype=str), 'utf-8'))
+
+    def keys_by_code(self):
+        keys = np.empty_like(self.keys)
+        keys[self.codes] = self.keys
+        return keys
+
+    def encode_keys(self, raw):
+        uniques, inverse = np.unique(raw, return_inverse=True)
+
+        pos = np.searchsorted(self.keys, uniques)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == uniques[found]
+
+        unique_codes = np.empty(len(uniques), dtype=np.int64)
+        unique_codes[found] = self.codes[pos[found]]
+        new = uniques[~found]
+        if len(new):
+            new_codes = np.arange(len(self.keys), len(self.keys) + len(new), dtype=np.int64)
+            unique_codes[~found] = new_codes
+            keys = np.concatenate([self.keys, new])
+            codes = np.concatenate([self.codes, new_codes])
+            order = np.argsort(keys, kind='stable')
+            self.keys, self.codes = keys[order], codes[order]
+        return unique_codes[inverse]
+
+
+class GroupEncoder:
+    # Small label -> code dictionary for the low-cardinality report dimensions
+
+    def __init__(self):
+        self.labels = []
+        self.lookup = {}
+
+    def encode(self, values):
+        inverse, uniques = pd.factorize(pd.Series(values), sort=False)
+        codes = np.empty(len(uniques), dtype=np.int64)
+        for i, label in enumerate(uniques):
+            if label not in self.lookup:
+                self.lookup[label] = len(self.labels)
+                self.labels.append(label)
+            codes[i] = self.lookup[label]
+        return codes[inverse]
+
+
+class DistinctSet:
+    # Sorted unique (group code, id code) pairs; new pairs are buffered and
+    # folded in once the buffer is as large as the set (see UNIQUE_FLUSH_MIN)
+
+    def __init__(self):
+        self._pairs = np.array([], dtype=np.int64)
+        self.pending = []
+        self.n_pending = 0
+
+    @property
+    def pairs(self):
+        self._fold()
+        return self._pairs
+
+    def _fold(self):
+        if self.pending:
+            self._pairs = np.unique(np.concatenate([self._pairs] + self.pending))
+            self.pending, self.n_pending = [], 0
+
+    def update(self, group_codes, id_codes):
+        pairs = pd.unique((group_codes.astype(np.int64) << 32) | id_codes)
+        self.pending.append(pairs)
+        self.n_pending += len(pairs)
+        if self.n_pending >= max(len(self._pairs), UNIQUE_FLUSH_MIN):
+            self._fold()
+
+    def counts(self, n_groups):
+        return np.bincount(self.pairs >> 32, minlength=n_groups)
+
+    def merge(self, other, group_map, id_map):
+        # Re-key the other set's pairs into this set's group and ID codes
+        pairs = other.pairs
+        groups = group_map[pairs >> 32]
+        ids = id_map[pairs & 0xFFFFFFFF]
+        self.update(groups, ids)
+
+
+class StreamingAggregator:
+    def __init__(self, topk_capacity=None):
+        self.rows = 0
+        self.columns = None
+        self.dtypes = None
+        self.missing = None
+        self.unique_hashes = {}
+        self.pending_hashes = {}
+        self.chunk_uniques = {}
+        self.peak_chunk_memory = 0
+        self.quarantined = 0
+
+        self.totals = {'Sales': 0.0, 'Profit': 0.0}
+        self.date_min = None
+        self.date_max = None
+
+        self.ids = {'Order ID': IdEncoder(), 'Customer ID': IdEncoder()}
+        self.all_ids = {col: DistinctSet() for col in self.ids}
+        self.order_sales = np.zeros(0, dtype=np.float64)
+
+        self.sums = {dim: None for dim in SUM_PLAN.dimensions}
+        self.groups = {dim: GroupEncoder() for dim in DISTINCT_DIMENSIONS}
+        self.distinct = {(dim, col): DistinctSet() for dim, cols in DISTINCT_DIMENSIONS.items() for col in cols}
+
+        # Exact per-ID totals by default; bounded Space-Saving sketches when a capacity is given
+        self.topk_capacity = topk_capacity
+        self.rankings = {name: (SpaceSavingSketch(topk_capacity) if topk_capacity else pd.Series(dtype=np.float64))
+                         for name in RANKED_KEYS}
+        self.labels = {name: pd.Series(dtype=object) for name in RANKED_KEYS}
+        self.shipping = None
+
+    def update(self, chunk):
+        self._update_overview(chunk)
+
+        self.totals['Sales'] += chunk['Sales'].sum()
+        self.totals['Profit'] += chunk['Profit'].sum()
+        chunk_min, chunk_max = chunk['Order Date'].min(), chunk['Order Date'].max()
+        self.date_min = chunk_min if self.date_min is None else min(self.date_min, chunk_min)
+        self.date_max = chunk_max if self.date_max is None else max(self.date_max, chunk_max)
+
+        id_codes = {col: encoder.encode(chunk[col].to_numpy()) for col, encoder in self.ids.items()}
+        zero_groups = np.zeros(len(chunk), dtype=np.int64)
+        for col, codes in id_codes.items():
+            self.all_ids[col].update(zero_groups, codes)
+
+        # Order-level accumulator: per-order sales totals indexed by order code
+        order_codes = id_codes['Order ID']
+        n_orders = len(self.ids['Order ID'])
+        if len(self.order_sales) < n_orders:
+            self.order_sales = np.concatenate([self.order_sales, np.zeros(n_orders - len(self.order_sales))])
+        self.order_sales += np.bincount(order_codes, weights=chunk['Sales'].to_numpy(), minlength=n_orders)
+
+        for dim, partial in compute_metrics(chunk, SUM_PLAN).items():
+            self.sums[dim] = partial if self.sums[dim] is None else self.sums[dim].add(partial, fill_value=0)
+
+        ranking_totals = compute_metrics(chunk, RANKING_PLAN)
+        for name, (key, label) in RANKED_KEYS.items():
+            totals = ranking_totals[key]['Sales']
+            if self.topk_capacity:
+                self.rankings[name].merge(SpaceSavingSketch.from_totals(totals, self.topk_capacity))
+                tracked = self.rankings[name].estimates.index
+            else:
+                self.rankings[name] = self.rankings[name].add(totals, fill_value=0)
+                tracked = None
+            first_labels = chunk.drop_duplicates(key).set_index(key)[label]
+            labels = self.labels[name].combine_first(first_labels)
+            self.labels[name] = labels if tracked is None else labels[labels.index.isin(tracked)]
+
+        for dim, cols in DISTINCT_DIMENSIONS.items():
+            if isinstance(dim, tuple):
+                labels = chunk['Year'].to_numpy().astype(np.int64) * 100 + chunk['Month'].to_numpy()
+            else:
+                labels = chunk[dim].to_numpy()
+            group_codes = self.groups[dim].encode(labels)
+            for col in cols:
+                self.distinct[(dim, col)].update(group_codes, id_codes[col])
+
+        partial = ShipTimeHistogram.from_frame(chunk)
+        self.shipping = partial if self.shipping is None else ShipTimeHistogram.combine(self.shipping, partial)
+
+    def _update_overview(self, chunk):
+        self.rows += len(chunk)
+        self.peak_chunk_memory = max(self.peak_chunk_memory, int(chunk.memory_usage(deep=True).sum()))
+        missing = chunk.isnull().sum()
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.dtypes = chunk.dtypes
+            self.missing = missing
+        else:
+            self.missing = self.missing.add(missing, fill_value=0).astype(np.int64)
+
+        for col in self.columns:
+            if col not in UNIQUE_TRACKED_COLUMNS:
+                self.chunk_uniques[col] = max(self.chunk_uniques.get(col, 0), chunk[col].nunique())
+                continue
+            tracked = self.unique_hashes.get(col, np.array([], dtype=np.uint64))
+            if tracked is None:
+                continue
+            pending = self.pending_hashes.setdefault(col, [])
+            pending.append(pd.unique(pd.util.hash_pandas_object(chunk[col], index=False).to_numpy()))
+            if sum(len(hashes) for hashes in pending) >= max(len(tracked), UNIQUE_FLUSH_MIN):
+                self._flush_hashes(col)
+
+    def _flush_hashes(self, col):
+        # Fold a column's buffered chunk hashes into its tracked set
+        pending = self.pending_hashes.pop(col, [])
+        tracked = self.unique_hashes.get(col, np.array([], dtype=np.uint64))
+        if tracked is None or not pending:
+            return tracked
+        tracked = np.unique(np.concatenate([tracked] + pending))
+        self.unique_hashes[col] = tracked if len(tracked) <= UNIQUE_TRACK_LIMIT else None
+        return self.unique_hashes[col]
+
+    def merge(self, other):
+        # Fold in another aggregator (e.g. one partition file); IDs and group
+        # labels are re-encoded into this aggregator's dictionaries
+        if other.columns is None:
+            return self
+        if self.columns is None:
+            self.columns, self.dtypes, self.missing = other.columns, other.dtypes, other.missing
+        else:
+            self.missing = self.missing.add(other.missing, fill_value=0).astype(np.int64)
+        self.rows += other.rows
+        self.quarantined += other.quarantined
+        self.peak_chunk_memory = max(self.peak_chunk_memory, other.peak_chunk_memory)
+        for col in self.columns:
+            if col not in UNIQUE_TRACKED_COLUMNS:
+                self.chunk_uniques[col] = max(self.chunk_uniques.get(col, 0), other.chunk_uniques.get(col, 0))
+                continue
+            theirs = other._flush_hashes(col)
+            if self.unique_hashes.get(col, 0) is None or theirs is None:
+                self.unique_hashes[col] = None
+                self.pending_hashes.pop(col, None)
+                continue
+            self.pending_hashes.setdefault(col, []).append(theirs)
+            self._flush_hashes(col)
+
+        for measure in self.totals:
+            self.totals[measure] += other.totals[measure]
+        self.date_min = other.date_min if self.date_min is None else min(self.date_min, other.date_min)
+        self.date_max = other.date_max if self.date_max is None else max(self.date_max, other.date_max)
+
+        id_maps = {col: encoder.encode_keys(other.ids[col].keys_by_code()) for col, encoder in self.ids.items()}
+        no_groups = np.zeros(1, dtype=np.int64)
+        for col, id_map in id_maps.items():
+            self.all_ids[col].merge(other.all_ids[col], no_groups, id_map)
+
+        n_orders = len(self.ids['Order ID'])
+        if len(self.order_sales) < n_orders:
+            self.order_sales = np.concatenate([self.order_sales, np.zeros(n_orders - len(self.order_sales))])
+        other_orders = id_maps['Order ID'][:len(other.order_sales)]
+        self.order_sales += np.bincount(other_orders, weights=other.order_sales[:len(other_orders)], minlength=n_orders)
+
+        for dim, partial in other.sums.items():
+            if partial is not None:
+                self.sums[dim] = partial if self.sums[dim] is None else self.sums[dim].add(partial, fill_value=0)
+
+        for dim, encoder in self.groups.items():
+            group_map = encoder.encode(other.groups[dim].labels) if other.groups[dim].labels else no_groups
+            for col in DISTINCT_DIMENSIONS[dim]:
+                self.distinct[(dim, col)].merge(other.distinct[(dim, col)], group_map, id_maps[col])
+
+        for name in RANKED_KEYS:
+            if self.topk_capacity:
+                self.rankings[name].merge(other.rankings[name])
+                tracked = self.rankings[name].estimates.index
+            else:
+                self.rankings[name] = self.rankings[name].add(other.rankings[name], fill_value=0)
+                tracked = None
+            labels = self.labels[name].combine_first(other.labels[name])
+            self.labels[name] = labels if tracked is None else labels[labels.index.isin(tracked)]
+
+        if other.shipping is not None:
+            self.shipping = (other.shipping if self.shipping is None
+                             else ShipTimeHistogram.combine(self.shipping, other.shipping))
+        return self
+
+    def unique_count(self, col):
+        if col not in UNIQUE_TRACKED_COLUMNS:
+            return f"≥{self.chunk_uniques.get(col, 0):,}"
+        tracked = self._flush_hashes(col)
+        return f">{UNIQUE_TRACK_LIMIT:,}" if tracked is None else len(tracked)
+
+    def _distinct_by(self, dim, col, index):
+        encoder = self.groups[dim]
+        counts = pd.Series(self.distinct[(dim, col)].counts(len(encoder.labels)), index=encoder.labels)
+        if isinstance(dim, tuple):
+            counts.index = pd.MultiIndex.from_arrays([counts.index // 100, counts.index % 100], names=list(dim))
+        return counts.reindex(index).astype(np.int64)
+
+    def report(self, top_n=5):
+        n_orders = len(self.ids['Order ID'])
+        kpis = {
+            'total_sales': self.totals['Sales'],
+            'total_profit': self.totals['Profit'],
+            'total_orders': int(self.all_ids['Order ID'].counts(1)[0]),
+            'avg_order_value': self.order_sales[:n_orders].mean(),
+            'date_min': self.date_min,
+            'date_max': self.date_max,
+        }
+
+        def base(dim, columns):
+            table = self.sums[dim].sort_index()
+            for col in DISTINCT_DIMENSIONS.get(dim, []):
+                table[col] = self._distinct_by(dim, col, table.index)
+            return table[columns]
+
+        return finish_report(
+            kpis,
+            monthly_sales=base(('Year', 'Month'), ['Sales', 'Profit', 'Order ID']),
+            monthly_totals=self.sums['Month_Name']['Sales'],
+            yearly_sales=self.sums['Year']['Sales'],
+            segment_base=base('Segment', ['Sales', 'Profit', 'Customer ID', 'Order ID']),
+            category_base=base('Category', ['Sales', 'Profit', 'Quantity', 'Order ID']),
+            region_base=base('Region', ['Sales', 'Profit', 'Customer ID', 'Order ID']),
+            top_products=self._top('products', top_n)[0],
+            top_customers=self._top('customers', top_n)[0],
+            top_errors={name: self._top(name, top_n)[1] for name in RANKED_KEYS} if self.topk_capacity else None,
+        )
+
+    def _top(self, name, k):
+        if self.topk_capacity:
+            top = self.rankings[name].top(k)
+            values, errors = top['estimate'], top['error'].to_list()
+        else:
+            totals = self.rankings[name]
+            values, errors = totals.iloc[top_k_indices(totals.to_numpy(), k)], None
+        labels = disambiguate(self.labels[name].reindex(values.index).to_numpy(), values.index)
+        return pd.Series(values.to_numpy(), index=labels, name='Sales'), errors
+
+
+def stream_report(path, chunksize=DEFAULT_CHUNKSIZE, fmt=None, topk_capacity=None):
+    reader = SourceReader(path, fmt)
+    aggregator = StreamingAggregator(topk_capacity)
+    for chunk in iter_source_chunks(reader, chunksize):
+        with profiling.span('aggregate_chunk'):
+            aggregator.update(chunk)
+    quarantined = reader.write_quarantine(quarantine_path(path))
+    aggregator.quarantined = quarantined['rows'] if quarantined else 0
+    return aggregator
+
+
+def aggregate_source(path, chunksize=DEFAULT_CHUNKSIZE, topk_capacity=None):
+    # One file's aggregator in its sniffed format; a file that stops being valid
+    # UTF-8 past the sniffed sample is streamed again as Latin-1
+    reader = SourceReader(path)
+    try:
+        return stream_report(path, chunksize, reader.format, topk_capacity)
+    except UnicodeDecodeError:
+        return stream_report(path, chunksize, reader.format.with_encoding('latin-1'), topk_capacity)
+
+
+def parallel_stream_report(paths, chunksize=DEFAULT_CHUNKSIZE, topk_capacity=None, max_workers=None):
+    # Each file is parsed and aggregated in its own worker; merging follows the
+    # file order, so the result does not depend on which worker finishes first
+    max_workers = max(1, min(len(paths), max_workers or os.cpu_count() or 1))
+    aggregator = StreamingAggregator(topk_capacity)
+    if max_workers == 1:
+        for path in paths:
+            aggregator.merge(aggregate_source(path, chunksize, topk_capacity))
+        return aggregator
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for partial in pool.map(aggregate_source, paths, [chunksize] * len(paths), [topk_capacity] * len(paths)):
+            with profiling.span('merge'):
+                aggregator.merge(partial)
+    return aggregator
@@ -0,0 +1,255 @@
+"""Seeded generator for Superstore-schema data at arbitrary scale.
+
+Dimension pools (geography, products, customer segments, ship modes) and the
+distributions of quantity, discount, shipping delay and order dates are
+learned from the bundled sample, then scaled: order, customer and product
+counts grow with the row count (customers and products sublinearly), and
+products and customers are drawn with Zipf skew so a few of each dominate
+sales. Output is written in chunks of whole orders, so 100M-row files never
+have to fit in memory, and every chunk is derived from (seed, chunk index),
+so the same arguments always produce the same bytes.
+
+    python synthetic.py 1M data/synthetic/superstore-1M.csv --seed 7
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_PATH, prepare_frame, read_source
+
+SAMPLE_ROWS = 9_994
+LINES_PER_ORDER = 2.0
+CUSTOMER_GROWTH = 0.7   # customers ~ rows ** 0.7, relative to the sample
+PRODUCT_GROWTH = 0.5    # products ~ rows ** 0.5
+ZIPF_EXPONENT = 0.9
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+SIZE_SUFFIXES = {'K': 1_000, 'M': 1_000_000, 'B': 1_000_000_000}
+
+
+def parse_size(text):
+    # '100K', '1M', '10M', '100M' or a plain integer
+    text = str(text).strip().upper().replace('_', '')
+    if text and text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def _distribution(series):
+    counts = series.value_counts()
+    return counts.index.to_numpy(), (counts / counts.sum()).to_numpy()
+
+
+def _zipf_weights(n, exponent=ZIPF_EXPONENT):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+class SampleProfile:
+    # Pools and distributions learned once from the sample extract
+
+    def __init__(self, sample):
+        self.geography = (sample[['City', 'State', 'Postal Code', 'Region']]
+                          .drop_duplicates(['City', 'State']).reset_index(drop=True))
+        geo_counts = sample.groupby(['City', 'State']).size()
+        self.geography_weights = (geo_counts.reindex(pd.MultiIndex.from_frame(self.geography[['City', 'State']]))
+                                  .to_numpy(dtype=np.float64))
+        self.geography_weights /= self.geography_weights.sum()
+
+        # Product catalogue with a list price and a zero-discount margin per product
+        undiscounted = sample['Sales'] / (sample['Quantity'] * (1 - sample['Discount']))
+        self.products = (sample.assign(Unit_Price=undiscounted)
+                         .groupby('Product ID', sort=True)
+                         .agg({'Category': 'first', 'Sub-Category': 'first', 'Product Name': 'first',
+                               'Unit_Price': 'median'})
+                         .reset_index())
+        full_price = sample[sample['Discount'] == 0]
+        margins = (full_price['Profit'] / full_price['Sales']).groupby(full_price['Sub-Category']).median()
+        self.base_margin = margins.reindex(self.products['Sub-Category']).fillna(0.1).to_numpy()
+
+        self.customer_names = sample['Customer Name'].drop_duplicates().to_numpy()
+        self.segments = _distribution(sample['Segment'])
+        self.ship_modes = _distribution(sample['Ship Mode'])
+        self.ship_days = {mode: _distribution(group) for mode, group in sample.groupby('Ship Mode')['Days_to_Ship']}
+        self.quantities = _distribution(sample['Quantity'])
+        self.discounts = {sub: _distribution(group) for sub, group in sample.groupby('Sub-Category')['Discount']}
+
+        # Date spread: the sample's per-month order volume, uniform within each month
+        months = sample['Order Date'].dt.to_period('M')
+        month_counts = months.value_counts().sort_index()
+        self.months = month_counts.index
+        self.month_weights = (month_counts / month_counts.sum()).to_numpy()
+
+    @classmethod
+    def from_path(cls, path=DATA_PATH):
+        return cls(prepare_frame(read_source(path)))
+
+
+def _scaled(sample_count, rows, growth):
+    return max(1, int(round(sample_count * (rows / SAMPLE_ROWS) ** growth)))
+
+
+class SuperstoreGenerator:
+    def __init__(self, rows, seed=0, profile=None):
+        self.rows = rows
+        self.seed = seed
+        self.profile = profile or SampleProfile.from_path()
+        rng = np.random.default_rng([seed, 0xC0FFEE])
+        self._build_products(rng)
+        self._build_customers(rng)
+
+    def _build_products(self, rng):
+        base = self.profile.products
+        n = max(len(base), _scaled(len(base), self.rows, PRODUCT_GROWTH))
+        template = np.arange(n) % len(base)
+        products = base.iloc[template].reset_index(drop=True)
+        clone = np.arange(n) // len(base)
+        # Clones keep the category prefix of the ID (e.g. FUR-BO-) with a new serial
+        prefix = products['Product ID'].str[:7]
+        products['Product ID'] = np.where(
+            clone == 0, products['Product ID'],
+            prefix + pd.Series(20_000_000 + np.arange(n), dtype=str))
+        products['Unit_Price'] = products['Unit_Price'] * rng.lognormal(0, 0.25 * (clone > 0), n)
+        self.products = products
+        self.product_margin = self.profile.base_margin[template]
+        self.product_weights = _zipf_weights(n)[rng.permutation(n)]
+
+    def _build_customers(self, rng):
+        n = _scaled(len(self.profile.customer_names), self.rows, CUSTOMER_GROWTH)
+        names = self.profile.customer_names[rng.integers(0, len(self.profile.customer_names), n)]
+        initials = pd.Series(names).str.split().map(lambda parts: ''.join(p[0] for p in parts[:2]).upper())
+        values, weights = self.profile.segments
+        self.customers = pd.DataFrame({
+            'Customer ID': initials + '-' + pd.Series(10_000 + np.arange(n), dtype=str),
+            'Customer Name': names,
+            'Segment': rng.choice(values, n, p=weights),
+            'Home': rng.choice(len(self.profile.geography), n, p=self.profile.geography_weights),
+        })
+        self.customer_weights = _zipf_weights(n)[rng.permutation(n)]
+
+    def chunks(self, chunk_rows=DEFAULT_CHUNK_ROWS):
+        n_chunks = max(1, -(-self.rows // chunk_rows))
+        first_row, first_order = 0, 0
+        for index in range(n_chunks):
+            rows = min(chunk_rows, self.rows - first_row)
+            chunk = self.chunk(index, rows, first_row, first_order)
+            first_row += rows
+            first_order += chunk['Order ID'].nunique()
+            yield chunk
+
+    def chunk(self, index, rows, first_row=0, first_order=0):
+        rng = np.random.default_rng([self.seed, index])
+        profile = self.profile
+
+        # Whole orders of 1+ lines until the chunk is full
+        lines = rng.geometric(1 / LINES_PER_ORDER, rows)
+        lines = lines[:np.searchsorted(np.cumsum(lines), rows) + 1]
+        lines[-1] -= lines.sum() - rows
+        n_orders = len(lines)
+        order_of_row = np.repeat(np.arange(n_orders), lines)
+
+        # Order level: date, customer, ship mode and delay
+        month = rng.choice(len(profile.months), n_orders, p=profile.month_weights)
+        starts = profile.months.start_time.to_numpy()[month]
+        days_in_month = profile.months.days_in_month.to_numpy()[month]
+        order_dates = starts + (rng.random(n_orders) * days_in_month).astype('timedelta64[D]')
+        customer = rng.choice(len(self.customers), n_orders, p=self.customer_weights)
+        mode_values, mode_weights = profile.ship_modes
+        ship_mode = rng.choice(mode_values, n_orders, p=mode_weights)
+        delay = np.empty(n_orders, dtype=np.int64)
+        for mode, (values, weights) in profile.ship_days.items():
+            hit = ship_mode == mode
+            delay[hit] = rng.choice(values, hit.sum(), p=weights)
+        ship_dates = order_dates + delay.astype('timedelta64[D]')
+        years = order_dates.astype('datetime64[Y]').astype(np.int64) + 1970
+        order_ids = (np.where(rng.random(n_orders) < 0.8, 'CA-', 'US-').astype(object) + years.astype(str)
+                     + '-' + pd.Series(100_000 + first_order + np.arange(n_orders), dtype=str).to_numpy())
+
+        # Line level: product, quantity, discount, sales and profit
+        product = rng.choice(len(self.products), rows, p=self.product_weights)
+        sub_category = self.products['Sub-Category'].to_numpy()[product]
+        discount = np.zeros(rows)
+        for sub, (values, weights) in profile.discounts.items():
+            hit = sub_category == sub
+            discount[hit] = rng.choice(values, hit.sum(), p=weights)
+        q_values, q_weights = profile.quantities
+        quantity = rng.choice(q_values, rows, p=q_weights)
+        price = self.products['Unit_Price'].to_numpy()[product] * rng.lognormal(0, 0.05, rows)
+        sales = np.round(price * quantity * (1 - discount), 4)
+        margin = self.product_margin[product] - 1.5 * discount + rng.normal(0, 0.05, rows)
+        profit = np.round(sales * margin, 4)
+
+        customers = self.customers.iloc[customer[order_of_row]]
+        geography = profile.geography.iloc[customers['Home'].to_numpy()]
+        products = self.products.iloc[product]
+        return pd.DataFrame({
+            'Row ID': first_row + 1 + np.arange(rows),
+            'Order ID': order_ids[order_of_row],
+            'Order Date': _format_dates(order_dates[order_of_row]),
+            'Ship Date': _format_dates(ship_dates[order_of_row]),
+            'Ship Mode': ship_mode[order_of_row],
+            'Customer ID': customers['Customer ID'].to_numpy(),
+            'Customer Name': customers['Customer Name'].to_numpy(),
+            'Segment': customers['Segment'].to_numpy(),
+            'Country': 'United States',
+            'City': geography['City'].to_numpy(),
+            'State': geography['State'].to_numpy(),
+            'Postal Code': geography['Postal Code'].to_numpy(),
+            'Region': geography['Region'].to_numpy(),
+            'Product ID': products['Product ID'].to_numpy(),
+            'Category': products['Category'].to_numpy(),
+            'Sub-Category': sub_category,
+            'Product Name': products['Product Name'].to_numpy(),
+            'Sales': sales,
+            'Quantity': quantity,
+            'Discount': discount,
+            'Profit': profit,
+        })
+
+    def frame(self):
+        return pd.concat(self.chunks(), ignore_index=True)
+
+    def write_csv(self, path, chunk_rows=DEFAULT_CHUNK_ROWS, log=None):
+        log = log or (lambda message: None)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.tmp"
+        written = 0
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            for chunk in self.chunks(chunk_rows):
+                chunk.to_csv(f, index=False, header=written == 0)
+                written += len(chunk)
+                log(f"   {written:,} / {self.rows:,} rows")
+        os.replace(tmp, path)
+        return path
+
+
+def _format_dates(dates):
+    # M/D/YYYY like the source extract, formatted once per distinct day
+    days, inverse = np.unique(dates.astype('datetime64[D]'), return_inverse=True)
+    stamps = pd.DatetimeIndex(days)
+    labels = (stamps.month.astype(str) + '/' + stamps.day.astype(str) + '/' + stamps.year.astype(str)).to_numpy()
+    return labels[inverse]
+
+
+def generate_csv(path, rows, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS, log=None):
+    return SuperstoreGenerator(rows, seed).write_csv(path, chunk_rows, log)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate Superstore-schema data at scale")
+    parser.add_argument('rows', help="row count, e.g. 100K, 1M, 10M, 100M")
+    parser.add_argument('path', help="output CSV path")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    rows = parse_size(args.rows)
+    print(f"🏭 Generating {rows:,} rows (seed {args.seed}) → {args.path}")
+    generate_csv(args.path, rows, args.seed, args.chunk_rows, log=print)
+    print("✅ Done")
+
+
+if __name__ == '__main__':
+    main()
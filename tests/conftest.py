@@ -0,0 +1,33 @@
+"""Shared fixtures: the modules live at the repository root, and test data is
+a slice of the bundled sample extract, edited per test and written to a
+temporary CSV."""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_PATH = os.path.join(ROOT, 'data', 'Sample-Superstore.csv')
+
+
+@pytest.fixture(scope='session')
+def sample_rows():
+    # The first 1,000 rows of the sample extract, as raw text
+    return pd.read_csv(SAMPLE_PATH, encoding='latin-1', dtype=str, nrows=1000)
+
+
+@pytest.fixture
+def write_csv(tmp_path, sample_rows):
+    # write_csv(edit=None, name='superstore.csv') -> path of the sample rows
+    # after edit(frame) changed them in place
+    def write(edit=None, name='superstore.csv'):
+        frame = sample_rows.copy()
+        if edit is not None:
+            edit(frame)
+        path = tmp_path / name
+        frame.to_csv(path, index=False)
+        return str(path)
+    return write
@@ -0,0 +1,87 @@
+import csv
+import io
+
+import numpy as np
+import pytest
+
+from backends import CHECK_SELECTIONS, _compare, backend_results, open_backend
+from ingest import SourceReader
+from report import REPORT_PLAN
+
+
+@pytest.fixture(params=['polars', 'duckdb'])
+def engine(request):
+    pytest.importorskip(request.param)
+    return request.param
+
+
+def _assert_same_as_pandas(path, engine):
+    pandas, other = open_backend('pandas', path, use_cache=False), open_backend(engine, path)
+    for label, filters in CHECK_SELECTIONS:
+        expected = backend_results(pandas.select(**filters), REPORT_PLAN)
+        actual = backend_results(other.select(**filters), REPORT_PLAN)
+        assert _compare(expected, actual, f"{engine} ({label})") == []
+    return other
+
+
+def _edit_lines(path, edit):
+    # edit(rows) on the file's rows of fields, header included
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    edit(rows)
+    with open(path, 'w', newline='') as f:
+        csv.writer(f, lineterminator='\n').writerows(rows)
+
+
+def test_sample_matches_pandas(write_csv, engine):
+    backend = _assert_same_as_pandas(write_csv(), engine)
+    assert backend.quarantined() == {}
+
+
+def test_rows_without_a_key_match_pandas(write_csv, engine):
+    def blank(frame):
+        for rows, col in (([3, 500], 'Region'), ([4], 'Category'), ([5], 'Segment'),
+                          ([6, 7], 'Customer ID'), ([8], 'Product ID'), ([9], 'Ship Mode'), ([10], 'State')):
+            frame.loc[rows, col] = np.nan
+
+    _assert_same_as_pandas(write_csv(blank), engine)
+
+
+def test_malformed_rows_are_left_out_like_pandas(write_csv, engine):
+    def corrupt(frame):
+        frame.loc[20, 'Sales'] = 'n/a'
+        frame.loc[21, 'Order Date'] = '13/45/2016'
+        frame.loc[22, 'Ship Date'] = 'soon'
+        frame.loc[23, 'Order ID'] = np.nan
+        frame.loc[24, 'Quantity'] = 'two'
+        frame.loc[25, 'Ship Date'] = np.nan   # no ship date yet: kept, not shipped
+
+    def reshape(rows):
+        rows[31].append('stray field')
+        rows[32] = rows[32][:19]              # cut short after Quantity: kept
+
+    path = write_csv(corrupt)
+    _edit_lines(path, reshape)
+    backend = _assert_same_as_pandas(path, engine)
+
+    reader = SourceReader(path)
+    reader.read()
+    assert backend.quarantined() == reader.quarantined['problem'].value_counts().sort_index().to_dict()
+    assert backend.quarantined() == {'Order Date': 1, 'Order ID': 1, 'Quantity': 1, 'Sales': 1,
+                                     'Ship Date': 1, 'fields': 1}
+
+
+def test_sniffed_format_matches_pandas(tmp_path, sample_rows, engine):
+    # Latin-1 with a non-ASCII label, ';'-separated, ISO dates
+    frame = sample_rows.copy()
+    frame['Segment'] = frame['Segment'].replace('Home Office', 'Bureau à domicile')
+    for col in ('Order Date', 'Ship Date'):
+        frame[col] = frame[col].map(lambda text: '-'.join(
+            [text.split('/')[2], *(part.zfill(2) for part in text.split('/')[:2])]))
+    text = io.StringIO()
+    frame.to_csv(text, sep=';', index=False)
+    path = tmp_path / 'superstore.csv'
+    path.write_bytes(text.getvalue().encode('latin-1'))
+
+    backend = _assert_same_as_pandas(str(path), engine)
+    assert 'Bureau à domicile' in backend.aggregate(REPORT_PLAN)['Segment'].index
@@ -0,0 +1,30 @@
+import numpy as np
+
+from cube import SalesCube
+from data_store import load_superstore
+from metrics import compute_metrics
+from orders import OrderTable
+from report import REPORT_PLAN
+
+
+def _blank_measures(frame):
+    # Lines cut short: the measures after Sales are missing, the row is kept
+    frame.loc[[3, 700], 'Profit'] = np.nan
+    frame.loc[4, 'Quantity'] = np.nan
+    frame.loc[5, 'Discount'] = np.nan
+
+
+def test_missing_measures_add_nothing(write_csv):
+    df = load_superstore(write_csv(_blank_measures), use_cache=False)
+    assert df['Profit'].isna().sum() == 2 and df['Quantity'].isna().sum() == 1
+
+    results = compute_metrics(df, REPORT_PLAN)
+    for dim in ('Segment', 'Category', 'Region'):
+        expected = df.groupby(dim, observed=True)[['Sales', 'Profit']].sum()
+        np.testing.assert_allclose(results[dim][['Sales', 'Profit']].to_numpy(), expected.to_numpy())
+    assert results['Category']['Quantity'].sum() == df['Quantity'].sum()
+
+    totals = SalesCube.from_frame(df).everything().totals()
+    assert np.isclose(totals['Profit'], df['Profit'].sum())
+    assert totals['Quantity'] == df['Quantity'].sum()
+    assert np.isclose(OrderTable.from_frame(df).orders['Profit'].sum(), df['Profit'].sum())
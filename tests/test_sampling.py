@@ -0,0 +1,32 @@
+import numpy as np
+
+from data_store import load_superstore
+from sampling import StratifiedSample, _relative_error, sample_for_target
+
+
+def test_sample_meets_its_target(write_csv):
+    df = load_superstore(write_csv(), use_cache=False)
+    for target in (0.2, 0.05, 0.01):
+        messages = []
+        sample = sample_for_target(df, target, log=messages.append)
+        assert _relative_error(sample) <= target
+        assert not any(message.startswith('⚠️') for message in messages)
+
+
+def test_missing_labels_form_their_own_strata(write_csv):
+    def blank(frame):
+        frame.loc[3, 'Region'] = np.nan
+        frame.loc[4, 'Category'] = np.nan
+        frame.loc[5, 'Segment'] = np.nan
+        frame.loc[6, 'Customer ID'] = np.nan
+
+    df = load_superstore(write_csv(blank), use_cache=False)
+    sample = StratifiedSample.from_frame(df, fraction=1.0)
+    pieces, _ = sample.estimate_report((df['Order Date'].min(), df['Order Date'].max()))
+    assert np.isclose(pieces['kpis']['total_sales'], df['Sales'].sum())
+    assert pieces['kpis']['total_orders'] == df['Order ID'].nunique()
+    expected = df.groupby('Region', observed=True)['Sales'].sum()
+    np.testing.assert_allclose(pieces['region_base']['Sales'].to_numpy(), expected.to_numpy())
+
+    view = sample.estimate_view(regions=['West'])
+    assert view['order_count'] == df.loc[df['Region'] == 'West', 'Order ID'].nunique()
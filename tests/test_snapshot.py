@@ -0,0 +1,35 @@
+import time
+
+import snapshot
+from snapshot import SnapshotRefresher
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "refresher did not get there in time"
+        time.sleep(0.01)
+
+
+def test_unreadable_sources_error_clears_once_they_are_back(monkeypatch):
+    versions = iter([('v1',), OSError('superstore.csv: gone'), ('v1',)])
+    polls = []
+
+    def dataset_version(path):
+        polls.append(path)
+        version = next(versions, ('v1',))
+        if isinstance(version, Exception):
+            raise version
+        return version
+
+    monkeypatch.setattr(snapshot, 'dataset_version', dataset_version)
+    refresher = SnapshotRefresher('superstore.csv', build=lambda path: path, interval=60).start()
+
+    refresher.refresh()
+    _wait_for(lambda: refresher.last_error is not None)
+    assert refresher.last_error == (None, 'superstore.csv: gone')
+
+    # Unchanged version: nothing to build, but the error no longer applies
+    refresher.refresh()
+    _wait_for(lambda: len(polls) >= 3 and refresher.last_error is None)
+    assert refresher.current().version == ('v1',)
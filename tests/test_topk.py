@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from data_store import load_superstore
+from report import build_report
+from topk import key_labels, top_k_by_key
+
+
+def _blank_ids(frame):
+    frame.loc[[3, 40, 41], 'Customer ID'] = np.nan
+    frame.loc[[5, 60], 'Product ID'] = np.nan
+
+
+def test_rows_without_a_key_are_not_ranked(write_csv):
+    df = load_superstore(write_csv(_blank_ids), use_cache=False)
+    assert df['Customer ID'].isna().sum() == 3 and df['Product ID'].isna().sum() == 2
+
+    for key, label in (('Customer ID', 'Customer Name'), ('Product ID', 'Product Name')):
+        expected = df.groupby(key, observed=True)['Sales'].sum().nlargest(10)
+        top = top_k_by_key(df, key, 'Sales', 10)
+        assert list(top.index) == list(expected.index)
+        np.testing.assert_allclose(top.to_numpy(), expected.to_numpy())
+
+        rows = np.flatnonzero(df['Region'].to_numpy() == 'West')
+        expected = df.iloc[rows].groupby(key, observed=True)['Sales'].sum().nlargest(5)
+        np.testing.assert_allclose(top_k_by_key(df, key, 'Sales', 5, rows=rows).to_numpy(), expected.to_numpy())
+
+        # Every key's label comes from its own first row
+        first = df.dropna(subset=[key]).drop_duplicates(key).set_index(key)[label]
+        labels = pd.Series(key_labels(df, key, label), index=df[key].cat.categories)
+        assert list(labels.loc[first.index.astype(object)]) == list(first)
+
+
+def test_report_finishes_with_blank_ids(write_csv):
+    df = load_superstore(write_csv(_blank_ids), use_cache=False)
+    report = build_report(df)
+    assert len(report['top_products']) == 5 and len(report['top_customers']) == 5
@@ -0,0 +1,120 @@
+"""Top-K selection over integer-encoded keys.
+
+Exact mode sums values per key code with bincount and picks the K largest
+with argpartition, so only K entries are ever sorted. For chunked or
+incremental ingestion, SpaceSavingSketch keeps a bounded number of counters
+with per-key error bounds and merges across chunks.
+
+Rankings key on IDs (Product ID, Customer ID) because names collide; the
+display label is the name seen on each key's first row, with the ID appended
+when two ranked keys share a name.
+"""
+import numpy as np
+import pandas as pd
+
+from schema import id_codes, id_lookup, measure_values
+
+
+def top_k_indices(values, k):
+    # Positions of the k largest values, largest first, without a full sort
+    k = min(k, len(values))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    candidates = np.argpartition(-values, k - 1)[:k]
+    return candidates[np.argsort(-values[candidates], kind='stable')]
+
+
+def key_labels(df, key_column, label_column):
+    # Label for every key code, taken from the key's first row (rows without a key are skipped)
+    codes = id_codes(df, key_column)
+    rows = np.flatnonzero(codes >= 0)
+    first_row = np.zeros(len(id_lookup(df, key_column)), dtype=np.int64)
+    first_row[codes[rows[::-1]]] = rows[::-1]
+    return np.asarray(df[label_column].to_numpy()[first_row], dtype=object)
+
+
+def disambiguate(labels, keys):
+    labels = pd.Series(labels, dtype=object)
+    duplicated = labels.duplicated(keep=False).to_numpy()
+    return [f"{label} ({key})" if dup else label for label, key, dup in zip(labels, keys, duplicated)]
+
+
+def top_k_by_key(df, key_column, value_column, k, rows=None, label_column=None, labels=None):
+    codes = id_codes(df, key_column)
+    weights = measure_values(df, value_column)
+    if rows is not None:
+        codes, weights = codes[rows], weights[rows]
+    # Rows without a key (code -1) are not ranked, as groupby drops NaN keys
+    keyed = codes >= 0
+    codes, weights = codes[keyed], weights[keyed]
+    n_keys = len(id_lookup(df, key_column))
+
+    totals = np.bincount(codes, weights=weights, minlength=n_keys)
+    # Keys with no rows in the selection must never be ranked
+    ranked = np.where(np.bincount(codes, minlength=n_keys) > 0, totals, -np.inf)
+    best = top_k_indices(ranked, k)
+    best = best[np.isfinite(ranked[best])]
+
+    keys = id_lookup(df, key_column)[best]
+    if label_column is None:
+        index = list(keys)
+    else:
+        if labels is None:
+            labels = key_labels(df, key_column, label_column)
+        index = disambiguate(labels[best], keys)
+    return pd.Series(totals[best], index=index, name=value_column)
+
+
+class SpaceSavingSketch:
+    # Weighted Space-Saving summary with at most `capacity` counters. For a
+    # tracked key the true total lies in [estimate - error, estimate]; any
+    # untracked key's total is at most `floor`. Summaries merge by adding
+    # estimates (a missing key counts as the other side's floor) and pruning
+    # back to capacity, so chunk summaries combine in any order. Weights must
+    # be non-negative.
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.estimates = pd.Series(dtype=np.float64)
+        self.errors = pd.Series(dtype=np.float64)
+        self.floor = 0.0
+
+    @classmethod
+    def from_totals(cls, totals, capacity):
+        # Exact per-key totals (e.g. one chunk aggregated by key) -> summary
+        sketch = cls(capacity)
+        sketch.estimates = totals.astype(np.float64)
+        sketch.errors = pd.Series(0.0, index=totals.index)
+        sketch._prune()
+        return sketch
+
+    def update(self, keys, weights):
+        totals = pd.Series(np.asarray(weights, dtype=np.float64)).groupby(np.asarray(keys)).sum()
+        self.merge(SpaceSavingSketch.from_totals(totals, self.capacity))
+
+    def merge(self, other):
+        index = self.estimates.index.union(other.estimates.index)
+        self.estimates = (self.estimates.reindex(index, fill_value=self.floor)
+                          + other.estimates.reindex(index, fill_value=other.floor))
+        self.errors = (self.errors.reindex(index, fill_value=self.floor)
+                       + other.errors.reindex(index, fill_value=other.floor))
+        self.floor += other.floor
+        self._prune()
+        return self
+
+    def _prune(self):
+        if len(self.estimates) <= self.capacity:
+            return
+        keep = top_k_indices(self.estimates.to_numpy(), self.capacity)
+        dropped = np.ones(len(self.estimates), dtype=bool)
+        dropped[keep] = False
+        self.floor = max(self.floor, float(self.estimates.to_numpy()[dropped].max()))
+        self.estimates = self.estimates.iloc[keep]
+        self.errors = self.errors.iloc[keep]
+
+    def top(self, k):
+        best = top_k_indices(self.estimates.to_numpy(), k)
+        return pd.DataFrame({
+            'estimate': self.estimates.iloc[best],
+            'error': self.errors.iloc[best],
+        })